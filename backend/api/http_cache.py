@@ -0,0 +1,26 @@
+"""Conditional GET (ETag / If-None-Match) for JSON responses.
+
+The ETag is a hash of the serialized body, so clients revalidate with one
+round trip and get an empty `304` when nothing changed. It is weak (`W/`)
+because the compression middleware may re-encode the body.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+
+def json_with_etag(request: Request, content: Any, *, cache_control: str = "private, no-cache") -> Response:
+    body = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode()
+    etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    candidates = {tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")}
+    if "*" in candidates or etag.removeprefix("W/") in candidates:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
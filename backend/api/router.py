@@ -2,11 +2,18 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
+from backend.api.routes.analysis import router as analysis_router
 from backend.api.routes.athletes import router as athletes_router
+from backend.api.routes.batch import router as batch_router
+from backend.api.routes.dashboard import router as dashboard_router
 from backend.api.routes.exercises import router as exercises_router
 from backend.api.routes.evaluations import router as evaluations_router
+from backend.api.routes.events import router as events_router
 from backend.api.routes.health import router as health_router
+from backend.api.routes.jobs import router as jobs_router
 from backend.api.routes.payments import router as payments_router
+from backend.api.routes.reports import router as reports_router
+from backend.api.routes.search import router as search_router
 from backend.api.routes.training_sessions import router as training_sessions_router
 
 
@@ -18,3 +25,10 @@ api_router.include_router(exercises_router, prefix="/exercises", tags=["exercise
 api_router.include_router(training_sessions_router, prefix="/training-sessions", tags=["training-sessions"])
 api_router.include_router(evaluations_router, prefix="/evaluations", tags=["evaluations"])
 api_router.include_router(payments_router, prefix="/payments", tags=["payments"])
+api_router.include_router(reports_router, prefix="/reports", tags=["reports"])
+api_router.include_router(search_router, prefix="/search", tags=["search"])
+api_router.include_router(dashboard_router, prefix="/dashboard", tags=["dashboard"])
+api_router.include_router(analysis_router, prefix="/analysis", tags=["analysis"])
+api_router.include_router(batch_router, prefix="/batch", tags=["batch"])
+api_router.include_router(jobs_router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(events_router, prefix="/events", tags=["events"])
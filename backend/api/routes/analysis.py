@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Literal
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+
+from backend import billing, db, rollups
+from backend.cache import cache
+from backend.downsample import downsample
+from backend.schemas import (
+    AdherenceRoster,
+    AnalysisSeries,
+    AthleteAdherence,
+    AthleteRecords,
+    OccupancyHeatmap,
+    TrainingRollup,
+)
+from backend.settings import settings
+from backend.training_metrics import exercise_key
+
+
+router = APIRouter()
+
+_ATHLETE_EXISTS = db.statement("athlete_exists", "SELECT id FROM athletes WHERE id = %s")
+
+_EVALUATION_METRICS = ("weight", "fat_percentage", "muscle_percentage", "water_percentage", "bone_percentage")
+# exercise_<column> reads the per-session stats kept by backend/records.py
+_EXERCISE_METRICS = {"exercise_weight": "weight", "exercise_volume": "volume", "exercise_e1rm": "e1rm"}
+
+
+@router.get("/athletes/{athlete_id}/records", response_model=AthleteRecords)
+def get_athlete_records(
+    athlete_id: int,
+    recent_limit: int = Query(default=20, ge=0, le=200),
+):
+    existing = db.fetch_one(_ATHLETE_EXISTS, (athlete_id,))
+    if not existing:
+        raise HTTPException(status_code=404, detail="Athlete not found")
+
+    # Both reads are served from the maintained tables (backend/records.py), so the
+    # cost depends on the number of exercises, not on the length of the history.
+    bests = db.fetch_all(
+        """
+        SELECT *
+        FROM athlete_exercise_bests
+        WHERE athlete_id = %s
+        ORDER BY exercise_name ASC
+        """,
+        (athlete_id,),
+    )
+    recent = db.fetch_all(
+        """
+        SELECT id, session_id, exercise_key, exercise_name, record_type, value, previous_value, achieved_on
+        FROM personal_records
+        WHERE athlete_id = %s
+        ORDER BY achieved_on DESC, id DESC
+        LIMIT %s
+        """,
+        (athlete_id, recent_limit),
+    )
+    return {"athlete_id": athlete_id, "bests": bests, "recent_records": recent}
+
+
+@router.get("/rollups", response_model=list[TrainingRollup])
+def list_rollups(
+    granularity: Literal["day", "week", "month"] = Query(default="week"),
+    start: date | None = Query(default=None),
+    end: date | None = Query(default=None),
+    athlete_id: int | None = Query(default=None, ge=1, description="Omit for studio-wide totals"),
+):
+    where = ["granularity = %s"]
+    params: list[object] = [granularity]
+    if start is not None:
+        # Include the bucket that contains `start`.
+        where.append("period_start >= date_trunc(%s, %s::date)::date")
+        params.extend([granularity, start])
+    if end is not None:
+        where.append("period_start <= %s")
+        params.append(end)
+
+    if athlete_id is not None:
+        where.append("athlete_id = %s")
+        params.append(athlete_id)
+        table = "athlete_training_rollups"
+    else:
+        table = "studio_training_rollups"
+
+    return db.fetch_all(
+        f"""
+        SELECT *
+        FROM {table}
+        WHERE {' AND '.join(where)}
+        ORDER BY period_start ASC
+        """,
+        tuple(params),
+    )
+
+
+@router.get("/athletes/{athlete_id}/series", response_model=AnalysisSeries)
+def get_athlete_series(
+    athlete_id: int,
+    metric: str = Query(..., description="weight, fat_percentage, muscle_percentage, water_percentage, "
+                        "bone_percentage, exercise_weight, exercise_volume or exercise_e1rm"),
+    exercise: str | None = Query(default=None, description="Exercise name, required for exercise_* metrics"),
+    points: int = Query(default=200, ge=3, le=5000, description="Target number of points"),
+    method: Literal["lttb", "minmax"] = Query(default="lttb"),
+    start: date | None = Query(default=None),
+    end: date | None = Query(default=None),
+):
+    where = ["athlete_id = %(athlete_id)s"]
+    params: dict[str, Any] = {"athlete_id": athlete_id, "start": start, "end": end}
+
+    if metric in _EVALUATION_METRICS:
+        table, date_col, value_col = "evaluations", "evaluation_date", metric
+    elif metric in _EXERCISE_METRICS:
+        if not exercise or not exercise.strip():
+            raise HTTPException(status_code=400, detail="exercise is required for exercise metrics")
+        table, date_col, value_col = "exercise_session_stats", "session_date", _EXERCISE_METRICS[metric]
+        where.append("exercise_key = %(exercise_key)s")
+        params["exercise_key"] = exercise_key(exercise)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+
+    if start is not None:
+        where.append(f"{date_col} >= %(start)s")
+    if end is not None:
+        where.append(f"{date_col} <= %(end)s")
+
+    # One value per day (the best), as the Analysis page plots it.
+    rows = db.fetch_all(
+        f"""
+        SELECT {date_col} AS date, MAX({value_col})::float8 AS value
+        FROM {table}
+        WHERE {' AND '.join(where)} AND {value_col} IS NOT NULL
+        GROUP BY {date_col}
+        ORDER BY {date_col} ASC
+        """,
+        params,
+    )
+
+    if len(rows) > points:
+        x = np.fromiter((r["date"].toordinal() for r in rows), dtype=np.float64, count=len(rows))
+        y = np.fromiter((r["value"] for r in rows), dtype=np.float64, count=len(rows))
+        series = [rows[i] for i in downsample(x, y, points, method)]
+    else:
+        series = rows
+
+    return {
+        "athlete_id": athlete_id,
+        "metric": metric,
+        "exercise": exercise,
+        "method": method,
+        "source_points": len(rows),
+        "points": series,
+    }
+
+
+# Weekly planned vs. completed sessions per athlete, from the weekly rollups and
+# the plan in effect each month (plan_history). Weeks before an athlete's first
+# session or creation are left out. `met` weeks form islands (row number minus
+# row number within the met/unmet partition) whose running count is the streak.
+_ADHERENCE_WEEKS = """
+    WITH weeks AS (
+        SELECT w::date AS week_start
+        FROM generate_series(%(start)s::date, %(end)s::date, interval '1 week') w
+    ),
+    athlete_weeks AS (
+        SELECT a.id AS athlete_id, w.week_start,
+               plan.plan_sessions_per_week AS planned,
+               COALESCE(r.sessions_completed, 0) AS completed,
+               COALESCE(r.sessions_cancelled, 0) AS cancelled,
+               COALESCE(r.sessions_scheduled, 0) AS scheduled
+        FROM athletes a
+        CROSS JOIN weeks w
+        LEFT JOIN LATERAL plan_in_effect(a.id, date_trunc('month', w.week_start)::date) plan ON TRUE
+        LEFT JOIN athlete_training_rollups r
+               ON r.athlete_id = a.id AND r.granularity = 'week' AND r.period_start = w.week_start
+        WHERE (%(athlete_id)s::int IS NULL OR a.id = %(athlete_id)s::int)
+          AND w.week_start >= date_trunc('week', LEAST(
+                  a.created_at::date,
+                  (SELECT MIN(period_start) FROM athlete_training_rollups
+                   WHERE athlete_id = a.id AND granularity = 'week')
+              ))::date
+    ),
+    marked AS (
+        SELECT aw.*, COALESCE(aw.planned > 0 AND aw.completed >= aw.planned, false) AS met
+        FROM athlete_weeks aw
+    ),
+    islands AS (
+        SELECT m.*,
+               ROW_NUMBER() OVER (PARTITION BY athlete_id ORDER BY week_start)
+               - ROW_NUMBER() OVER (PARTITION BY athlete_id, met ORDER BY week_start) AS island
+        FROM marked m
+    )
+    SELECT athlete_id, week_start, planned, completed, cancelled, scheduled, met,
+           ROUND(completed::numeric / NULLIF(planned, 0), 4)::float8 AS ratio,
+           CASE WHEN met THEN COUNT(*) OVER (PARTITION BY athlete_id, met, island ORDER BY week_start) ELSE 0 END AS streak
+    FROM islands
+"""
+
+_ADHERENCE_SUMMARY = f"""
+    WITH weekly AS ({_ADHERENCE_WEEKS}),
+    totals AS (
+        SELECT athlete_id,
+               COUNT(*)::int AS weeks,
+               SUM(planned)::int AS planned_sessions,
+               SUM(completed)::int AS completed_sessions,
+               SUM(cancelled)::int AS cancelled_sessions,
+               COUNT(*) FILTER (WHERE met)::int AS weeks_met,
+               (array_agg(streak ORDER BY week_start DESC))[1]::int AS current_streak,
+               MAX(streak)::int AS longest_streak
+        FROM weekly
+        GROUP BY athlete_id
+    ),
+    rated AS (
+        SELECT t.*,
+               ROUND(t.completed_sessions::numeric / NULLIF(t.planned_sessions, 0), 4)::float8 AS attendance_ratio,
+               ROUND(t.cancelled_sessions::numeric / NULLIF(t.completed_sessions + t.cancelled_sessions, 0), 4)::float8
+                   AS cancellation_rate
+        FROM totals t
+    )
+    SELECT r.*, a.first_name AS athlete_first_name, a.last_name AS athlete_last_name,
+           RANK() OVER (ORDER BY r.attendance_ratio ASC NULLS LAST, r.cancellation_rate DESC NULLS LAST)::int AS rank
+    FROM rated r
+    JOIN athletes a ON a.id = r.athlete_id
+    ORDER BY rank, a.first_name, a.last_name
+"""
+
+
+def _adherence_range(start: date | None, end: date | None) -> tuple[date, date]:
+    """Monday-aligned [start, end] weeks; by default the 12 full weeks before this one."""
+
+    this_week = rollups.bucket_start("week", date.today())
+    end_week = rollups.bucket_start("week", end) if end is not None else this_week - timedelta(weeks=1)
+    start_week = rollups.bucket_start("week", start) if start is not None else end_week - timedelta(weeks=11)
+    if start_week > end_week:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start_week, end_week
+
+
+@router.get("/adherence", response_model=AdherenceRoster)
+def roster_adherence(
+    start: date | None = Query(default=None, description="First week (any day of it)"),
+    end: date | None = Query(default=None, description="Last week (any day of it); defaults to last week"),
+):
+    """Planned vs. attended sessions for the whole roster, ranked in one query.
+
+    Served from the cache until a session or athlete changes (or the TTL ends,
+    for writes made through other workers).
+    """
+
+    start_week, end_week = _adherence_range(start, end)
+    athletes = cache.get_or_set(
+        ("adherence", start_week, end_week),
+        settings.adherence_cache_ttl_seconds,
+        ("training_sessions", "athletes"),
+        lambda: db.fetch_all(_ADHERENCE_SUMMARY, {"start": start_week, "end": end_week, "athlete_id": None}),
+    )
+    return {"start": start_week, "end": end_week, "athletes": athletes}
+
+
+@router.get("/athletes/{athlete_id}/adherence", response_model=AthleteAdherence)
+def athlete_adherence(
+    athlete_id: int,
+    start: date | None = Query(default=None, description="First week (any day of it)"),
+    end: date | None = Query(default=None, description="Last week (any day of it); defaults to last week"),
+):
+    existing = db.fetch_one(_ATHLETE_EXISTS, (athlete_id,))
+    if not existing:
+        raise HTTPException(status_code=404, detail="Athlete not found")
+
+    start_week, end_week = _adherence_range(start, end)
+    params = {"start": start_week, "end": end_week, "athlete_id": athlete_id}
+    summary = db.fetch_one(_ADHERENCE_SUMMARY, params)
+    weeks = db.fetch_all(f"{_ADHERENCE_WEEKS} ORDER BY week_start ASC", params)
+    return {"start": start_week, "end": end_week, "summary": summary, "weeks": weeks}
+
+
+# Whole months come from the 'month' rows and the partial months at either end
+# from the 'day' rows, so a year reads at most ~12 months plus ~60 days of slots.
+_OCCUPANCY = """
+    SELECT weekday, hour, SUM(sessions)::int AS sessions, SUM(minutes)::int AS minutes
+    FROM session_hour_slots
+    WHERE status = ANY(%(statuses)s)
+      AND (
+          (granularity = 'month' AND period_start >= %(months_lo)s AND period_start < %(months_hi)s)
+          OR (granularity = 'day' AND period_start BETWEEN %(start)s AND %(end)s
+              AND NOT (period_start >= %(months_lo)s AND period_start < %(months_hi)s))
+      )
+    GROUP BY weekday, hour
+    ORDER BY weekday, hour
+"""
+
+
+@router.get("/occupancy", response_model=OccupancyHeatmap)
+def occupancy_heatmap(
+    start: date | None = Query(default=None, description="Defaults to 52 weeks before end"),
+    end: date | None = Query(default=None, description="Defaults to today"),
+    status: list[Literal["Scheduled", "Completed", "Cancelled"]] = Query(default=["Scheduled", "Completed"]),
+):
+    """Sessions per weekday x hour slot, from the maintained hourly slots (backend/occupancy.py)."""
+
+    end = end or date.today()
+    start = start or end - timedelta(weeks=52) + timedelta(days=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    months_lo = start if start.day == 1 else billing.next_month(start)
+    months_hi = max(billing.month_start(end + timedelta(days=1)), months_lo)
+    rows = db.fetch_all(
+        _OCCUPANCY,
+        {
+            "statuses": sorted(set(status)),
+            "start": start,
+            "end": end,
+            "months_lo": months_lo,
+            "months_hi": months_hi,
+        },
+    )
+
+    days = (end - start).days + 1
+    weekday_counts = {
+        weekday: days // 7 + (1 if (weekday - start.isoweekday()) % 7 < days % 7 else 0) for weekday in range(1, 8)
+    }
+    cells = [
+        {**row, "average_sessions": round(row["minutes"] / 60 / weekday_counts[row["weekday"]], 3)}
+        for row in rows
+    ]
+    return {
+        "start": start,
+        "end": end,
+        "statuses": sorted(set(status)),
+        "weekday_counts": weekday_counts,
+        "cells": cells,
+    }
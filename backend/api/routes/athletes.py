@@ -1,13 +1,19 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+from datetime import date
 
-from backend import db
-from backend.schemas import Athlete, AthleteCreate, AthleteUpdate, IdResponse
+from fastapi import APIRouter, HTTPException, Query
+
+from backend import billing, db, rollups
+from backend.api.writes import delete_row, update_row
+from backend.cache import cache
+from backend.schemas import AthleteCreate, AthleteRosterEntry, AthleteUpdate, AthleteUpdateResult, IdResponse
 
 
 router = APIRouter()
 
+_PLAN_FIELDS = {"plan_type", "plan_sessions_per_week", "plan_monthly_price", "plan_on_demand_price"}
+
 
 def _goals_to_list(value):
     if value is None:
@@ -32,9 +38,65 @@ def _goals_to_text(value):
     return str(value)
 
 
-@router.get("", response_model=list[Athlete])
-def list_athletes():
-    rows = db.fetch_all("SELECT * FROM athletes ORDER BY first_name, last_name")
+# Each include is a LATERAL lookup that reads one row from a composite index
+# (see MIGRATIONS in scripts/init_db.py), so the roster stays a single query.
+_INCLUDES = {
+    "latest_evaluation": """
+        LEFT JOIN LATERAL (
+            SELECT json_build_object(
+                       'id', e.id,
+                       'evaluation_date', e.evaluation_date,
+                       'weight', e.weight,
+                       'muscle_percentage', e.muscle_percentage,
+                       'fat_percentage', e.fat_percentage,
+                       'bone_percentage', e.bone_percentage,
+                       'water_percentage', e.water_percentage
+                   ) AS latest_evaluation
+            FROM evaluations e
+            WHERE e.athlete_id = a.id
+            ORDER BY e.evaluation_date DESC, e.id DESC
+            LIMIT 1
+        ) le ON TRUE
+    """,
+    "next_session": """
+        LEFT JOIN LATERAL (
+            SELECT json_build_object(
+                       'id', ts.id,
+                       'session_name', ts.session_name,
+                       'session_date', ts.session_date,
+                       'session_time', ts.session_time,
+                       'duration', ts.duration,
+                       'session_type', ts.session_type
+                   ) AS next_session
+            FROM training_sessions ts
+            WHERE ts.athlete_id = a.id
+              AND ts.status = 'Scheduled'
+              AND ts.session_date >= CURRENT_DATE
+            ORDER BY ts.session_date ASC, ts.session_time ASC
+            LIMIT 1
+        ) ns ON TRUE
+    """,
+}
+
+
+@router.get("", response_model=list[AthleteRosterEntry], response_model_exclude_unset=True)
+def list_athletes(
+    include: str | None = Query(default=None, description="Comma-separated subset of: latest_evaluation,next_session"),
+):
+    wanted = [i.strip() for i in include.split(",") if i.strip()] if include else []
+    unknown = [i for i in wanted if i not in _INCLUDES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(unknown)}")
+
+    names = [name for name in _INCLUDES if name in wanted]
+    rows = db.fetch_all(
+        f"""
+        SELECT a.*{''.join(f', {name}' for name in names)}
+        FROM athletes a
+        {''.join(_INCLUDES[name] for name in names)}
+        ORDER BY a.first_name, a.last_name
+        """
+    )
     for row in rows:
         row["goals"] = _goals_to_list(row.get("goals"))
     return rows
@@ -42,57 +104,75 @@ def list_athletes():
 
 @router.post("", response_model=IdResponse)
 def create_athlete(payload: AthleteCreate):
-    athlete_id = db.execute_returning_id(
-        """
-        INSERT INTO athletes (
-            first_name, last_name, email, phone, birth_date,
-            gender, weight, height, fitness_level, goals, medical_conditions, notes
+    with db.transaction() as cur:
+        cur.execute(
+            """
+            INSERT INTO athletes (
+                first_name, last_name, email, phone, birth_date,
+                gender, weight, height, fitness_level, goals, medical_conditions, notes,
+                plan_type, plan_sessions_per_week, plan_monthly_price, plan_on_demand_price
+            )
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,COALESCE(%s, 'monthly'),%s,%s,%s)
+            RETURNING id, plan_type, plan_sessions_per_week, plan_monthly_price, plan_on_demand_price
+            """,
+            (
+                payload.first_name,
+                payload.last_name,
+                payload.email,
+                payload.phone,
+                payload.birth_date,
+                payload.gender,
+                payload.weight,
+                payload.height,
+                payload.fitness_level,
+                _goals_to_text(payload.goals),
+                payload.medical_conditions,
+                payload.notes,
+                payload.plan_type,
+                payload.plan_sessions_per_week,
+                payload.plan_monthly_price,
+                payload.plan_on_demand_price,
+            ),
         )
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        RETURNING id
-        """,
-        (
-            payload.first_name,
-            payload.last_name,
-            payload.email,
-            payload.phone,
-            payload.birth_date,
-            payload.gender,
-            payload.weight,
-            payload.height,
-            payload.fitness_level,
-            _goals_to_text(payload.goals),
-            payload.medical_conditions,
-            payload.notes,
-        ),
-    )
-    return {"id": athlete_id}
+        athlete = cur.fetchone()
+        # The starting plan, so a later scheduled change doesn't become the plan of earlier months.
+        billing.record_plan(cur, athlete, date.today())
+    cache.invalidate("athletes")
+    return {"id": athlete["id"]}
 
 
 @router.delete("/{athlete_id}")
 def delete_athlete(athlete_id: int):
-    row = db.fetch_one("SELECT id FROM athletes WHERE id = %s", (athlete_id,))
-    if not row:
-        raise HTTPException(status_code=404, detail="Athlete not found")
-    db.execute("DELETE FROM athletes WHERE id = %s", (athlete_id,))
+    with db.transaction() as cur:
+        # The span is read before the sessions cascade away.
+        span = delete_row(
+            cur,
+            "athletes",
+            athlete_id,
+            returning="""
+                (SELECT MIN(session_date) FROM training_sessions_all WHERE athlete_id = t.id) AS first,
+                (SELECT MAX(session_date) FROM training_sessions_all WHERE athlete_id = t.id) AS last,
+                ARRAY(SELECT month FROM billing_ledger WHERE athlete_id = t.id) AS ledger_months
+            """,
+            not_found="Athlete not found",
+        )
+        if span["first"] is not None:
+            # The athlete's rollups cascade; the studio totals for those periods don't.
+            rollups.refresh_range(cur, span["first"], span["last"], athlete_id)
+        billing.refresh_totals(cur, span["ledger_months"])
+    # Sessions, evaluations and payments cascade with the athlete.
+    cache.invalidate("athletes", "training_sessions", "evaluations", "payments", "payment_adjustments")
     return {"deleted": True}
 
 
-@router.patch("/{athlete_id}")
+@router.patch("/{athlete_id}", response_model=AthleteUpdateResult)
 def update_athlete(athlete_id: int, payload: AthleteUpdate):
-    existing = db.fetch_one("SELECT id FROM athletes WHERE id = %s", (athlete_id,))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Athlete not found")
-
-    set_clauses: list[str] = []
-    params: list[object] = []
+    values: dict[str, object] = {}
 
     # Only update fields explicitly provided by the client. This allows clearing values by sending null.
     for field_name in payload.model_fields_set:
         if field_name == "goals":
-            value = _goals_to_text(payload.goals)
-            set_clauses.append("goals = %s")
-            params.append(value)
+            values["goals"] = _goals_to_text(payload.goals)
             continue
 
         if field_name not in {
@@ -107,25 +187,41 @@ def update_athlete(athlete_id: int, payload: AthleteUpdate):
             "fitness_level",
             "medical_conditions",
             "notes",
-            "plan_type",
-            "plan_sessions_per_week",
-            "plan_monthly_price",
-            "plan_on_demand_price",
+            *_PLAN_FIELDS,
         }:
             continue
 
-        value = getattr(payload, field_name)
-        set_clauses.append(f"{field_name} = %s")
-        params.append(value)
+        values[field_name] = getattr(payload, field_name)
 
-    if not set_clauses:
-        return {"updated": False}
+    plan_values = {field: values.pop(field) for field in values.keys() & _PLAN_FIELDS}
 
-    params.append(athlete_id)
+    # Closed months keep the plan they were billed with. plan_effective_from
+    # only matters alongside plan fields; without them it's ignored.
+    current_month = billing.month_start(date.today())
+    effective_from = billing.month_start(payload.plan_effective_from or current_month)
+    if plan_values and effective_from < current_month:
+        raise HTTPException(status_code=400, detail="plan_effective_from can't be before the current month")
 
     try:
-        db.execute(f"UPDATE athletes SET {', '.join(set_clauses)} WHERE id = %s", tuple(params))
+        with db.transaction() as cur:
+            if plan_values:
+                # Months before the change keep the plan the athlete had until now.
+                billing.seed_plan_history(cur, athlete_id)
+                plan = {**billing.plan_at(cur, athlete_id, effective_from), **plan_values}
+                # athletes.plan_* is the plan in effect now; the month-close plan_apply
+                # job copies a scheduled one over when its month starts.
+                if effective_from == current_month:
+                    values.update(plan)
+            athlete = update_row(cur, "athletes", athlete_id, values, not_found="Athlete not found")
+            if plan_values:
+                billing.record_plan(cur, {"id": athlete_id, **plan}, effective_from)
+                billing.refresh_ledger(cur, [(athlete_id, effective_from)])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    return {"updated": True}
+    athlete["goals"] = _goals_to_list(athlete.get("goals"))
+    if values or plan_values:
+        cache.invalidate("athletes")
+    return {"updated": bool(values or plan_values), "athlete": athlete}
@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import groupby
+from typing import Any, Callable
+
+import psycopg2
+from fastapi import APIRouter
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from psycopg2.extras import execute_values
+
+from backend import billing, db, partitions, records, rollups
+from backend.api.routes.payments import _month_start, _upsert_paid
+from backend.api.routes.training_sessions import _parse_time
+from backend.cache import cache
+from backend.schemas import BatchRequest, BatchResponse
+
+
+router = APIRouter()
+
+
+# Postgres types for the typed VALUES lists; execute_values sends plain literals.
+_SESSION_TYPES = {
+    "athlete_id": "int",
+    "session_name": "varchar",
+    "session_date": "date",
+    "session_time": "time",
+    "duration": "int",
+    "session_type": "varchar",
+    "session_notes": "text",
+    "status": "varchar",
+    "exercises": "jsonb",
+    "completed_data": "jsonb",
+    "completed_at": "timestamp",
+}
+_EVALUATION_TYPES = {
+    "athlete_id": "int",
+    "evaluation_date": "date",
+    "weight": "numeric",
+    "muscle_percentage": "numeric",
+    "fat_percentage": "numeric",
+    "bone_percentage": "numeric",
+    "water_percentage": "numeric",
+    "notes": "text",
+}
+_ADJUSTMENT_TYPES = {
+    "athlete_id": "int",
+    "applies_month": "date",
+    "amount": "numeric",
+    "reason": "text",
+    "related_session_id": "int",
+}
+_RECORD_FIELDS = {"status", "completed_data", "athlete_id", "session_date"}
+
+
+class _Rollback(Exception):
+    pass
+
+
+@dataclass
+class _Batch:
+    cur: Any
+    results: dict[int, dict[str, Any]] = field(default_factory=dict)
+    touched_sessions: list[tuple[int | None, date | None]] = field(default_factory=list)
+    # (athlete_id, month) pairs whose billing_ledger row must be recomputed.
+    touched_billing: list[tuple[int | None, date | None]] = field(default_factory=list)
+    sessions_to_sync: set[int] = field(default_factory=set)
+    tables: set[str] = field(default_factory=set)
+
+    def ok(self, index: int, row_id: int | None = None) -> None:
+        self.results[index] = {"status": "ok", "id": row_id}
+
+    def fail(self, index: int, status: str, detail: str, row_id: int | None = None) -> None:
+        self.results[index] = {"status": status, "id": row_id, "detail": detail}
+
+
+def _template(types: list[str]) -> str:
+    return "(" + ", ".join(f"%s::{t}" for t in types) + ")"
+
+
+def _insert(batch: _Batch, table: str, types: dict[str, str], rows: list[dict[str, Any]], returning: str) -> list[Any]:
+    columns = list(rows[0])
+    return execute_values(
+        batch.cur,
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s RETURNING {returning}",
+        [tuple(r[c] for c in columns) for r in rows],
+        template=_template([types[c] for c in columns]),
+        page_size=len(rows),
+        fetch=True,
+    )
+
+
+def _update(
+    batch: _Batch, table: str, types: dict[str, str], rows: dict[int, dict[str, Any]], returning: str
+) -> list[Any]:
+    columns = list(next(iter(rows.values())))
+    return execute_values(
+        batch.cur,
+        f"""
+        UPDATE {table} AS t
+        SET {', '.join(f'{c} = v.{c}' for c in columns)}
+        FROM (VALUES %s) AS v(id, {', '.join(columns)})
+        WHERE t.id = v.id
+        RETURNING {returning}
+        """,
+        [(row_id, *(values[c] for c in columns)) for row_id, values in rows.items()],
+        template=_template(["int", *(types[c] for c in columns)]),
+        page_size=len(rows),
+        fetch=True,
+    )
+
+
+def _last_per_id(ops: list[tuple[int, Any]]) -> dict[int, int]:
+    # Within one group the last operation on a row wins, as it would sequentially.
+    return {op.id: index for index, op in ops}
+
+
+# --- training sessions ---
+
+
+def _session_create(batch: _Batch, ops: list[tuple[int, Any]]) -> None:
+    rows = []
+    valid = []
+    for index, op in ops:
+        d = op.data
+        try:
+            session_time = _parse_time(d.session_time)
+        except ValueError as e:
+            batch.fail(index, "error", str(e))
+            continue
+        valid.append(index)
+        rows.append(
+            {
+                "athlete_id": d.athlete_id,
+                "session_name": d.session_name,
+                "session_date": d.session_date,
+                "session_time": session_time,
+                "duration": d.duration,
+                "session_type": d.session_type,
+                "session_notes": d.session_notes,
+                "exercises": db.json_param(d.exercises or []),
+                "status": d.status or "Scheduled",
+            }
+        )
+    if len(rows) != len(ops):
+        for index in valid:
+            batch.ok(index)
+        raise _Rollback
+    partitions.ensure(batch.cur, [row["session_date"] for row in rows])
+    created = _insert(batch, "training_sessions", _SESSION_TYPES, rows, "id, athlete_id, session_date")
+    for (index, _), row in zip(ops, created):
+        batch.ok(index, row["id"])
+        batch.touched_sessions.append((row["athlete_id"], row["session_date"]))
+    batch.tables.add("training_sessions")
+
+
+def _session_values(op: Any) -> dict[str, Any]:
+    values = {k: v for k, v in op.data.model_dump().items() if v is not None}
+    if "session_time" in values:
+        values["session_time"] = _parse_time(values["session_time"])
+    for key in ("exercises", "completed_data"):
+        if key in values:
+            values[key] = db.json_param(values[key])
+    return values
+
+
+def _locked_sessions(batch: _Batch, ids: list[int]) -> dict[int, dict[str, Any]]:
+    batch.cur.execute(
+        "SELECT id, athlete_id, session_date FROM training_sessions WHERE id = ANY(%s) FOR UPDATE",
+        (ids,),
+    )
+    return {row["id"]: row for row in batch.cur.fetchall()}
+
+
+def _session_update(batch: _Batch, ops: list[tuple[int, Any]]) -> None:
+    last = _last_per_id(ops)
+    before = _locked_sessions(batch, list(last))
+    rows: dict[int, dict[str, Any]] = {}
+    for index, op in ops:
+        if op.id not in before:
+            batch.fail(index, "not_found", "Training session not found", op.id)
+        elif last[op.id] == index:
+            try:
+                rows[op.id] = _session_values(op)
+            except ValueError as e:
+                batch.fail(index, "error", str(e), op.id)
+        else:
+            batch.ok(index, op.id)
+    if len(rows) != len(last):
+        # The rows that were fine come back as rolled_back, not not_run.
+        for row_id in rows:
+            batch.ok(last[row_id], row_id)
+        raise _Rollback
+
+    fields = set(next(iter(rows.values())))
+    partitions.ensure(batch.cur, [values.get("session_date") for values in rows.values()])
+    for row in _update(batch, "training_sessions", _SESSION_TYPES, rows, "t.id, t.athlete_id, t.session_date"):
+        old = before[row["id"]]
+        batch.touched_sessions += [(old["athlete_id"], old["session_date"]), (row["athlete_id"], row["session_date"])]
+        if fields & _RECORD_FIELDS:
+            batch.sessions_to_sync.add(row["id"])
+        batch.ok(last[row["id"]], row["id"])
+    batch.tables.add("training_sessions")
+
+
+def _session_delete(batch: _Batch, ops: list[tuple[int, Any]]) -> None:
+    batch.cur.execute(
+        "DELETE FROM training_sessions WHERE id = ANY(%s) RETURNING id, athlete_id, session_date",
+        ([op.id for _, op in ops],),
+    )
+    deleted = {row["id"]: row for row in batch.cur.fetchall()}
+    for index, op in ops:
+        if op.id in deleted:
+            batch.ok(index, op.id)
+        else:
+            batch.fail(index, "not_found", "Training session not found", op.id)
+    for row in deleted.values():
+        batch.touched_sessions.append((row["athlete_id"], row["session_date"]))
+        batch.sessions_to_sync.add(row["id"])
+    batch.tables.add("training_sessions")
+    if len(deleted) != len({op.id for _, op in ops}):
+        raise _Rollback
+
+
+# --- evaluations ---
+
+
+def _evaluation_create(batch: _Batch, ops: list[tuple[int, Any]]) -> None:
+    rows = [op.data.model_dump(include=set(_EVALUATION_TYPES)) for _, op in ops]
+    for (index, _), row in zip(ops, _insert(batch, "evaluations", _EVALUATION_TYPES, rows, "id")):
+        batch.ok(index, row["id"])
+    batch.tables.add("evaluations")
+
+
+def _evaluation_update(batch: _Batch, ops: list[tuple[int, Any]]) -> None:
+    last = _last_per_id(ops)
+    rows = {
+        op.id: {f: getattr(op.data, f) for f in sorted(op.data.model_fields_set) if f in _EVALUATION_TYPES}
+        for index, op in ops
+        if last[op.id] == index
+    }
+    updated = {row["id"] for row in _update(batch, "evaluations", _EVALUATION_TYPES, rows, "t.id")}
+    for index, op in ops:
+        if op.id in updated:
+            batch.ok(index, op.id)
+        else:
+            batch.fail(index, "not_found", "Evaluation not found", op.id)
+    batch.tables.add("evaluations")
+    if len(updated) != len(rows):
+        raise _Rollback
+
+
+def _simple_delete(
+    table: str, label: str, tags: tuple[str, ...], billing_month: str | None = None
+) -> Callable[[_Batch, list[tuple[int, Any]]], None]:
+    """Delete by id. With `billing_month`, the rows' (athlete_id, month) ledger rows are refreshed."""
+
+    returning = f"id, athlete_id, {billing_month} AS month" if billing_month else "id"
+
+    def run(batch: _Batch, ops: list[tuple[int, Any]]) -> None:
+        batch.cur.execute(f"DELETE FROM {table} WHERE id = ANY(%s) RETURNING {returning}", ([op.id for _, op in ops],))
+        rows = batch.cur.fetchall()
+        deleted = {row["id"] for row in rows}
+        if billing_month:
+            batch.touched_billing += [(row["athlete_id"], row["month"]) for row in rows]
+        for index, op in ops:
+            if op.id in deleted:
+                batch.ok(index, op.id)
+            else:
+                batch.fail(index, "not_found", f"{label} not found", op.id)
+        batch.tables.update(tags)
+        if len(deleted) != len({op.id for _, op in ops}):
+            raise _Rollback
+
+    return run
+
+
+# --- payments ---
+
+
+def _mark_paid(batch: _Batch, ops: list[tuple[int, Any]]) -> None:
+    by_month: dict[date, list[tuple[int, Any]]] = {}
+    for index, op in ops:
+        by_month.setdefault(_month_start(op.data.month), []).append((index, op))
+
+    missing = False
+    for month, month_ops in by_month.items():
+        rows = _upsert_paid(batch.cur, month, [(op.data.athlete_id, op.data.paid_amount) for _, op in month_ops])
+        paid = {row["athlete_id"]: row["id"] for row in rows}
+        batch.touched_billing += [(athlete_id, month) for athlete_id in paid]
+        for index, op in month_ops:
+            if op.data.athlete_id in paid:
+                batch.ok(index, paid[op.data.athlete_id])
+            else:
+                batch.fail(index, "not_found", "Athlete not found")
+                missing = True
+    batch.tables.add("payments")
+    if missing:
+        raise _Rollback
+
+
+def _adjustment_create(batch: _Batch, ops: list[tuple[int, Any]]) -> None:
+    rows = [
+        {
+            "athlete_id": op.data.athlete_id,
+            "applies_month": _month_start(op.data.applies_month),
+            "amount": op.data.amount,
+            "reason": op.data.reason,
+            "related_session_id": op.data.related_session_id,
+        }
+        for _, op in ops
+    ]
+    for (index, _), row in zip(ops, _insert(batch, "payment_adjustments", _ADJUSTMENT_TYPES, rows, "id")):
+        batch.ok(index, row["id"])
+    batch.touched_billing += [(row["athlete_id"], row["applies_month"]) for row in rows]
+    batch.tables.add("payment_adjustments")
+
+
+_EXECUTORS: dict[str, Callable[[_Batch, list[tuple[int, Any]]], None]] = {
+    "session.create": _session_create,
+    "session.update": _session_update,
+    "session.delete": _session_delete,
+    "evaluation.create": _evaluation_create,
+    "evaluation.update": _evaluation_update,
+    "evaluation.delete": _simple_delete("evaluations", "Evaluation", ("evaluations",)),
+    "payment.mark_paid": _mark_paid,
+    "adjustment.create": _adjustment_create,
+    "adjustment.delete": _simple_delete(
+        "payment_adjustments", "Adjustment", ("payment_adjustments",), billing_month="applies_month"
+    ),
+}
+
+
+def _group_key(op: Any) -> tuple[Any, ...]:
+    # Consecutive operations of the same kind (and, for updates, the same fields)
+    # run as one statement; order across groups is preserved.
+    if op.op == "session.update":
+        return (op.op, tuple(sorted(k for k, v in op.data.model_dump().items() if v is not None)))
+    if op.op == "evaluation.update":
+        return (op.op, tuple(sorted(f for f in op.data.model_fields_set if f in _EVALUATION_TYPES)))
+    return (op.op,)
+
+
+@router.post("", response_model=BatchResponse)
+def run_batch(payload: BatchRequest):
+    """Apply typed write operations in order, all in one transaction.
+
+    Either every operation succeeds and the batch is committed, or nothing is
+    written and the response (422) says which operation failed; operations after
+    the failing group are reported as `not_run`.
+    """
+
+    indexed = list(enumerate(payload.operations))
+    batch: _Batch | None = None
+    committed = False
+    try:
+        with db.transaction() as cur:
+            batch = _Batch(cur)
+            for key, group in groupby(indexed, key=lambda item: _group_key(item[1])):
+                ops = list(group)
+                if key[0].endswith(".update") and not key[1]:
+                    for index, op in ops:
+                        batch.ok(index, op.id)
+                    continue
+                try:
+                    _EXECUTORS[key[0]](batch, ops)
+                except (psycopg2.Error, partitions.MonthDetached) as e:
+                    diag = getattr(e, "diag", None)
+                    detail = (diag.message_primary if diag else None) or str(e)
+                    for index, _ in ops:
+                        batch.fail(index, "error", detail)
+                    raise _Rollback from e
+
+            rollups.refresh_sessions(cur, batch.touched_sessions)
+            billing.refresh_ledger(cur, [*batch.touched_sessions, *batch.touched_billing])
+            for session_id in sorted(batch.sessions_to_sync):
+                records.sync_session(cur, session_id)
+        committed = True
+    except _Rollback:
+        pass
+
+    assert batch is not None
+    if committed:
+        cache.invalidate(*batch.tables)
+
+    results = []
+    for index, op in indexed:
+        result = batch.results.get(index)
+        if result is None or (not committed and result["status"] == "ok"):
+            # Ids of rolled-back inserts were never committed; updates and deletes keep their target.
+            row_id = getattr(op, "id", None) if result is not None else None
+            result = {"status": "not_run" if result is None else "rolled_back", "id": row_id}
+        results.append({"index": index, "op": op.op, **result})
+
+    body = {"committed": committed, "results": results}
+    if committed:
+        return body
+    return JSONResponse(status_code=422, content=jsonable_encoder(body))
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Any
+
+from fastapi import APIRouter, Query
+
+from backend import db
+from backend.cache import cache
+from backend.schemas import Dashboard
+from backend.settings import settings
+
+
+router = APIRouter()
+
+
+def _status_counts(row: dict[str, Any], prefix: str) -> dict[str, int]:
+    return {k: int(row[f"{prefix}_{k}"] or 0) for k in ("total", "scheduled", "completed", "cancelled")}
+
+
+def _rate(part: int, whole: int) -> float | None:
+    return round(part / whole, 4) if whole else None
+
+
+def _compute(today: date, recent_limit: int) -> dict[str, Any]:
+    row = db.fetch_one(
+        """
+        WITH bounds AS (
+            SELECT %(today)s::date AS today,
+                   date_trunc('week', %(today)s::date)::date AS week_start,
+                   date_trunc('month', %(today)s::date)::date AS month_start
+        ),
+        sessions AS (
+            SELECT
+                COUNT(*) FILTER (WHERE ts.session_date = b.today) AS today_total,
+                COUNT(*) FILTER (WHERE ts.session_date = b.today AND ts.status = 'Scheduled') AS today_scheduled,
+                COUNT(*) FILTER (WHERE ts.session_date = b.today AND ts.status = 'Completed') AS today_completed,
+                COUNT(*) FILTER (WHERE ts.session_date = b.today AND ts.status = 'Cancelled') AS today_cancelled,
+                COUNT(*) FILTER (WHERE ts.session_date BETWEEN b.week_start AND b.week_start + 6) AS week_total,
+                COUNT(*) FILTER (WHERE ts.session_date BETWEEN b.week_start AND b.week_start + 6
+                                   AND ts.status = 'Scheduled') AS week_scheduled,
+                COUNT(*) FILTER (WHERE ts.session_date BETWEEN b.week_start AND b.week_start + 6
+                                   AND ts.status = 'Completed') AS week_completed,
+                COUNT(*) FILTER (WHERE ts.session_date BETWEEN b.week_start AND b.week_start + 6
+                                   AND ts.status = 'Cancelled') AS week_cancelled,
+                COUNT(*) FILTER (WHERE date_trunc('month', ts.session_date) = b.month_start) AS month_total,
+                COUNT(*) FILTER (WHERE date_trunc('month', ts.session_date) = b.month_start
+                                   AND ts.status = 'Scheduled') AS month_scheduled,
+                COUNT(*) FILTER (WHERE date_trunc('month', ts.session_date) = b.month_start
+                                   AND ts.status = 'Completed') AS month_completed,
+                COUNT(*) FILTER (WHERE date_trunc('month', ts.session_date) = b.month_start
+                                   AND ts.status = 'Cancelled') AS month_cancelled,
+                COUNT(*) FILTER (WHERE date_trunc('month', ts.session_date) = b.month_start
+                                   AND ts.session_date <= b.today AND ts.status = 'Completed') AS month_to_date_completed,
+                COUNT(*) FILTER (WHERE date_trunc('month', ts.session_date) = b.month_start
+                                   AND ts.session_date <= b.today AND ts.status = 'Cancelled') AS month_to_date_cancelled
+            FROM training_sessions ts, bounds b
+            WHERE ts.session_date BETWEEN LEAST(b.week_start, b.month_start)
+                                      AND GREATEST(b.week_start + 6, (b.month_start + interval '1 month - 1 day')::date)
+        ),
+        unpaid AS (
+            SELECT COUNT(*) AS unpaid_count,
+                   COALESCE(
+                       json_agg(
+                           json_build_object(
+                               'athlete_id', a.id,
+                               'athlete_first_name', a.first_name,
+                               'athlete_last_name', a.last_name
+                           )
+                           ORDER BY a.first_name, a.last_name
+                       ),
+                       '[]'::json
+                   ) AS unpaid_athletes
+            FROM athletes a, bounds b
+            WHERE NOT EXISTS (
+                SELECT 1 FROM payments p
+                WHERE p.athlete_id = a.id AND p.month = b.month_start AND p.status = 'paid'
+            )
+        ),
+        adjustments AS (
+            SELECT COALESCE(SUM(pa.amount) FILTER (WHERE pa.amount < 0), 0) AS credits_month,
+                   COALESCE(SUM(pa.amount) FILTER (WHERE pa.amount > 0), 0) AS charges_month
+            FROM payment_adjustments pa, bounds b
+            WHERE pa.applies_month = b.month_start
+        ),
+        recent AS (
+            SELECT COALESCE(json_agg(r ORDER BY r.evaluation_date DESC, r.id DESC), '[]'::json) AS recent_evaluations
+            FROM (
+                SELECT e.id, e.athlete_id, a.first_name AS athlete_first_name, a.last_name AS athlete_last_name,
+                       e.evaluation_date, e.weight, e.fat_percentage, e.muscle_percentage
+                FROM evaluations e
+                JOIN athletes a ON e.athlete_id = a.id
+                ORDER BY e.evaluation_date DESC, e.id DESC
+                LIMIT %(recent_limit)s
+            ) r
+        )
+        SELECT * FROM bounds, sessions, unpaid, adjustments, recent
+        """,
+        {"today": today, "recent_limit": recent_limit},
+    )
+    assert row is not None
+
+    done = int(row["month_to_date_completed"] or 0)
+    cancelled = int(row["month_to_date_cancelled"] or 0)
+    return {
+        "today": row["today"],
+        "week_start": row["week_start"],
+        "month_start": row["month_start"],
+        "sessions_today": _status_counts(row, "today"),
+        "sessions_week": _status_counts(row, "week"),
+        "sessions_month": _status_counts(row, "month"),
+        "completion_rate_month": _rate(done, done + cancelled),
+        "cancellation_rate_month": _rate(cancelled, done + cancelled),
+        "unpaid_athletes_count": int(row["unpaid_count"] or 0),
+        "unpaid_athletes": row["unpaid_athletes"],
+        "credits_month": float(row["credits_month"]),
+        "charges_month": float(row["charges_month"]),
+        "recent_evaluations": row["recent_evaluations"],
+    }
+
+
+@router.get("", response_model=Dashboard)
+def get_dashboard(
+    today: date | None = Query(default=None, description="Defaults to the server's current date"),
+    recent_limit: int = Query(default=5, ge=1, le=50),
+):
+    day = today or date.today()
+    return cache.get_or_set(
+        ("dashboard", day, recent_limit),
+        settings.dashboard_cache_ttl_seconds,
+        ("athletes", "training_sessions", "payments", "payment_adjustments", "evaluations"),
+        lambda: _compute(day, recent_limit),
+    )
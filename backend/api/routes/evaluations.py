@@ -5,8 +5,17 @@ from typing import Any
 
 from fastapi import APIRouter, HTTPException, Query
 
-from backend import db
-from backend.schemas import Evaluation, EvaluationCreate, EvaluationUpdate, IdResponse
+from backend import db, trends
+from backend.api.writes import delete_row, update_row
+from backend.cache import cache
+from backend.schemas import (
+    Evaluation,
+    EvaluationCreate,
+    EvaluationTrends,
+    EvaluationUpdate,
+    EvaluationUpdateResult,
+    IdResponse,
+)
 
 
 router = APIRouter()
@@ -49,6 +58,57 @@ def list_evaluations(
     )
 
 
+@router.get("/trends", response_model=EvaluationTrends)
+def get_evaluation_trends(
+    athlete_id: int | None = Query(default=None, ge=1, description="Omit for every athlete (cohort report)"),
+    start: date | None = Query(default=None),
+    end: date | None = Query(default=None),
+    window: int = Query(default=3, ge=2, le=24, description="Evaluations per rolling window"),
+    include_series: bool | None = Query(default=None, description="Per-evaluation rolling values; default only for one athlete"),
+):
+    where: list[str] = []
+    params: list[Any] = []
+    if athlete_id is not None:
+        where.append("e.athlete_id = %s")
+        params.append(athlete_id)
+    if start is not None:
+        where.append("e.evaluation_date >= %s")
+        params.append(start)
+    if end is not None:
+        where.append("e.evaluation_date <= %s")
+        params.append(end)
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+    rows = db.fetch_all(
+        f"""
+        SELECT e.athlete_id, e.evaluation_date, {', '.join(f"e.{m}" for m in trends.METRICS)}
+        FROM evaluations e
+        {where_sql}
+        ORDER BY e.athlete_id ASC, e.evaluation_date ASC, e.id ASC
+        """,
+        tuple(params),
+    )
+
+    batch = trends.build_batch(rows, window)
+    summaries = trends.summarize(batch)
+    if include_series if include_series is not None else athlete_id is not None:
+        for i, summary in enumerate(summaries):
+            summary["series"] = trends.series(batch, i)
+
+    if summaries:
+        names = db.fetch_all(
+            "SELECT id, first_name, last_name FROM athletes WHERE id = ANY(%s)",
+            ([s["athlete_id"] for s in summaries],),
+        )
+        by_id = {n["id"]: n for n in names}
+        for summary in summaries:
+            athlete = by_id.get(summary["athlete_id"], {})
+            summary["athlete_first_name"] = athlete.get("first_name")
+            summary["athlete_last_name"] = athlete.get("last_name")
+
+    return {"window": window, "athletes": summaries, "cohort": trends.cohort(summaries)}
+
+
 @router.post("", response_model=IdResponse)
 def create_evaluation(payload: EvaluationCreate):
     evaluation_id = db.execute_returning_id(
@@ -72,27 +132,20 @@ def create_evaluation(payload: EvaluationCreate):
             payload.notes,
         ),
     )
+    cache.invalidate("evaluations")
     return {"id": evaluation_id}
 
 
 @router.delete("/{evaluation_id}")
 def delete_evaluation(evaluation_id: int):
-    existing = db.fetch_one("SELECT id FROM evaluations WHERE id = %s", (evaluation_id,))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Evaluation not found")
-    db.execute("DELETE FROM evaluations WHERE id = %s", (evaluation_id,))
+    with db.transaction() as cur:
+        delete_row(cur, "evaluations", evaluation_id, not_found="Evaluation not found")
+    cache.invalidate("evaluations")
     return {"deleted": True}
 
 
-@router.patch("/{evaluation_id}")
+@router.patch("/{evaluation_id}", response_model=EvaluationUpdateResult)
 def update_evaluation(evaluation_id: int, payload: EvaluationUpdate):
-    existing = db.fetch_one("SELECT id FROM evaluations WHERE id = %s", (evaluation_id,))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Evaluation not found")
-
-    set_clauses: list[str] = []
-    params: list[object] = []
-
     allowed_fields = {
         "athlete_id",
         "evaluation_date",
@@ -105,21 +158,27 @@ def update_evaluation(evaluation_id: int, payload: EvaluationUpdate):
     }
 
     # Only update fields explicitly provided by the client. This allows clearing values by sending null.
-    for field_name in payload.model_fields_set:
-        if field_name not in allowed_fields:
-            continue
-        value = getattr(payload, field_name)
-        set_clauses.append(f"{field_name} = %s")
-        params.append(value)
-
-    if not set_clauses:
-        return {"updated": False}
-
-    params.append(evaluation_id)
+    values = {name: getattr(payload, name) for name in payload.model_fields_set if name in allowed_fields}
 
     try:
-        db.execute(f"UPDATE evaluations SET {', '.join(set_clauses)} WHERE id = %s", tuple(params))
+        with db.transaction() as cur:
+            evaluation = update_row(
+                cur,
+                "evaluations",
+                evaluation_id,
+                values,
+                returning="""
+                    t.*,
+                    (SELECT first_name FROM athletes WHERE id = t.athlete_id) AS athlete_first_name,
+                    (SELECT last_name FROM athletes WHERE id = t.athlete_id) AS athlete_last_name
+                """,
+                not_found="Evaluation not found",
+            )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    return {"updated": True}
+    if values:
+        cache.invalidate("evaluations")
+    return {"updated": bool(values), "evaluation": evaluation}
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from datetime import date
+from typing import AsyncIterator
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from backend.changefeed import TABLES, ChangeFilter, feed
+from backend.settings import settings
+
+
+router = APIRouter()
+
+
+def _sse(event: str, data: dict, event_id: int | None = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def _stream(request: Request, change_filter: ChangeFilter) -> AsyncIterator[str]:
+    # Subscribed here rather than in the handler, so a client that goes away
+    # before the first chunk never leaves a subscription behind.
+    sub = feed.subscribe(change_filter)
+    try:
+        # Clients refetch on `ready` (first connect and every reconnect), so
+        # nothing is lost between their last fetch and the subscription.
+        yield "retry: 3000\n\n" + _sse("ready", {"tables": sorted(sub.filter.tables)})
+        seq = 0
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout=settings.events_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream.
+                yield ": ping\n\n"
+                continue
+            seq += 1
+            if event.get("type") == "resync":
+                yield _sse("resync", event, seq)
+            else:
+                yield _sse("change", event, seq)
+    finally:
+        sub.close()
+
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    start: date | None = Query(default=None, description="Only events on/after this date"),
+    end: date | None = Query(default=None, description="Only events on/before this date"),
+    athlete_id: int | None = Query(default=None, ge=1),
+    tables: str | None = Query(default=None, description="Comma-separated: training_sessions,payments,athletes"),
+):
+    """Server-Sent Events stream of committed changes.
+
+    Events: `ready` (subscribed), `change` (one row changed) and `resync`
+    (events may have been missed; refetch everything).
+    """
+
+    if not settings.events_enabled:
+        raise HTTPException(status_code=404, detail="Change feed is disabled")
+    wanted = TABLES
+    if tables:
+        wanted = frozenset(t.strip() for t in tables.split(",") if t.strip())
+        if not wanted:
+            raise HTTPException(status_code=400, detail="tables must name at least one table")
+        unknown = wanted - TABLES
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(sorted(unknown))}")
+
+    return StreamingResponse(
+        _stream(request, ChangeFilter(tables=wanted, athlete_id=athlete_id, start=start, end=end)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,16 +1,155 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+from typing import Any
+
+from fastapi import APIRouter, Query
 
 from backend import db
-from backend.schemas import Exercise, ExerciseCreate, ExerciseUpdate, IdResponse
+from backend.api.writes import delete_row, update_row
+from backend.schemas import Exercise, ExerciseCatalog, ExerciseCreate, ExerciseUpdate, ExerciseUpdateResult, IdResponse
 
 router = APIRouter()
 
 
+_EXERCISE_COLUMNS = """
+    id, name, category, muscle_groups, equipment, difficulty, exercise_type,
+    sets_range, reps_range, description, instructions, tips, video_url, created_at
+"""
+
+_LIST_ITEM_COLUMNS = """
+    id, name, category, muscle_groups, equipment, difficulty, exercise_type, sets_range, reps_range
+"""
+
+# facet -> SQL predicate over a text[] parameter. Values within a facet are OR-ed,
+# facets are AND-ed. muscle_group_list / equipment_list are GIN-indexed arrays
+# generated from the comma-separated columns.
+_FACET_PREDICATES = {
+    "category": "category = ANY(%({name})s)",
+    "difficulty": "difficulty = ANY(%({name})s)",
+    "exercise_type": "exercise_type = ANY(%({name})s)",
+    "equipment": "equipment_list && %({name})s::text[]",
+    "muscle_group": "muscle_group_list && %({name})s::text[]",
+}
+
+
+def _clean(values: list[str] | None) -> list[str] | None:
+    if not values:
+        return None
+    cleaned = [v.strip() for raw in values for v in raw.split(",") if v.strip()]
+    return cleaned or None
+
+
+def _filters(**selected: list[str] | None) -> tuple[dict[str, str], dict[str, Any]]:
+    predicates: dict[str, str] = {}
+    params: dict[str, Any] = {}
+    for facet, values in selected.items():
+        values = _clean(values)
+        if values is None:
+            continue
+        predicates[facet] = _FACET_PREDICATES[facet].format(name=facet)
+        params[facet] = values
+    return predicates, params
+
+
+def _where(predicates: dict[str, str], exclude: str | None = None) -> str:
+    parts = [p for facet, p in predicates.items() if facet != exclude]
+    return " AND ".join(parts) if parts else "TRUE"
+
+
 @router.get("", response_model=list[Exercise])
-def list_exercises():
-    return db.fetch_all("SELECT * FROM exercises ORDER BY name")
+def list_exercises(
+    category: list[str] | None = Query(default=None),
+    difficulty: list[str] | None = Query(default=None),
+    exercise_type: list[str] | None = Query(default=None),
+    equipment: list[str] | None = Query(default=None),
+    muscle_group: list[str] | None = Query(default=None),
+):
+    predicates, params = _filters(
+        category=category,
+        difficulty=difficulty,
+        exercise_type=exercise_type,
+        equipment=equipment,
+        muscle_group=muscle_group,
+    )
+    return db.fetch_all(
+        f"SELECT {_EXERCISE_COLUMNS} FROM exercises WHERE {_where(predicates)} ORDER BY name",
+        params,
+    )
+
+
+@router.get("/catalog", response_model=ExerciseCatalog)
+def exercise_catalog(
+    category: list[str] | None = Query(default=None),
+    difficulty: list[str] | None = Query(default=None),
+    exercise_type: list[str] | None = Query(default=None),
+    equipment: list[str] | None = Query(default=None),
+    muscle_group: list[str] | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
+):
+    """Lean, filtered catalog page plus facet counts.
+
+    Each facet is counted with every filter applied except its own, so the UI can
+    show how many exercises each alternative value would give.
+    """
+
+    predicates, params = _filters(
+        category=category,
+        difficulty=difficulty,
+        exercise_type=exercise_type,
+        equipment=equipment,
+        muscle_group=muscle_group,
+    )
+
+    items = db.fetch_all(
+        f"""
+        SELECT {_LIST_ITEM_COLUMNS}, COUNT(*) OVER () AS total
+        FROM exercises
+        WHERE {_where(predicates)}
+        ORDER BY name
+        LIMIT %(limit)s OFFSET %(offset)s
+        """,
+        {**params, "limit": limit, "offset": offset},
+    )
+
+    facet_rows = db.fetch_all(
+        f"""
+        SELECT facet, value, COUNT(*)::int AS count
+        FROM (
+            SELECT 'category' AS facet, category AS value
+            FROM exercises WHERE {_where(predicates, exclude="category")}
+            UNION ALL
+            SELECT 'difficulty', difficulty
+            FROM exercises WHERE {_where(predicates, exclude="difficulty")}
+            UNION ALL
+            SELECT 'exercise_type', exercise_type
+            FROM exercises WHERE {_where(predicates, exclude="exercise_type")}
+            UNION ALL
+            SELECT 'equipment', unnest(equipment_list)
+            FROM exercises WHERE {_where(predicates, exclude="equipment")}
+            UNION ALL
+            SELECT 'muscle_group', unnest(muscle_group_list)
+            FROM exercises WHERE {_where(predicates, exclude="muscle_group")}
+        ) f
+        WHERE value IS NOT NULL AND value <> ''
+        GROUP BY facet, value
+        ORDER BY facet, count DESC, value
+        """,
+        params,
+    )
+
+    facets: dict[str, list[dict[str, Any]]] = {facet: [] for facet in _FACET_PREDICATES}
+    for row in facet_rows:
+        facets[row["facet"]].append({"value": row["value"], "count": row["count"]})
+
+    if items:
+        total = int(items[0]["total"])
+    elif offset:
+        # COUNT(*) OVER () only sees the page; an offset past the end needs its own count.
+        total = int(db.fetch_one(f"SELECT COUNT(*) AS total FROM exercises WHERE {_where(predicates)}", params)["total"])
+    else:
+        total = 0
+    return {"total": total, "items": items, "facets": facets}
 
 
 @router.post("", response_model=IdResponse)
@@ -45,19 +184,15 @@ def create_exercise(payload: ExerciseCreate):
 
 @router.delete("/{exercise_id}")
 def delete_exercise(exercise_id: int):
-    row = db.fetch_one("SELECT id FROM exercises WHERE id = %s", (exercise_id,))
-    if not row:
-        raise HTTPException(status_code=404, detail="Exercise not found")
-    db.execute("DELETE FROM exercises WHERE id = %s", (exercise_id,))
+    with db.transaction() as cur:
+        # Compact session history may point at this exercise by id.
+        cur.execute("SELECT inline_exercise_references(%s)", (exercise_id,))
+        delete_row(cur, "exercises", exercise_id, not_found="Exercise not found")
     return {"deleted": True}
 
 
-@router.patch("/{exercise_id}")
+@router.patch("/{exercise_id}", response_model=ExerciseUpdateResult)
 def update_exercise(exercise_id: int, payload: ExerciseUpdate):
-    existing = db.fetch_one("SELECT id FROM exercises WHERE id = %s", (exercise_id,))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Exercise not found")
-
     allowed_fields = {
         "name",
         "category",
@@ -73,21 +208,11 @@ def update_exercise(exercise_id: int, payload: ExerciseUpdate):
         "video_url",
     }
 
-    set_clauses: list[str] = []
-    params: list[object] = []
-
-    for field_name in payload.model_fields_set:
-        if field_name not in allowed_fields:
-            continue
-        value = getattr(payload, field_name)
-        set_clauses.append(f"{field_name} = %s")
-        params.append(value)
-
-    if not set_clauses:
-        return {"updated": False}
+    values = {name: getattr(payload, name) for name in payload.model_fields_set if name in allowed_fields}
 
-    params.append(exercise_id)
-    db.execute(
-        f"UPDATE exercises SET {', '.join(set_clauses)} WHERE id = %s", tuple(params)
-    )
-    return {"updated": True}
+    with db.transaction() as cur:
+        if "name" in values:
+            # Sessions already completed keep the name they were recorded with.
+            cur.execute("SELECT inline_exercise_references(%s)", (exercise_id,))
+        exercise = update_row(cur, "exercises", exercise_id, values, not_found="Exercise not found")
+    return {"updated": bool(values), "exercise": exercise}
@@ -2,10 +2,18 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
+from backend import db
+
 
 router = APIRouter()
 
 
 @router.get("/health")
-def health():
-    return {"status": "ok"}
+def health(replicas: bool = False, statements: bool = False):
+    out: dict = {"status": "ok"}
+    if replicas:
+        out["replicas"] = db.replica_status()
+    if statements:
+        # Prepared hot queries: calls, prepares and execution time in this worker.
+        out["statements"] = db.statement_stats()
+    return out
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Query
+
+from backend import db, jobs
+from backend.schemas import Job, JobCreate
+
+
+router = APIRouter()
+
+
+@router.get("", response_model=list[Job])
+def list_jobs(
+    status: str | None = Query(default=None, description="queued | running | succeeded | failed"),
+    kind: str | None = None,
+    limit: int = Query(default=50, ge=1, le=500),
+):
+    where = []
+    params: list[Any] = []
+    if status:
+        where.append("status = %s")
+        params.append(status)
+    if kind:
+        where.append("kind = %s")
+        params.append(kind)
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+    return db.fetch_all(
+        f"SELECT {jobs.JOB_COLUMNS} FROM jobs {where_sql} ORDER BY id DESC LIMIT %s",
+        (*params, limit),
+    )
+
+
+@router.get("/{job_id}", response_model=Job)
+def get_job(job_id: int):
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("", response_model=Job, status_code=202)
+def create_job(payload: JobCreate):
+    try:
+        return jobs.enqueue(payload.kind, payload.params, run_at=payload.run_at, dedupe_key=payload.dedupe_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -4,14 +4,22 @@ from datetime import date
 from decimal import Decimal
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 
-from backend import db
+from backend import billing, db, jobs
+from backend.api.http_cache import json_with_etag
+from backend.api.writes import delete_row
+from backend.cache import cache
 from backend.schemas import (
+    AthleteBalance,
+    AthleteStatement,
     IdResponse,
+    Job,
     PaymentAdjustment,
     PaymentAdjustmentCreate,
     PaymentMarkPaid,
+    PaymentMarkPaidBulk,
+    PaymentMarkPaidBulkResult,
     PaymentSummary,
 )
 
@@ -19,24 +27,64 @@ from backend.schemas import (
 router = APIRouter()
 
 
-def _month_start(value: date) -> date:
-    return date(value.year, value.month, 1)
+# Run on every Payments page load (the count once per on_demand athlete).
+# Plans come from plan_history as of the requested month, not the athlete's
+# current plan, so a closed month's amounts don't change when a plan is edited.
+_BILLING_ATHLETES = db.statement(
+    "payments_athletes",
+    """
+    SELECT a.id, a.first_name, a.last_name,
+           plan.plan_type, plan.plan_sessions_per_week, plan.plan_monthly_price, plan.plan_on_demand_price
+    FROM athletes a
+    LEFT JOIN LATERAL plan_in_effect(a.id, %s) plan ON TRUE
+    ORDER BY a.first_name, a.last_name
+    """,
+)
+_ADJUSTMENT_TOTALS = db.statement(
+    "payments_adjustment_totals",
+    """
+    SELECT athlete_id, COALESCE(SUM(amount), 0) AS total
+    FROM payment_adjustments
+    WHERE applies_month = %s
+    GROUP BY athlete_id
+    """,
+)
+_MONTH_PAYMENTS = db.statement(
+    "payments_month_rows",
+    """
+    SELECT athlete_id, status, paid_amount, paid_at
+    FROM payments
+    WHERE month = %s
+    """,
+)
+_COMPLETED_SESSIONS = db.statement(
+    "payments_completed_sessions",
+    """
+    SELECT COUNT(*)::int AS cnt
+    FROM training_sessions_all
+    WHERE athlete_id = %s
+      AND session_date BETWEEN %s AND %s
+      AND status = 'Completed'
+    """,
+)
 
 
-def _prev_month_range(month: date) -> tuple[date, date]:
-    start = _month_start(month)
-    if start.month == 1:
-        prev_start = date(start.year - 1, 12, 1)
-    else:
-        prev_start = date(start.year, start.month - 1, 1)
+# billing_ledger months with the amount actually paid and the running balance
+# (dues minus payments, carried forward). A payment marked paid without an
+# amount settles the month in full.
+_LEDGER_RUNNING = """
+    SELECT l.athlete_id, l.month, l.plan_type, l.completed_sessions, l.base_amount,
+           l.adjustments_total, l.total_due, l.status, paid.amount AS paid_amount,
+           SUM(l.total_due - paid.amount) OVER (PARTITION BY l.athlete_id ORDER BY l.month) AS balance
+    FROM billing_ledger l
+    CROSS JOIN LATERAL (
+        SELECT CASE WHEN l.status = 'paid' THEN COALESCE(l.paid_amount, l.total_due) ELSE 0 END AS amount
+    ) paid
+"""
 
-    if prev_start.month == 12:
-        next_start = date(prev_start.year + 1, 1, 1)
-    else:
-        next_start = date(prev_start.year, prev_start.month + 1, 1)
 
-    prev_end = next_start.fromordinal(next_start.toordinal() - 1)
-    return prev_start, prev_end
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
 
 
 def _dec(v: Any) -> Decimal:
@@ -66,16 +114,7 @@ def _plan_base_amount(month: date, athlete_row: dict[str, Any]) -> Decimal:
             next_month = date(month_start.year, month_start.month + 1, 1)
         month_end = next_month.fromordinal(next_month.toordinal() - 1)
 
-        row = db.fetch_one(
-            """
-            SELECT COUNT(*)::int AS cnt
-            FROM training_sessions
-            WHERE athlete_id = %s
-              AND session_date BETWEEN %s AND %s
-              AND status = 'Completed'
-            """,
-            (athlete_row["id"], month_start, month_end),
-        )
+        row = db.fetch_one(_COMPLETED_SESSIONS, (athlete_row["id"], month_start, month_end))
         cnt = int(row["cnt"]) if row and row.get("cnt") is not None else 0
         return per_session * Decimal(cnt)
 
@@ -83,39 +122,23 @@ def _plan_base_amount(month: date, athlete_row: dict[str, Any]) -> Decimal:
 
 
 @router.get("", response_model=list[PaymentSummary])
-def list_payments(month: date = Query(..., description="First day of the month (YYYY-MM-01)")):
+def list_payments(request: Request, month: date = Query(..., description="First day of the month (YYYY-MM-01)")):
+    """Amounts due and paid per athlete for one month.
+
+    Responses carry an ETag; a client that sends it back in If-None-Match gets
+    an empty 304 while the month's figures are unchanged.
+    """
+
     month = _month_start(month)
 
-    athletes = db.fetch_all(
-        """
-        SELECT id, first_name, last_name,
-               plan_type, plan_sessions_per_week, plan_monthly_price, plan_on_demand_price
-        FROM athletes
-        ORDER BY first_name, last_name
-        """
-    )
+    athletes = db.fetch_all(_BILLING_ATHLETES, (month,))
 
     # Preload adjustments totals for that month
-    adj_rows = db.fetch_all(
-        """
-        SELECT athlete_id, COALESCE(SUM(amount), 0) AS total
-        FROM payment_adjustments
-        WHERE applies_month = %s
-        GROUP BY athlete_id
-        """,
-        (month,),
-    )
+    adj_rows = db.fetch_all(_ADJUSTMENT_TOTALS, (month,))
     adj_map = {int(r["athlete_id"]): _dec(r["total"]) for r in adj_rows}
 
     # Preload payments rows
-    pay_rows = db.fetch_all(
-        """
-        SELECT athlete_id, status, paid_amount, paid_at
-        FROM payments
-        WHERE month = %s
-        """,
-        (month,),
-    )
+    pay_rows = db.fetch_all(_MONTH_PAYMENTS, (month,))
     pay_map = {int(r["athlete_id"]): r for r in pay_rows}
 
     out: list[PaymentSummary] = []
@@ -143,7 +166,110 @@ def list_payments(month: date = Query(..., description="First day of the month (
             )
         )
 
-    return out
+    return json_with_etag(request, out)
+
+
+@router.get("/balances", response_model=list[AthleteBalance])
+def list_balances(
+    as_of: date | None = Query(default=None, description="Last month included (YYYY-MM-01); defaults to this month"),
+    owing_only: bool = Query(default=False, description="Only athletes with a positive balance"),
+):
+    """Outstanding balance per athlete, carried over across months, in one query.
+
+    Reads `billing_ledger`, which the write paths keep current (see
+    backend/billing.py). `owing_since` is the first month after the balance
+    was last settled.
+    """
+
+    as_of = _month_start(as_of or date.today())
+    return db.fetch_all(
+        f"""
+        WITH running AS (
+            {_LEDGER_RUNNING}
+            WHERE l.month <= %(as_of)s
+        ),
+        marked AS (
+            SELECT r.*,
+                   MAX(r.month) FILTER (WHERE r.balance <= 0) OVER (PARTITION BY r.athlete_id) AS last_settled
+            FROM running r
+        ),
+        summary AS (
+            SELECT athlete_id,
+                   SUM(total_due - paid_amount) AS balance,
+                   SUM(total_due - paid_amount) FILTER (WHERE month < %(as_of)s) AS carried_over,
+                   SUM(total_due) FILTER (WHERE month = %(as_of)s) AS month_due,
+                   SUM(paid_amount) FILTER (WHERE month = %(as_of)s) AS month_paid,
+                   COUNT(*) FILTER (WHERE total_due > paid_amount)::int AS months_unpaid,
+                   MIN(month) FILTER (WHERE last_settled IS NULL OR month > last_settled) AS owing_since,
+                   MAX(month) FILTER (WHERE paid_amount > 0) AS last_paid_month
+            FROM marked
+            GROUP BY athlete_id
+        )
+        SELECT a.id AS athlete_id,
+               a.first_name AS athlete_first_name,
+               a.last_name AS athlete_last_name,
+               COALESCE(s.balance, 0) AS balance,
+               COALESCE(s.carried_over, 0) AS carried_over,
+               COALESCE(s.month_due, 0) AS month_due,
+               COALESCE(s.month_paid, 0) AS month_paid,
+               COALESCE(s.months_unpaid, 0) AS months_unpaid,
+               CASE WHEN s.balance > 0 THEN s.owing_since END AS owing_since,
+               s.last_paid_month
+        FROM athletes a
+        LEFT JOIN summary s ON s.athlete_id = a.id
+        WHERE NOT %(owing_only)s OR s.balance > 0
+        ORDER BY a.first_name, a.last_name
+        """,
+        {"as_of": as_of, "owing_only": owing_only},
+    )
+
+
+@router.get("/athletes/{athlete_id}/statement", response_model=AthleteStatement)
+def athlete_statement(
+    athlete_id: int,
+    limit: int = Query(default=12, ge=1, le=120),
+    offset: int = Query(default=0, ge=0),
+):
+    """One athlete's ledger, newest month first, with the running balance.
+
+    The balance is computed over the whole history before paging, so every
+    page shows the same carried-over amounts.
+    """
+
+    rows = db.fetch_all(
+        f"""
+        SELECT r.*,
+               COUNT(*) OVER () AS total,
+               FIRST_VALUE(r.balance) OVER (ORDER BY r.month DESC) AS closing_balance
+        FROM ({_LEDGER_RUNNING} WHERE l.athlete_id = %(athlete_id)s) r
+        ORDER BY r.month DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+        """,
+        {"athlete_id": athlete_id, "limit": limit, "offset": offset},
+    )
+    if rows:
+        return {
+            "athlete_id": athlete_id,
+            "balance": rows[0]["closing_balance"],
+            "total": rows[0]["total"],
+            "items": rows,
+        }
+
+    # Past the last page, or nothing billed yet.
+    summary = db.fetch_one(
+        """
+        SELECT a.id,
+               (SELECT COUNT(*) FROM billing_ledger WHERE athlete_id = a.id) AS total,
+               (SELECT COALESCE(SUM(total_due - CASE WHEN status = 'paid' THEN COALESCE(paid_amount, total_due) ELSE 0 END), 0)
+                FROM billing_ledger WHERE athlete_id = a.id) AS balance
+        FROM athletes a
+        WHERE a.id = %s
+        """,
+        (athlete_id,),
+    )
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Athlete not found")
+    return {"athlete_id": athlete_id, "balance": summary["balance"], "total": summary["total"], "items": []}
 
 
 @router.get("/adjustments", response_model=list[PaymentAdjustment])
@@ -173,148 +299,117 @@ def list_adjustments(
 
 @router.post("/adjustments", response_model=IdResponse)
 def create_adjustment(payload: PaymentAdjustmentCreate):
-    new_id = db.execute_returning_id(
-        """
-        INSERT INTO payment_adjustments (athlete_id, applies_month, amount, reason, related_session_id)
-        VALUES (%s,%s,%s,%s,%s)
-        RETURNING id
-        """,
-        (
-            payload.athlete_id,
-            _month_start(payload.applies_month),
-            payload.amount,
-            payload.reason,
-            payload.related_session_id,
-        ),
-    )
+    month = _month_start(payload.applies_month)
+    with db.transaction() as cur:
+        cur.execute(
+            """
+            INSERT INTO payment_adjustments (athlete_id, applies_month, amount, reason, related_session_id)
+            VALUES (%s,%s,%s,%s,%s)
+            ON CONFLICT (related_session_id, applies_month) WHERE related_session_id IS NOT NULL DO NOTHING
+            RETURNING id
+            """,
+            (
+                payload.athlete_id,
+                month,
+                payload.amount,
+                payload.reason,
+                payload.related_session_id,
+            ),
+        )
+        if cur.rowcount == 0:
+            raise HTTPException(status_code=409, detail="That session already has an adjustment for this month")
+        new_id = int(cur.fetchone()["id"])
+        billing.refresh_ledger(cur, [(payload.athlete_id, month)])
+    cache.invalidate("payment_adjustments")
     return {"id": new_id}
 
 
 @router.delete("/adjustments/{adjustment_id}")
 def delete_adjustment(adjustment_id: int):
-    row = db.fetch_one("SELECT id FROM payment_adjustments WHERE id = %s", (adjustment_id,))
-    if not row:
-        raise HTTPException(status_code=404, detail="Adjustment not found")
-    db.execute("DELETE FROM payment_adjustments WHERE id = %s", (adjustment_id,))
+    with db.transaction() as cur:
+        row = delete_row(
+            cur,
+            "payment_adjustments",
+            adjustment_id,
+            returning="athlete_id, applies_month",
+            not_found="Adjustment not found",
+        )
+        billing.refresh_ledger(cur, [(row["athlete_id"], row["applies_month"])])
+    cache.invalidate("payment_adjustments")
     return {"deleted": True}
 
 
-@router.post("/mark-paid")
-def mark_paid(payload: PaymentMarkPaid):
-    month = _month_start(payload.month)
+def _upsert_paid(cur: Any, month: date, items: list[tuple[int, float | None]]) -> list[dict[str, Any]]:
+    """Mark (athlete_id, paid_amount) pairs paid for `month` in one statement.
 
-    # Ensure athlete exists
-    row = db.fetch_one("SELECT id FROM athletes WHERE id = %s", (payload.athlete_id,))
-    if not row:
-        raise HTTPException(status_code=404, detail="Athlete not found")
+    Unknown athletes are skipped by the join; the caller compares the returned rows
+    with what it asked for. Later duplicates of an athlete win.
+    """
 
-    paid_amount = payload.paid_amount
+    latest = dict(items)
+    cur.execute(
+        """
+        INSERT INTO payments (athlete_id, month, status, paid_amount, paid_at)
+        SELECT a.id, %s, 'paid', v.paid_amount, NOW()
+        FROM unnest(%s::int[], %s::numeric[]) AS v(athlete_id, paid_amount)
+        JOIN athletes a ON a.id = v.athlete_id
+        ON CONFLICT (athlete_id, month) DO UPDATE
+            SET status = 'paid', paid_amount = EXCLUDED.paid_amount, paid_at = EXCLUDED.paid_at
+        RETURNING id, athlete_id, month, status, paid_amount, paid_at
+        """,
+        (_month_start(month), list(latest), list(latest.values())),
+    )
+    return cur.fetchall()
 
-    existing = db.fetch_one("SELECT id FROM payments WHERE athlete_id = %s AND month = %s", (payload.athlete_id, month))
-    if existing:
-        db.execute(
-            """
-            UPDATE payments
-            SET status = 'paid', paid_amount = %s, paid_at = NOW()
-            WHERE athlete_id = %s AND month = %s
-            """,
-            (paid_amount, payload.athlete_id, month),
-        )
-    else:
-        db.execute(
-            """
-            INSERT INTO payments (athlete_id, month, status, paid_amount, paid_at)
-            VALUES (%s,%s,'paid',%s,NOW())
-            """,
-            (payload.athlete_id, month, paid_amount),
-        )
 
+@router.post("/mark-paid")
+def mark_paid(payload: PaymentMarkPaid):
+    with db.transaction() as cur:
+        rows = _upsert_paid(cur, payload.month, [(payload.athlete_id, payload.paid_amount)])
+        billing.refresh_ledger(cur, [(row["athlete_id"], row["month"]) for row in rows])
+    if not rows:
+        raise HTTPException(status_code=404, detail="Athlete not found")
+
+    cache.invalidate("payments")
     return {"updated": True}
 
 
-@router.post("/auto-credit")
+@router.post("/mark-paid/bulk", response_model=PaymentMarkPaidBulkResult)
+def mark_paid_bulk(payload: PaymentMarkPaidBulk):
+    month = _month_start(payload.month)
+    with db.transaction() as cur:
+        rows = _upsert_paid(cur, month, [(item.athlete_id, item.paid_amount) for item in payload.items])
+        billing.refresh_ledger(cur, [(row["athlete_id"], row["month"]) for row in rows])
+
+    settled = {row["athlete_id"] for row in rows}
+    missing = sorted({item.athlete_id for item in payload.items} - settled)
+    if rows:
+        cache.invalidate("payments")
+    return {
+        "month": month,
+        "payments": sorted(rows, key=lambda r: r["athlete_id"]),
+        "missing_athlete_ids": missing,
+    }
+
+
+@router.post("/auto-credit", response_model=Job, status_code=202)
 def auto_credit_from_cancelled(
     month: date = Query(..., description="Apply credits to this month (YYYY-MM-01)"),
     athlete_id: int | None = Query(default=None, ge=1),
 ):
-    """Create credit adjustments for cancelled sessions in the previous month.
-
-    Heuristic:
-    - monthly plans: credit per cancelled session = monthly_price / (sessions_per_week * 4)
-    - on_demand plans: credit per cancelled session = on_demand_price
+    """Queue credit adjustments for cancelled sessions in the previous month.
 
-    Only creates credits for cancelled sessions that don't already have an adjustment linked.
+    Runs as an `auto_credit` job (see backend/billing.py for the heuristic); poll
+    GET /jobs/{id} for `result.created`. A request for a month/athlete that is
+    already queued or running returns that job instead of a second one.
     """
 
     month = _month_start(month)
-    prev_start, prev_end = _prev_month_range(month)
-
-    where = ["ts.status = 'Cancelled'", "ts.session_date BETWEEN %s AND %s"]
-    params: list[Any] = [prev_start, prev_end]
-
+    params: dict[str, Any] = {"month": month.isoformat()}
     if athlete_id is not None:
-        where.append("ts.athlete_id = %s")
-        params.append(athlete_id)
-
-    sessions = db.fetch_all(
-        f"""
-        SELECT ts.id, ts.athlete_id
-        FROM training_sessions ts
-        WHERE {' AND '.join(where)}
-        ORDER BY ts.session_date ASC
-        """,
-        tuple(params),
+        params["athlete_id"] = athlete_id
+    return jobs.enqueue(
+        "auto_credit",
+        params,
+        dedupe_key=f"auto_credit:{month.isoformat()}:{athlete_id or 'all'}",
     )
-
-    created = 0
-    for s in sessions:
-        # skip if already credited
-        existing = db.fetch_one(
-            """
-            SELECT id FROM payment_adjustments
-            WHERE related_session_id = %s
-              AND applies_month = %s
-            """,
-            (s["id"], month),
-        )
-        if existing:
-            continue
-
-        a = db.fetch_one(
-            """
-            SELECT id, plan_type, plan_sessions_per_week, plan_monthly_price, plan_on_demand_price
-            FROM athletes
-            WHERE id = %s
-            """,
-            (s["athlete_id"],),
-        )
-        if not a:
-            continue
-
-        plan_type = (a.get("plan_type") or "monthly").strip().lower()
-        amount = Decimal("0")
-
-        if plan_type == "monthly":
-            monthly_price = _dec(a.get("plan_monthly_price"))
-            spw = a.get("plan_sessions_per_week")
-            denom = Decimal(str(int(spw))) * Decimal("4") if spw else Decimal("0")
-            if monthly_price != 0 and denom != 0:
-                amount = -(monthly_price / denom)
-        elif plan_type == "on_demand":
-            per_session = _dec(a.get("plan_on_demand_price"))
-            if per_session != 0:
-                amount = -per_session
-
-        if amount == 0:
-            continue
-
-        db.execute(
-            """
-            INSERT INTO payment_adjustments (athlete_id, applies_month, amount, reason, related_session_id)
-            VALUES (%s,%s,%s,%s,%s)
-            """,
-            (s["athlete_id"], month, float(amount), "Crédito por sessão cancelada (mês anterior)", s["id"]),
-        )
-        created += 1
-
-    return {"created": created}
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Literal
+
+from fastapi import APIRouter, HTTPException, Query
+
+from backend import billing, db
+from backend.schemas import RevenueReport
+
+
+router = APIRouter()
+
+_FIGURES = (
+    "athlete_months",
+    "completed_sessions",
+    "base_amount",
+    "adjustments_total",
+    "cancellation_credits",
+    "billed",
+    "collected",
+    "outstanding",
+)
+
+
+def _figures(row: dict[str, Any]) -> dict[str, Any]:
+    out = {name: row[name] for name in _FIGURES}
+    out["collection_rate"] = round(float(row["collected"] / row["billed"]), 4) if row["billed"] else None
+    return out
+
+
+@router.get("/revenue", response_model=RevenueReport)
+def revenue_report(
+    start: date = Query(..., description="First month included (any day of it)"),
+    end: date = Query(..., description="Last month included (any day of it)"),
+    granularity: Literal["month", "quarter", "year"] = Query(default="month"),
+):
+    """Billed, collected and outstanding amounts per period and plan type.
+
+    Reads `billing_monthly_totals` (a few rows per month, kept current with the
+    ledger by backend/billing.py), so a multi-year range costs about as much as
+    a single month. One pass with GROUPING SETS returns the per-period rows, the
+    per-period totals, the per-plan totals and the grand total.
+    """
+
+    start, end = billing.month_start(start), billing.month_start(end)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    sums = ", ".join(f"COALESCE(SUM({name}), 0) AS {name}" for name in _FIGURES)
+    rows = db.fetch_all(
+        f"""
+        SELECT date_trunc(%(granularity)s, month)::date AS period_start, plan_type,
+               GROUPING(date_trunc(%(granularity)s, month)) = 1 AS all_periods,
+               GROUPING(plan_type) = 1 AS all_plans,
+               {sums}
+        FROM billing_monthly_totals
+        WHERE month >= %(start)s AND month <= %(end)s
+        GROUP BY GROUPING SETS (
+            (date_trunc(%(granularity)s, month), plan_type),
+            (date_trunc(%(granularity)s, month)),
+            (plan_type),
+            ()
+        )
+        ORDER BY period_start NULLS LAST, plan_type NULLS FIRST
+        """,
+        {"granularity": granularity, "start": start, "end": end},
+    )
+
+    totals = _figures({name: 0 for name in _FIGURES})
+    by_plan: list[dict[str, Any]] = []
+    periods: dict[date, dict[str, Any]] = {}
+    for row in rows:
+        if row["all_periods"] and row["all_plans"]:
+            totals = _figures(row)
+        elif row["all_periods"]:
+            by_plan.append({"plan_type": row["plan_type"], **_figures(row)})
+        elif row["all_plans"]:
+            periods[row["period_start"]] = {"period_start": row["period_start"], "totals": _figures(row), "by_plan": []}
+        else:
+            periods[row["period_start"]]["by_plan"].append({"plan_type": row["plan_type"], **_figures(row)})
+
+    return {
+        "start": start,
+        "end": end,
+        "granularity": granularity,
+        "totals": totals,
+        "by_plan": by_plan,
+        "periods": list(periods.values()),
+    }
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import re
+
+from fastapi import APIRouter, HTTPException, Query
+
+from backend import db
+from backend.schemas import SearchResponse
+
+
+router = APIRouter()
+
+
+# Each branch must call the same document functions as the expression indexes in
+# scripts/init_db.py (SEARCH_MIGRATIONS), otherwise Postgres can't use them.
+_BRANCHES = {
+    "athletes": """
+        SELECT 'athlete' AS kind, a.id,
+               a.first_name || ' ' || a.last_name AS title,
+               concat_ws(' · ', a.email, a.phone) AS subtitle,
+               NULL::date AS session_date, a.id AS athlete_id,
+               ts_rank(athlete_search_vector(a.first_name, a.last_name, a.email, a.phone), q.tsq)
+                 + word_similarity(q.norm, athlete_search_text(a.first_name, a.last_name, a.email, a.phone)) AS rank
+        FROM athletes a, q
+        WHERE athlete_search_vector(a.first_name, a.last_name, a.email, a.phone) @@ q.tsq
+           OR q.norm <%% athlete_search_text(a.first_name, a.last_name, a.email, a.phone)
+           OR athlete_search_text(a.first_name, a.last_name, a.email, a.phone) LIKE q.pattern
+    """,
+    "exercises": """
+        SELECT 'exercise' AS kind, e.id,
+               e.name AS title,
+               concat_ws(' · ', e.category, e.muscle_groups) AS subtitle,
+               NULL::date AS session_date, NULL::int AS athlete_id,
+               ts_rank(exercise_search_vector(e.name, e.category, e.muscle_groups, e.equipment), q.tsq)
+                 + word_similarity(q.norm, exercise_search_text(e.name, e.category, e.muscle_groups, e.equipment)) AS rank
+        FROM exercises e, q
+        WHERE exercise_search_vector(e.name, e.category, e.muscle_groups, e.equipment) @@ q.tsq
+           OR q.norm <%% exercise_search_text(e.name, e.category, e.muscle_groups, e.equipment)
+           OR exercise_search_text(e.name, e.category, e.muscle_groups, e.equipment) LIKE q.pattern
+    """,
+    "sessions": """
+        SELECT 'session' AS kind, ts.id,
+               ts.session_name AS title,
+               concat_ws(' · ', a.first_name || ' ' || a.last_name, ts.session_type, ts.status) AS subtitle,
+               ts.session_date, ts.athlete_id,
+               ts_rank(session_search_vector(ts.session_name, ts.session_type, ts.session_notes), q.tsq)
+                 + word_similarity(q.norm, session_search_text(ts.session_name, ts.session_type, ts.session_notes)) AS rank
+        FROM training_sessions ts
+        JOIN athletes a ON ts.athlete_id = a.id, q
+        WHERE session_search_vector(ts.session_name, ts.session_type, ts.session_notes) @@ q.tsq
+           OR q.norm <%% session_search_text(ts.session_name, ts.session_type, ts.session_notes)
+           OR session_search_text(ts.session_name, ts.session_type, ts.session_notes) LIKE q.pattern
+    """,
+}
+
+
+def _prefix_tsquery(q: str) -> str:
+    # "joa silv" -> "joa:* & silv:*" so partially typed words still match.
+    return " & ".join(f"{token}:*" for token in re.findall(r"\w+", q.lower()))
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@router.get("", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    types: str | None = Query(default=None, description="Comma-separated subset of: athletes,exercises,sessions"),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+):
+    # Repeated types would double their hits; an empty list means every type.
+    kinds = list(dict.fromkeys(t.strip() for t in (types or "").split(",") if t.strip())) or list(_BRANCHES)
+    unknown = [k for k in kinds if k not in _BRANCHES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(unknown)}")
+
+    query = q.strip()
+    if not query:
+        return {"total": 0, "items": []}
+
+    union_sql = "\nUNION ALL\n".join(_BRANCHES[k] for k in kinds)
+
+    rows = db.fetch_all(
+        f"""
+        WITH q AS (
+            SELECT to_tsquery('portuguese_unaccent', %(tsquery)s) AS tsq,
+                   lower(search_unaccent(%(q)s)) AS norm,
+                   '%%' || lower(search_unaccent(%(like)s)) || '%%' AS pattern
+        ),
+        hits AS ({union_sql})
+        -- Counted apart from the page, so an offset past the last hit still
+        -- reports the total (with a single all-NULL page row).
+        SELECT counted.total, page.*
+        FROM (SELECT COUNT(*) AS total FROM hits) counted
+        LEFT JOIN LATERAL (
+            SELECT * FROM hits
+            ORDER BY rank DESC, title ASC, id ASC
+            LIMIT %(limit)s OFFSET %(offset)s
+        ) page ON TRUE
+        """,
+        {
+            "tsquery": _prefix_tsquery(query),
+            "q": query,
+            "like": _like_escape(query),
+            "limit": limit,
+            "offset": offset,
+        },
+    )
+
+    total = int(rows[0]["total"]) if rows else 0
+    return {"total": total, "items": [row for row in rows if row["id"] is not None]}
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
 from datetime import date, datetime
+from functools import lru_cache
 from typing import Any
 
 from fastapi import APIRouter, HTTPException, Query
 
-from backend import db
-from backend.schemas import IdResponse, TrainingSession, TrainingSessionCreate, TrainingSessionUpdate
+from backend import billing, db, partitions, records, rollups
+from backend.api.writes import delete_row, update_row
+from backend.cache import cache
+from backend.schemas import (
+    IdResponse,
+    TrainingSession,
+    TrainingSessionCreate,
+    TrainingSessionUpdate,
+    TrainingSessionUpdateResult,
+)
 
 
 router = APIRouter()
@@ -22,92 +31,136 @@ def _parse_time(value: str) -> str:
     return v
 
 
-@router.get("", response_model=list[TrainingSession])
-def list_training_sessions(
-    start: date | None = Query(default=None),
-    end: date | None = Query(default=None),
-    athlete_id: int | None = Query(default=None, ge=1),
-    status: str | None = Query(default=None),
-):
-    where: list[str] = []
-    params: list[Any] = []
+def _session_columns(alias: str) -> str:
+    # completed_data is stored compactly (format v2, see scripts/init_db.py); the
+    # API always returns the expanded document.
+    return f"""
+        {alias}.id, {alias}.athlete_id, {alias}.session_name, {alias}.session_date, {alias}.session_time,
+        {alias}.duration, {alias}.session_type, {alias}.session_notes, {alias}.status, {alias}.exercises,
+        decode_completed_data({alias}.completed_data, {alias}.exercises) AS completed_data,
+        {alias}.completed_at, {alias}.created_date
+    """
+
+
+SESSION_COLUMNS = _session_columns("ts")
+
+# What PATCH and /complete return: the updated session as the list shows it.
+_SESSION_RETURNING = f"""
+    {_session_columns("t")},
+    (SELECT first_name FROM athletes WHERE id = t.athlete_id) AS athlete_first_name,
+    (SELECT last_name FROM athletes WHERE id = t.athlete_id) AS athlete_last_name
+"""
+
 
-    if start is not None and end is not None:
+def _time_to_str(row: dict[str, Any]) -> dict[str, Any]:
+    t = row.get("session_time")
+    if t is not None and not isinstance(t, str):
+        row["session_time"] = str(t)
+    return row
+
+
+@lru_cache(maxsize=None)
+def _list_statement(
+    has_start: bool, has_end: bool, has_athlete: bool, has_status: bool, archived: bool = False
+) -> db.Statement:
+    # One prepared statement per filter combination, so each gets a plan that fits it.
+    where: list[str] = []
+    if has_start and has_end:
         where.append("ts.session_date BETWEEN %s AND %s")
-        params.extend([start, end])
-    elif start is not None:
+    elif has_start:
         where.append("ts.session_date >= %s")
-        params.append(start)
-    elif end is not None:
+    elif has_end:
         where.append("ts.session_date <= %s")
-        params.append(end)
-
-    if athlete_id is not None:
+    if has_athlete:
         where.append("ts.athlete_id = %s")
-        params.append(athlete_id)
-
-    if status is not None and status.strip():
+    if has_status:
         where.append("ts.status = %s")
-        params.append(status.strip())
-
     where_sql = f"WHERE {' AND '.join(where)}" if where else ""
 
-    rows = db.fetch_all(
+    flags = "".join("1" if f else "0" for f in (has_start, has_end, has_athlete, has_status, archived))
+    return db.statement(
+        f"training_sessions_list_{flags}",
         f"""
-        SELECT ts.*, a.first_name AS athlete_first_name, a.last_name AS athlete_last_name
-        FROM training_sessions ts
+        SELECT {SESSION_COLUMNS}, a.first_name AS athlete_first_name, a.last_name AS athlete_last_name
+        FROM {'training_sessions_all' if archived else 'training_sessions'} ts
         JOIN athletes a ON ts.athlete_id = a.id
         {where_sql}
         ORDER BY ts.session_date ASC, ts.session_time ASC
         """,
-        tuple(params),
     )
 
+
+@router.get("", response_model=list[TrainingSession])
+def list_training_sessions(
+    start: date | None = Query(default=None),
+    end: date | None = Query(default=None),
+    athlete_id: int | None = Query(default=None, ge=1),
+    status: str | None = Query(default=None),
+    include_archived: bool = Query(default=False, description="Also return sessions moved to the archive"),
+):
+    params: list[Any] = []
+    if start is not None:
+        params.append(start)
+    if end is not None:
+        params.append(end)
+    if athlete_id is not None:
+        params.append(athlete_id)
+    status = status.strip() if status else None
+    if status:
+        params.append(status)
+
+    stmt = _list_statement(start is not None, end is not None, athlete_id is not None, bool(status), include_archived)
+    rows = db.fetch_all(stmt, tuple(params))
+
     # Ensure time is serialized as string
-    for r in rows:
-        t = r.get("session_time")
-        if t is not None and not isinstance(t, str):
-            r["session_time"] = str(t)
+    return [_time_to_str(r) for r in rows]
+
 
-    return rows
+def _ensure_partition(cur: Any, session_date: date | None) -> None:
+    try:
+        partitions.ensure(cur, [session_date])
+    except partitions.MonthDetached as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
 
 
 @router.post("", response_model=IdResponse)
 def create_training_session(payload: TrainingSessionCreate):
     session_time = _parse_time(payload.session_time)
 
-    session_id = db.execute_returning_id(
-        """
-        INSERT INTO training_sessions (
-            athlete_id, session_name, session_date,
-            session_time, duration, session_type,
-            session_notes, exercises, status
+    with db.transaction() as cur:
+        _ensure_partition(cur, payload.session_date)
+        cur.execute(
+            """
+            INSERT INTO training_sessions (
+                athlete_id, session_name, session_date,
+                session_time, duration, session_type,
+                session_notes, exercises, status
+            )
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            RETURNING id
+            """,
+            (
+                payload.athlete_id,
+                payload.session_name,
+                payload.session_date,
+                session_time,
+                payload.duration,
+                payload.session_type,
+                payload.session_notes,
+                db.json_param(payload.exercises or []),
+                payload.status or "Scheduled",
+            ),
         )
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        RETURNING id
-        """,
-        (
-            payload.athlete_id,
-            payload.session_name,
-            payload.session_date,
-            session_time,
-            payload.duration,
-            payload.session_type,
-            payload.session_notes,
-            db.json_param(payload.exercises or []),
-            payload.status or "Scheduled",
-        ),
-    )
+        session_id = int(cur.fetchone()["id"])
+        rollups.refresh_sessions(cur, [(payload.athlete_id, payload.session_date)])
+        billing.refresh_ledger(cur, [(payload.athlete_id, payload.session_date)])
 
+    cache.invalidate("training_sessions")
     return {"id": session_id}
 
 
-@router.patch("/{session_id}")
+@router.patch("/{session_id}", response_model=TrainingSessionUpdateResult)
 def update_training_session(session_id: int, payload: TrainingSessionUpdate):
-    existing = db.fetch_one("SELECT id FROM training_sessions WHERE id = %s", (session_id,))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Training session not found")
-
     allowed = {
         "athlete_id": ("athlete_id", payload.athlete_id),
         "session_name": ("session_name", payload.session_name),
@@ -125,45 +178,62 @@ def update_training_session(session_id: int, payload: TrainingSessionUpdate):
         "completed_at": ("completed_at", payload.completed_at),
     }
 
-    set_clauses: list[str] = []
-    params: list[Any] = []
-
-    for _, (col, value) in allowed.items():
-        if value is None:
-            continue
-        set_clauses.append(f"{col} = %s")
-        params.append(value)
-
-    if not set_clauses:
-        return {"updated": False}
-
-    params.append(session_id)
-    db.execute(f"UPDATE training_sessions SET {', '.join(set_clauses)} WHERE id = %s", tuple(params))
-    return {"updated": True}
+    values = {col: value for col, value in allowed.values() if value is not None}
+
+    with db.transaction() as cur:
+        _ensure_partition(cur, payload.session_date)
+        session = update_row(
+            cur,
+            "training_sessions",
+            session_id,
+            values,
+            returning=_SESSION_RETURNING,
+            previous=("athlete_id", "session_date"),
+            not_found="Training session not found",
+        )
+        previous = (session.pop("previous_athlete_id"), session.pop("previous_session_date"))
+        if values:
+            touched = [previous, (session["athlete_id"], session["session_date"])]
+            rollups.refresh_sessions(cur, touched)
+            billing.refresh_ledger(cur, touched)
+            if values.keys() & {"status", "completed_data", "athlete_id", "session_date"}:
+                records.sync_session(cur, session_id)
+    if values:
+        cache.invalidate("training_sessions")
+    return {"updated": bool(values), "session": _time_to_str(session)}
 
 
 @router.post("/{session_id}/complete")
 def complete_training_session(session_id: int, completed_data: dict[str, Any]):
-    existing = db.fetch_one("SELECT id FROM training_sessions WHERE id = %s", (session_id,))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Training session not found")
-
-    now = datetime.utcnow()
-    db.execute(
-        """
-        UPDATE training_sessions
-        SET status = 'Completed', completed_data = %s, completed_at = %s
-        WHERE id = %s
-        """,
-        (db.json_param(completed_data), now, session_id),
-    )
-    return {"updated": True}
+    values = {"status": "Completed", "completed_data": db.json_param(completed_data), "completed_at": datetime.utcnow()}
+    with db.transaction() as cur:
+        session = update_row(
+            cur,
+            "training_sessions",
+            session_id,
+            values,
+            returning=_SESSION_RETURNING,
+            not_found="Training session not found",
+        )
+        rollups.refresh_sessions(cur, [(session["athlete_id"], session["session_date"])])
+        billing.refresh_ledger(cur, [(session["athlete_id"], session["session_date"])])
+        events = records.sync_session(cur, session_id)
+    cache.invalidate("training_sessions")
+    return {"updated": True, "records": events, "session": _time_to_str(session)}
 
 
 @router.delete("/{session_id}")
 def delete_training_session(session_id: int):
-    existing = db.fetch_one("SELECT id FROM training_sessions WHERE id = %s", (session_id,))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Training session not found")
-    db.execute("DELETE FROM training_sessions WHERE id = %s", (session_id,))
+    with db.transaction() as cur:
+        row = delete_row(
+            cur,
+            "training_sessions",
+            session_id,
+            returning="athlete_id, session_date",
+            not_found="Training session not found",
+        )
+        rollups.refresh_sessions(cur, [(row["athlete_id"], row["session_date"])])
+        billing.refresh_ledger(cur, [(row["athlete_id"], row["session_date"])])
+        records.sync_session(cur, session_id)
+    cache.invalidate("training_sessions")
     return {"deleted": True}
@@ -0,0 +1,80 @@
+"""Single-statement writes for the PATCH/DELETE handlers.
+
+Each helper runs the mutation with RETURNING and raises 404 when no row
+matched, instead of checking existence first on another connection. A
+handler needs one statement, and nothing can change the row between the
+check and the write. The returned row lets the API answer with the updated
+resource, so clients can patch their caches instead of refetching lists.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable, Mapping
+
+from fastapi import HTTPException
+
+
+def _not_found(detail: str) -> HTTPException:
+    return HTTPException(status_code=404, detail=detail)
+
+
+def update_row(
+    cur: Any,
+    table: str,
+    row_id: int,
+    values: Mapping[str, Any],
+    *,
+    returning: str = "t.*",
+    previous: Iterable[str] = (),
+    not_found: str = "Not found",
+) -> dict[str, Any]:
+    """UPDATE one row by id and return it (404 when it doesn't exist).
+
+    `values` maps trusted column names to parameters. `returning` is evaluated
+    on the updated row, aliased `t`. Each column in `previous` is also returned
+    as `previous_<column>` with its value from before the update, which saves a
+    SELECT ... FOR UPDATE when the caller needs both versions. With no values
+    the row is only read.
+    """
+
+    previous = tuple(previous)
+    if not values:
+        extra = "".join(f", t.{col} AS previous_{col}" for col in previous)
+        cur.execute(f"SELECT {returning}{extra} FROM {table} t WHERE t.id = %s", (row_id,))
+    elif previous:
+        # The subquery locks the row and reads its current version first.
+        cur.execute(
+            f"""
+            UPDATE {table} t SET {', '.join(f'{col} = %s' for col in values)}
+            FROM (SELECT id, {', '.join(previous)} FROM {table} WHERE id = %s FOR UPDATE) old
+            WHERE t.id = old.id
+            RETURNING {returning}, {', '.join(f'old.{col} AS previous_{col}' for col in previous)}
+            """,
+            (*values.values(), row_id),
+        )
+    else:
+        cur.execute(
+            f"UPDATE {table} t SET {', '.join(f'{col} = %s' for col in values)} WHERE t.id = %s RETURNING {returning}",
+            (*values.values(), row_id),
+        )
+    row = cur.fetchone()
+    if row is None:
+        raise _not_found(not_found)
+    return dict(row)
+
+
+def delete_row(
+    cur: Any,
+    table: str,
+    row_id: int,
+    *,
+    returning: str = "id",
+    not_found: str = "Not found",
+) -> dict[str, Any]:
+    """DELETE one row by id and return its `returning` columns (404 when it doesn't exist)."""
+
+    cur.execute(f"DELETE FROM {table} t WHERE t.id = %s RETURNING {returning}", (row_id,))
+    row = cur.fetchone()
+    if row is None:
+        raise _not_found(not_found)
+    return dict(row)
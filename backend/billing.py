@@ -0,0 +1,303 @@
+"""Set-based billing statements used by the month-close jobs (backend/jobs.py) and the write paths.
+
+The functions take a cursor so the caller decides the transaction. Each is a
+single INSERT ... SELECT, so the cost no longer grows with one round trip per
+athlete or per session.
+
+Prices come from `plan_history`, the plan each athlete had from a given month
+on. PATCH /athletes records a new row with `record_plan`, so a plan change
+never alters the months already closed.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Iterable
+
+from backend import db
+
+AUTO_CREDIT_REASON = "Crédito por sessão cancelada (mês anterior)"
+
+# Same rules as the Payments page:
+# - monthly: monthly price
+# - on_demand: completed sessions in the month x per-session price
+# `plan` is the plan_history row in effect for the month (plan_in_effect()), so
+# editing an athlete's plan doesn't change the months already billed.
+_PLAN_TYPE_SQL = "lower(trim(COALESCE(plan.plan_type, 'monthly')))"
+
+_PLAN_COLUMNS = ("plan_type", "plan_sessions_per_week", "plan_monthly_price", "plan_on_demand_price")
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def previous_month(value: date) -> date:
+    start = month_start(value)
+    return date(start.year - 1, 12, 1) if start.month == 1 else date(start.year, start.month - 1, 1)
+
+
+def next_month(value: date) -> date:
+    start = month_start(value)
+    return date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+
+
+def auto_credit(cur: Any, month: date, athlete_id: int | None = None) -> int:
+    """Credit `month` for every session cancelled in the previous month.
+
+    - monthly plans: monthly_price / (sessions_per_week * 4) per cancelled session
+    - on_demand plans: on_demand_price per cancelled session
+
+    Prices come from the plan in effect in the month the session was cancelled.
+
+    Sessions that already have a linked adjustment for `month` are skipped.
+    Returns the number of adjustments created.
+    """
+
+    month = month_start(month)
+    cur.execute(
+        f"""
+        INSERT INTO payment_adjustments (athlete_id, applies_month, amount, reason, related_session_id)
+        SELECT ts.athlete_id, %(month)s, credit.amount, %(reason)s, ts.id
+        FROM training_sessions ts
+        CROSS JOIN LATERAL plan_in_effect(ts.athlete_id, %(prev_start)s) plan
+        CROSS JOIN LATERAL (
+            SELECT CASE {_PLAN_TYPE_SQL}
+                       WHEN 'monthly' THEN -(plan.plan_monthly_price / NULLIF(plan.plan_sessions_per_week * 4, 0))
+                       WHEN 'on_demand' THEN -plan.plan_on_demand_price
+                   END AS amount
+        ) credit
+        WHERE ts.status = 'Cancelled'
+          AND ts.session_date >= %(prev_start)s AND ts.session_date < %(month)s
+          AND (%(athlete_id)s::int IS NULL OR ts.athlete_id = %(athlete_id)s::int)
+          AND credit.amount IS NOT NULL AND credit.amount <> 0
+          AND NOT EXISTS (
+              SELECT 1 FROM payment_adjustments pa
+              WHERE pa.related_session_id = ts.id AND pa.applies_month = %(month)s
+          )
+        ORDER BY ts.session_date ASC, ts.id ASC
+        -- Two runs for the same month can race past NOT EXISTS; the unique index settles it.
+        ON CONFLICT (related_session_id, applies_month) WHERE related_session_id IS NOT NULL DO NOTHING
+        """,
+        {"month": month, "prev_start": previous_month(month), "athlete_id": athlete_id, "reason": AUTO_CREDIT_REASON},
+    )
+    return cur.rowcount
+
+
+def rebuild_ledger(cur: Any, month: date, athlete_id: int | None = None) -> int:
+    """Recompute `billing_ledger` rows (amount due vs. paid) for one month.
+
+    Without `athlete_id`, athletes who hadn't started yet (created later and no
+    session up to that month) get no row, so their balance doesn't accrue fees
+    from before they joined. The month's `billing_monthly_totals` follow.
+    """
+
+    month = month_start(month)
+    rows = _upsert_ledger(cur, month, [athlete_id] if athlete_id is not None else None)
+    refresh_totals(cur, [month])
+    return rows
+
+
+def _upsert_ledger(cur: Any, month: date, athlete_ids: list[int] | None) -> int:
+    cur.execute(
+        f"""
+        INSERT INTO billing_ledger (
+            athlete_id, month, plan_type, completed_sessions,
+            base_amount, adjustments_total, total_due, paid_amount, status, computed_at
+        )
+        SELECT a.id, %(month)s, {_PLAN_TYPE_SQL}, s.completed,
+               base.amount, adj.total, base.amount + adj.total,
+               p.paid_amount, p.status, NOW()
+        FROM athletes a
+        LEFT JOIN LATERAL plan_in_effect(a.id, %(month)s) plan ON TRUE
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*)::int AS completed
+            FROM training_sessions_all ts
+            WHERE ts.athlete_id = a.id
+              AND ts.status = 'Completed'
+              AND ts.session_date >= %(month)s AND ts.session_date < %(next_month)s
+        ) s
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(SUM(pa.amount), 0) AS total
+            FROM payment_adjustments pa
+            WHERE pa.athlete_id = a.id AND pa.applies_month = %(month)s
+        ) adj
+        CROSS JOIN LATERAL (
+            SELECT CASE {_PLAN_TYPE_SQL}
+                       WHEN 'monthly' THEN COALESCE(plan.plan_monthly_price, 0)
+                       WHEN 'on_demand' THEN COALESCE(plan.plan_on_demand_price, 0) * s.completed
+                       ELSE 0
+                   END AS amount
+        ) base
+        LEFT JOIN payments p ON p.athlete_id = a.id AND p.month = %(month)s
+        WHERE CASE
+                  WHEN %(athlete_ids)s::int[] IS NOT NULL THEN a.id = ANY(%(athlete_ids)s::int[])
+                  ELSE date_trunc('month', a.created_at) <= %(month)s
+                       OR EXISTS (
+                           SELECT 1 FROM training_sessions_all ts
+                           WHERE ts.athlete_id = a.id AND ts.session_date < %(next_month)s
+                       )
+              END
+        ON CONFLICT (athlete_id, month) DO UPDATE SET
+            plan_type = EXCLUDED.plan_type,
+            completed_sessions = EXCLUDED.completed_sessions,
+            base_amount = EXCLUDED.base_amount,
+            adjustments_total = EXCLUDED.adjustments_total,
+            total_due = EXCLUDED.total_due,
+            paid_amount = EXCLUDED.paid_amount,
+            status = EXCLUDED.status,
+            computed_at = EXCLUDED.computed_at
+        """,
+        {
+            "month": month,
+            "next_month": next_month(month),
+            "athlete_ids": athlete_ids,
+        },
+    )
+    return cur.rowcount
+
+
+def refresh_totals(cur: Any, months: Iterable[date]) -> None:
+    """Recompute `billing_monthly_totals` for `months` from their ledger rows.
+
+    One row per month and plan type, so revenue reports over any range sum a
+    few rows per month instead of every athlete's ledger. Each month is locked
+    first, so concurrent writers rebuild it one after the other, each from the
+    other's committed ledger rows.
+    """
+
+    months = sorted({month_start(m) for m in months})
+    if not months:
+        return
+    db.lock_months(cur, "billing_monthly_totals", months)
+    cur.execute("DELETE FROM billing_monthly_totals WHERE month = ANY(%s::date[])", (months,))
+    cur.execute(
+        """
+        INSERT INTO billing_monthly_totals (
+            month, plan_type, athlete_months, completed_sessions, base_amount, adjustments_total,
+            cancellation_credits, billed, collected, outstanding, computed_at
+        )
+        SELECT l.month, COALESCE(l.plan_type, 'monthly'), COUNT(*), SUM(l.completed_sessions),
+               SUM(l.base_amount), SUM(l.adjustments_total), SUM(cc.amount),
+               SUM(l.total_due), SUM(paid.amount), SUM(GREATEST(l.total_due - paid.amount, 0)), NOW()
+        FROM billing_ledger l
+        CROSS JOIN LATERAL (
+            SELECT CASE WHEN l.status = 'paid' THEN COALESCE(l.paid_amount, l.total_due) ELSE 0 END AS amount
+        ) paid
+        CROSS JOIN LATERAL (
+            SELECT -COALESCE(SUM(pa.amount), 0) AS amount
+            FROM payment_adjustments pa
+            WHERE pa.athlete_id = l.athlete_id AND pa.applies_month = l.month
+              AND pa.related_session_id IS NOT NULL
+        ) cc
+        WHERE l.month = ANY(%s::date[])
+        GROUP BY l.month, COALESCE(l.plan_type, 'monthly')
+        """,
+        (months,),
+    )
+
+
+def refresh_ledger(cur: Any, touched: Iterable[tuple[int | None, date | None]]) -> int:
+    """Recompute the ledger rows of the (athlete, date) pairs a write touched.
+
+    Write paths call this in their own transaction, the way they call
+    `rollups.refresh_sessions`, so `billing_ledger` stays current between month
+    closes. Future months are skipped: the month-close jobs open each month
+    with a row per athlete. Returns the number of rows written.
+    """
+
+    current = month_start(date.today())
+    by_month: dict[date, set[int]] = {}
+    for athlete_id, day in touched:
+        if athlete_id is not None and day is not None and month_start(day) <= current:
+            by_month.setdefault(month_start(day), set()).add(athlete_id)
+    rows = 0
+    for month, athlete_ids in sorted(by_month.items()):
+        rows += _upsert_ledger(cur, month, sorted(athlete_ids))
+    refresh_totals(cur, by_month)
+    return rows
+
+
+def seed_plan_history(cur: Any, athlete_id: int) -> bool:
+    """Give an athlete without plan history their current plan, from the month they were created.
+
+    Called before recording a plan change, so the months before the change keep
+    the old plan instead of falling back to the new row. Returns whether a row
+    was written.
+    """
+
+    cur.execute(
+        f"""
+        INSERT INTO plan_history (athlete_id, effective_from, {', '.join(_PLAN_COLUMNS)})
+        SELECT a.id, date_trunc('month', COALESCE(a.created_at, NOW()))::date,
+               {', '.join(f'a.{col}' for col in _PLAN_COLUMNS)}
+        FROM athletes a
+        WHERE a.id = %s AND NOT EXISTS (SELECT 1 FROM plan_history ph WHERE ph.athlete_id = a.id)
+        ON CONFLICT (athlete_id, effective_from) DO NOTHING
+        """,
+        (athlete_id,),
+    )
+    return cur.rowcount > 0
+
+
+def plan_at(cur: Any, athlete_id: int, month: date) -> dict[str, Any]:
+    """The plan columns in effect for `athlete_id` in `month` (all None without history)."""
+
+    cur.execute(
+        f"SELECT {', '.join(_PLAN_COLUMNS)} FROM plan_in_effect(%s, %s)",
+        (athlete_id, month_start(month)),
+    )
+    row = cur.fetchone()
+    return dict(row) if row else dict.fromkeys(_PLAN_COLUMNS)
+
+
+def apply_plans(cur: Any, month: date) -> int:
+    """Copy the plan in effect in `month` into `athletes.plan_*` where it changed.
+
+    Plans scheduled for a future month only reach the athlete row when that
+    month starts (the month-close `plan_apply` job). Returns the athletes updated.
+    """
+
+    plan_values = ", ".join(f"plan.{col}" for col in _PLAN_COLUMNS)
+    cur.execute(
+        f"""
+        UPDATE athletes a
+        SET ({', '.join(_PLAN_COLUMNS)}) = ({plan_values})
+        FROM athletes src
+        CROSS JOIN LATERAL plan_in_effect(src.id, %(month)s) plan
+        WHERE a.id = src.id
+          AND plan.effective_from <= %(month)s
+          AND ({', '.join(f'a.{col}' for col in _PLAN_COLUMNS)})
+              IS DISTINCT FROM ({plan_values})
+        """,
+        {"month": month_start(month)},
+    )
+    return cur.rowcount
+
+
+def record_plan(cur: Any, athlete: dict[str, Any], effective_from: date) -> bool:
+    """Make `athlete`'s plan columns the plan in effect from `effective_from` on.
+
+    Later rows in plan_history still take over from their own month. Nothing is
+    written when that plan is already in effect. Returns whether a row was written.
+    """
+
+    month = month_start(effective_from)
+    values = [athlete.get(col) for col in _PLAN_COLUMNS]
+    cur.execute(
+        f"""
+        INSERT INTO plan_history (athlete_id, effective_from, {', '.join(_PLAN_COLUMNS)})
+        SELECT %s, %s, %s, %s, %s, %s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM plan_in_effect(%s, %s) plan
+            WHERE plan.effective_from <= %s
+              AND ({', '.join(f'plan.{col}' for col in _PLAN_COLUMNS)})
+                  IS NOT DISTINCT FROM (%s::varchar, %s::int, %s::numeric, %s::numeric)
+        )
+        ON CONFLICT (athlete_id, effective_from) DO UPDATE SET
+            {', '.join(f'{col} = EXCLUDED.{col}' for col in _PLAN_COLUMNS)},
+            created_at = NOW()
+        """,
+        (athlete["id"], month, *values, athlete["id"], month, month, *values),
+    )
+    return cur.rowcount > 0
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Hashable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+class TTLCache:
+    """Small in-process cache with per-entry TTL and tag-based invalidation.
+
+    Entries are tagged with the tables they were computed from; write handlers call
+    `invalidate(table)` so readers in this worker never see data older than the
+    last local write. Other workers converge within the TTL.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._entries: dict[Hashable, tuple[float, frozenset[str], Any]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get_or_set(self, key: Hashable, ttl: float, tags: Iterable[str], compute: Callable[[], T]) -> T:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[2]
+            generation = self._generation
+
+        value = compute()
+        if ttl <= 0:
+            return value
+
+        with self._lock:
+            if generation != self._generation:
+                # A write landed while computing; the value may already be stale.
+                return value
+            if len(self._entries) >= self.max_entries:
+                self._evict(now)
+            self._entries[key] = (now + ttl, frozenset(tags), value)
+        return value
+
+    def invalidate(self, *tags: str) -> None:
+        wanted = set(tags)
+        with self._lock:
+            self._generation += 1
+            for key in [k for k, (_, entry_tags, _) in self._entries.items() if entry_tags & wanted]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def _evict(self, now: float) -> None:
+        expired = [k for k, (expires, _, _) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            # Drop the entry closest to expiry.
+            del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+
+
+cache = TTLCache()
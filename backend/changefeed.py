@@ -0,0 +1,184 @@
+"""Live change feed: Postgres LISTEN/NOTIFY fanned out to SSE subscribers.
+
+Triggers on training_sessions, payments and athletes (scripts/init_db.py) call
+`pg_notify('studio_changes', ...)` with a compact JSON payload:
+
+    {"table": "training_sessions", "op": "update", "id": 12,
+     "athlete_id": 3, "date": "2025-03-04", "old_date": "2025-03-03"}
+
+`old_athlete_id` / `old_date` are only present when an update moved the row.
+Postgres delivers notifications on commit, so rolled-back writes never show up.
+
+Each worker holds one dedicated LISTEN connection (outside the request pool)
+on a background thread. Events are handed to the event loop and copied into
+every matching subscriber's queue, so the number of open `/events` streams does
+not change the number of DB connections. The same events also invalidate this
+worker's response cache, so writes made through other workers show up without
+waiting for the TTL.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import select
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+import psycopg2
+
+from backend.cache import cache
+from backend.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "studio_changes"
+TABLES = frozenset({"training_sessions", "payments", "athletes"})
+
+
+@dataclass(frozen=True)
+class ChangeFilter:
+    tables: frozenset[str] = TABLES
+    athlete_id: int | None = None
+    start: date | None = None
+    end: date | None = None
+
+    def matches(self, event: dict[str, Any]) -> bool:
+        if event.get("type") == "resync":
+            return True
+        if event.get("table") not in self.tables:
+            return False
+        if self.athlete_id is not None and self.athlete_id not in (event.get("athlete_id"), event.get("old_athlete_id")):
+            return False
+        if self.start is None and self.end is None:
+            return True
+        dates = [d for d in (event.get("date"), event.get("old_date")) if d]
+        if not dates:
+            # Athlete changes aren't tied to a date.
+            return True
+        return any(self._in_range(event["table"], date.fromisoformat(d)) for d in dates)
+
+    def _in_range(self, table: str, value: date) -> bool:
+        if table == "payments":
+            # `month` is the first day; the payment covers the whole month.
+            month_end = date(value.year + 1, 1, 1) if value.month == 12 else date(value.year, value.month + 1, 1)
+            return (self.end is None or value <= self.end) and (self.start is None or month_end > self.start)
+        return (self.start is None or value >= self.start) and (self.end is None or value <= self.end)
+
+
+class Subscription:
+    def __init__(self, feed: ChangeFeed, change_filter: ChangeFilter, maxsize: int) -> None:
+        self.feed = feed
+        self.filter = change_filter
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, event: dict[str, Any]) -> None:
+        if not self.filter.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow client missed events; tell it to refetch instead of growing without bound.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "reason": "overflow"})
+
+    def close(self) -> None:
+        self.feed.unsubscribe(self)
+
+
+class ChangeFeed:
+    def __init__(self) -> None:
+        self._subscribers: set[Subscription] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._loop = loop
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._listen, name="changefeed", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def subscribe(self, change_filter: ChangeFilter) -> Subscription:
+        """Must be called from the event loop (it owns the subscriber set)."""
+        if self._thread is None:
+            self.start(asyncio.get_running_loop())
+        sub = Subscription(self, change_filter, settings.events_queue_size)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subscribers.discard(sub)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _dispatch(self, event: dict[str, Any]) -> None:
+        # Runs on the event loop.
+        table = event.get("table")
+        if table:
+            cache.invalidate(table)
+        elif event.get("type") == "resync":
+            cache.invalidate(*TABLES)
+        for sub in list(self._subscribers):
+            sub.offer(event)
+
+    def _publish(self, event: dict[str, Any]) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _listen(self) -> None:
+        backoff = 1.0
+        connected_before = False
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(settings.database_url, application_name="changefeed")
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                backoff = 1.0
+                if connected_before:
+                    # Anything committed while we were disconnected was missed.
+                    self._publish({"type": "resync", "reason": "reconnected"})
+                connected_before = True
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            event = json.loads(notify.payload)
+                        except ValueError:
+                            logger.warning("Ignoring malformed change event: %r", notify.payload)
+                            continue
+                        self._publish(event)
+            except (psycopg2.Error, OSError):
+                logger.exception("Change feed connection lost; reconnecting in %.0fs", backoff)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if conn is not None and not conn.closed:
+                    conn.close()
+
+
+feed = ChangeFeed()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import zlib
+from typing import Protocol
+
+try:  # optional: `pip install brotli`
+    import brotli
+except ImportError:  # pragma: no cover - depends on environment
+    brotli = None
+
+try:  # optional: `pip install zstandard`
+    import zstandard
+except ImportError:  # pragma: no cover - depends on environment
+    zstandard = None
+
+
+class Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class GzipEncoder:
+    def __init__(self, level: int) -> None:
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int) -> None:
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int) -> None:
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+def available_encodings(preferred: list[str]) -> list[str]:
+    """Filter the configured preference list down to what is installed here."""
+    installed = {"gzip"}
+    if brotli is not None:
+        installed.add("br")
+    if zstandard is not None:
+        installed.add("zstd")
+    return [e for e in preferred if e in installed]
+
+
+def make_encoder(encoding: str, levels: dict[str, int]) -> Encoder:
+    if encoding == "br":
+        return BrotliEncoder(levels["br"])
+    if encoding == "zstd":
+        return ZstdEncoder(levels["zstd"])
+    return GzipEncoder(levels["gzip"])
+
+
+def negotiate(accept_encoding: str, supported: list[str]) -> str | None:
+    """Pick the first server-preferred encoding the client accepts (q > 0)."""
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+
+    for encoding in supported:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > 0:
+            return encoding
+    return None
@@ -1,43 +1,375 @@
 from __future__ import annotations
 
 import json
+import re
+import threading
+import time
 from contextlib import contextmanager
-from typing import Any, Iterator
+from contextvars import ContextVar
+from datetime import date
+from typing import Any, Iterable, Iterator
 
 import psycopg2
+import psycopg2.errors
 from psycopg2.extras import Json, RealDictCursor, register_default_json, register_default_jsonb
+from psycopg2.pool import ThreadedConnectionPool
 
 from backend.settings import settings
 
 
+class PooledConnection(psycopg2.extensions.connection):
+    """Connection with a little bookkeeping used by the pool."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        register_default_json(self, loads=json.loads)
+        register_default_jsonb(self, loads=json.loads)
+        self.last_used = time.monotonic()
+        # Names of the registered statements already PREPAREd on this connection.
+        self.prepared: set[str] = set()
+
+
+Params = tuple[Any, ...] | dict[str, Any]
+
+_PLACEHOLDER_RE = re.compile(r"%%|%s")
+_STATEMENT_NAME_RE = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+class Statement:
+    """A hot query that is PREPAREd once per connection and then run by name.
+
+    Written with `%s` placeholders like any other query and passed to
+    `fetch_all` / `fetch_one` in place of the SQL text. Postgres parses it once
+    per connection and, after a few runs, reuses a generic plan, so repeated
+    calls skip parsing and planning. Avoid optional-filter tricks such as
+    `(%s IS NULL OR col = %s)`: they make poor generic plans. Register one
+    statement per filter combination instead (see `statement`).
+    """
+
+    def __init__(self, name: str, sql: str) -> None:
+        if not _STATEMENT_NAME_RE.match(name):
+            raise ValueError(f"Invalid statement name: {name!r}")
+        self.name = name
+        self.sql = sql
+        count = 0
+
+        def number(m: re.Match[str]) -> str:
+            nonlocal count
+            if m.group(0) == "%%":
+                return "%"
+            count += 1
+            return f"${count}"
+
+        self._prepare_sql = f"PREPARE {name} AS {_PLACEHOLDER_RE.sub(number, sql)}"
+        self._execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * count)})" if count else f"EXECUTE {name}"
+        self.param_count = count
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prepares = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def execute(self, conn: PooledConnection, cur: Any, params: Params) -> None:
+        if len(params) != self.param_count:
+            raise ValueError(f"{self.name} takes {self.param_count} parameters, got {len(params)}")
+        if self.name not in conn.prepared:
+            self._prepare(conn, cur)
+        started = time.perf_counter()
+        try:
+            cur.execute(self._execute_sql, params)
+        except (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.FeatureNotSupported) as e:
+            # Dropped behind our back (DISCARD ALL), or a migration changed the
+            # shape of the rows ("cached plan must not change result type").
+            # PREPARE is not transactional, so it survives the rollback.
+            conn.rollback()
+            if isinstance(e, psycopg2.errors.FeatureNotSupported):
+                cur.execute(f"DEALLOCATE {self.name}")
+            conn.prepared.discard(self.name)
+            self._prepare(conn, cur)
+            started = time.perf_counter()
+            cur.execute(self._execute_sql, params)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.calls += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def _prepare(self, conn: PooledConnection, cur: Any) -> None:
+        cur.execute(self._prepare_sql)
+        conn.prepared.add(self.name)
+        with self._lock:
+            self.prepares += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "calls": self.calls,
+                "prepares": self.prepares,
+                "total_ms": round(self.total_seconds * 1000, 3),
+                "mean_ms": round(self.total_seconds * 1000 / self.calls, 3) if self.calls else None,
+                "max_ms": round(self.max_seconds * 1000, 3),
+            }
+
+
+_statements: dict[str, Statement] = {}
+_statements_lock = threading.Lock()
+
+
+def statement(name: str, sql: str) -> Statement:
+    """Register (or return the already registered) prepared statement `name`."""
+    with _statements_lock:
+        existing = _statements.get(name)
+        if existing is not None:
+            if existing.sql != sql:
+                raise ValueError(f"Statement {name!r} is already registered with different SQL")
+            return existing
+        stmt = _statements[name] = Statement(name, sql)
+        return stmt
+
+
+def statement_stats() -> list[dict[str, Any]]:
+    with _statements_lock:
+        stmts = list(_statements.values())
+    return sorted((s.stats() for s in stmts), key=lambda r: r["total_ms"], reverse=True)
+
+
+class _Pool:
+    """One ThreadedConnectionPool plus the semaphore that makes callers wait for a slot."""
+
+    def __init__(self, dsn: str, **connect_kwargs: Any) -> None:
+        self.dsn = dsn
+        self.slots = threading.BoundedSemaphore(settings.db_pool_max_size)
+        self.pool = ThreadedConnectionPool(
+            settings.db_pool_min_size,
+            settings.db_pool_max_size,
+            dsn,
+            connection_factory=PooledConnection,
+            **connect_kwargs,
+        )
+
+    def close(self) -> None:
+        self.pool.closeall()
+
+
+class _Replica:
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self.pool: _Pool | None = None
+        self.lag_seconds: float | None = None
+        self.healthy = False
+        self.error: str | None = None
+        self.checked_at = 0.0
+
+
+_primary: _Pool | None = None
+_replicas: list[_Replica] = []
+_pool_lock = threading.Lock()
+_replica_lock = threading.Lock()
+_replica_cursor = 0
+
+# "replica" only while serving a read-only request (see ReadRoutingMiddleware);
+# everything else, including background threads, uses the primary.
+_read_target: ContextVar[str] = ContextVar("db_read_target", default="primary")
+
+
+def _get_pool() -> _Pool:
+    # Created lazily so every uvicorn worker process gets its own pool.
+    global _primary, _replicas
+    if _primary is None:
+        with _pool_lock:
+            if _primary is None:
+                _replicas = [_Replica(url) for url in settings.replica_url_list]
+                _primary = _Pool(settings.database_url)
+    return _primary
+
+
+def close_pool() -> None:
+    global _primary, _replicas
+    with _pool_lock:
+        if _primary is not None:
+            _primary.close()
+        for replica in _replicas:
+            if replica.pool is not None:
+                replica.pool.close()
+        _primary = None
+        _replicas = []
+
+
 @contextmanager
-def get_conn() -> Iterator[psycopg2.extensions.connection]:
-    conn = psycopg2.connect(settings.database_url)
+def reads_from_replica(enabled: bool = True) -> Iterator[None]:
+    """Let `fetch_all` / `fetch_one` in this context use a replica."""
+    token = _read_target.set("replica" if enabled else "primary")
+    try:
+        yield
+    finally:
+        _read_target.reset(token)
+
+
+def _primary_lsn() -> str | None:
+    """The primary's current WAL position, to measure replicas against (None if unreachable)."""
+    try:
+        with _connection(_get_pool()) as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_current_wal_lsn()::text")
+                return cur.fetchone()[0]
+    except Exception:
+        return None
+
+
+def _check_replica(replica: _Replica, primary_lsn: str | None) -> None:
+    try:
+        if replica.pool is None:
+            # A replica that is down must not stall the request that happens to check it.
+            replica.pool = _Pool(replica.dsn, connect_timeout=settings.replica_connect_timeout_seconds)
+        # A server that isn't a standby (e.g. a second local instance) counts as current,
+        # and so does a standby that has replayed up to the primary's position read just
+        # before. Otherwise its WAL receiver must be streaming: one that stopped has
+        # replayed all it received but may be any distance behind. A streaming standby
+        # that has replayed all it received recently is current even when the last
+        # replayed transaction is old (idle primary); anything else is as far behind as
+        # its last replayed transaction. Reading pg_stat_wal_receiver takes pg_read_all_stats.
+        with _connection(replica.pool) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT CASE
+                               WHEN NOT pg_is_in_recovery() THEN 0
+                               WHEN pg_last_wal_replay_lsn() >= %(primary_lsn)s::pg_lsn THEN 0
+                               WHEN NOT COALESCE(w.streaming, false) THEN NULL
+                               WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AND w.fresh THEN 0
+                               ELSE EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp())
+                           END
+                    FROM (SELECT 1) one
+                    LEFT JOIN (
+                        SELECT status = 'streaming' AS streaming,
+                               last_msg_receipt_time > NOW() - make_interval(secs => %(max_lag)s) AS fresh
+                        FROM pg_stat_wal_receiver
+                    ) w ON TRUE
+                    """,
+                    {"primary_lsn": primary_lsn, "max_lag": settings.replica_max_lag_seconds},
+                )
+                (lag,) = cur.fetchone()
+        replica.lag_seconds = float(lag) if lag is not None else None
+        replica.healthy = replica.lag_seconds is not None and replica.lag_seconds <= settings.replica_max_lag_seconds
+        if replica.healthy:
+            replica.error = None
+        elif replica.lag_seconds is None:
+            replica.error = "WAL receiver not streaming"
+        else:
+            replica.error = f"lag {replica.lag_seconds}s"
+    except Exception as e:  # connection refused, auth, ...
+        replica.healthy = False
+        replica.lag_seconds = None
+        message = str(e).strip()
+        replica.error = f"{type(e).__name__}: {message.splitlines()[0]}" if message else type(e).__name__
+    replica.checked_at = time.monotonic()
+
+
+def _pick_replica() -> _Pool | None:
+    global _replica_cursor
+    _get_pool()
+    if not _replicas:
+        return None
+    now = time.monotonic()
+    # Whoever notices a stale measurement refreshes it; other threads keep the last one.
+    stale = [r for r in _replicas if now - r.checked_at >= settings.replica_check_interval_seconds]
+    if stale and _replica_lock.acquire(blocking=False):
+        try:
+            primary_lsn = _primary_lsn()
+            for replica in stale:
+                _check_replica(replica, primary_lsn)
+        finally:
+            _replica_lock.release()
+
+    healthy = [r for r in _replicas if r.healthy and r.pool is not None]
+    if not healthy:
+        return None
+    _replica_cursor = (_replica_cursor + 1) % len(healthy)
+    return healthy[_replica_cursor].pool
+
+
+def replica_status() -> list[dict[str, Any]]:
+    _pick_replica()  # refreshes stale measurements
+    return [
+        {"index": i, "healthy": r.healthy, "lag_seconds": r.lag_seconds, "error": r.error}
+        for i, r in enumerate(_replicas)
+    ]
+
+
+def _checkout(pool: ThreadedConnectionPool) -> PooledConnection:
+    conn = pool.getconn()
+    # Managed Postgres (Neon, Render) drops idle connections; recycle them before use.
+    while conn.closed or time.monotonic() - conn.last_used > settings.db_pool_max_idle_seconds:
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+    return conn
+
+
+@contextmanager
+def _connection(target: _Pool) -> Iterator[psycopg2.extensions.connection]:
+    # ThreadedConnectionPool raises when exhausted; wait for a free slot instead.
+    target.slots.acquire()
+    try:
+        conn = _checkout(target.pool)
+    except Exception:
+        target.slots.release()
+        raise
     try:
-        register_default_json(conn, loads=json.loads)
-        register_default_jsonb(conn, loads=json.loads)
         yield conn
         conn.commit()
     except Exception:
-        conn.rollback()
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
         raise
     finally:
-        conn.close()
+        conn.last_used = time.monotonic()
+        target.pool.putconn(conn, close=bool(conn.closed))
+        target.slots.release()
 
 
-def fetch_all(sql: str, params: tuple[Any, ...] = ()) -> list[dict[str, Any]]:
-    with get_conn() as conn:
+@contextmanager
+def get_conn() -> Iterator[psycopg2.extensions.connection]:
+    """A connection to the primary."""
+    with _connection(_get_pool()) as conn:
+        yield conn
+
+
+def _read(sql: str | Statement, params: Params, one: bool) -> Any:
+    replica = _pick_replica() if _read_target.get() == "replica" else None
+    if replica is not None:
+        try:
+            return _run_read(replica, sql, params, one)
+        except psycopg2.OperationalError:
+            # The replica went away mid-request; reads are safe to retry on the primary.
+            for r in _replicas:
+                if r.pool is replica:
+                    r.healthy = False
+    return _run_read(_get_pool(), sql, params, one)
+
+
+def _run_read(target: _Pool, sql: str | Statement, params: Params, one: bool) -> Any:
+    with _connection(target) as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql, params)
+            if isinstance(sql, Statement):
+                sql.execute(conn, cur, params)
+            else:
+                cur.execute(sql, params)
+            if one:
+                row = cur.fetchone()
+                return dict(row) if row else None
             return [dict(row) for row in cur.fetchall()]
 
 
-def fetch_one(sql: str, params: tuple[Any, ...] = ()) -> dict[str, Any] | None:
-    with get_conn() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql, params)
-            row = cur.fetchone()
-            return dict(row) if row else None
+def fetch_all(sql: str | Statement, params: Params = ()) -> list[dict[str, Any]]:
+    return _read(sql, params, one=False)
+
+
+def fetch_one(sql: str | Statement, params: Params = ()) -> dict[str, Any] | None:
+    return _read(sql, params, one=True)
 
 
 def execute_returning_id(sql: str, params: tuple[Any, ...]) -> int:
@@ -54,5 +386,27 @@ def execute(sql: str, params: tuple[Any, ...] = ()) -> None:
             cur.execute(sql, params)
 
 
+@contextmanager
+def transaction() -> Iterator[RealDictCursor]:
+    """One connection/transaction for several statements; commits on success."""
+    with get_conn() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            yield cur
+
+
+def lock_months(cur: Any, scope: str, months: Iterable[date]) -> None:
+    """Hold a transaction-level advisory lock on each (scope, month) until commit.
+
+    Maintained aggregates are recomputed with DELETE + INSERT, so two writers
+    rebuilding the same month would collide on the primary key, or sum from a
+    snapshot that misses the other's rows. Each takes the month's lock first:
+    the second one waits for the first to commit, and its next statements see
+    those rows. Months are locked in order, so writers can't deadlock on them.
+    """
+
+    for month in sorted({date(m.year, m.month, 1) for m in months}):
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s), %s)", (scope, month.year * 12 + month.month - 1))
+
+
 def json_param(value: Any) -> Json:
     return Json(value)
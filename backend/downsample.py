@@ -0,0 +1,80 @@
+"""Downsampling of (x, y) series for charts.
+
+Two strategies, both returning the indices of the points to keep so callers can
+slice whatever arrays belong to the series:
+
+- `lttb`: Largest-Triangle-Three-Buckets. Keeps the visual shape of a line with
+  exactly `n_out` points.
+- `min_max_last`: per bucket, the minimum, maximum and last point. Guarantees
+  every peak and trough survives, at up to three points per bucket.
+
+x must be sorted ascending. Bucket boundaries and per-bucket selections are
+computed with numpy; LTTB still walks its buckets in order because each choice
+depends on the previous one, but every bucket is a single vectorized step.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError("LTTB needs at least 3 output points")
+
+    # First and last points are fixed; the rest are split into n_out - 2 buckets.
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Average of each bucket, used as the third vertex for the previous bucket.
+    sums_x = np.add.reduceat(x[1 : n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1 : n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[n - 1])
+    avg_y = np.append(sums_y / counts, y[n - 1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        cx, cy = avg_x[i + 1], avg_y[i + 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def min_max_last(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    n = len(x)
+    n_buckets = max(1, n_out // 3)
+    if n <= n_out or n_buckets >= n:
+        return np.arange(n)
+
+    # Equal-width buckets over x, so gaps in the history stay visible as gaps.
+    span = x[-1] - x[0]
+    if span > 0:
+        bucket = np.minimum(((x - x[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+    else:
+        bucket = np.zeros(n, dtype=np.int64)
+
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+
+    # Sort by (bucket, y); the first/last element of each bucket run is its min/max.
+    order = np.lexsort((y, bucket))
+    mins = order[starts]
+    maxs = order[ends]
+    return np.unique(np.concatenate([mins, maxs, ends]))
+
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int, method: str = "lttb") -> np.ndarray:
+    if method == "lttb":
+        return lttb(x, y, n_out)
+    if method == "minmax":
+        return min_max_last(x, y, n_out)
+    raise ValueError(f"Unknown downsampling method: {method}")
@@ -0,0 +1,111 @@
+"""Storage for Idempotency-Key replays (used by IdempotencyMiddleware).
+
+A key is reserved with a single INSERT ... ON CONFLICT on its primary key. The
+reservation either wins (the request runs and its response is saved) or it
+returns nothing, and only then is the stored row read back. Expired keys, and
+reservations left without a response for `idempotency_in_flight_timeout_seconds`
+by a worker that died mid-request, are taken over by the same INSERT. A
+throttled purge deletes the rest.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from typing import Any
+
+from psycopg2 import Binary
+
+from backend import db
+from backend.settings import settings
+
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+def fingerprint(method: str, path: str, body: bytes) -> bytes:
+    h = hashlib.sha256()
+    h.update(method.encode())
+    h.update(b" ")
+    h.update(path.encode())
+    h.update(b"\n")
+    h.update(body)
+    return h.digest()
+
+
+def reserve(key: str, request_hash: bytes) -> dict[str, Any] | None:
+    """Claim `key` for this request. Returns None if claimed, else the existing row."""
+
+    _maybe_purge()
+    claimed = db.fetch_one(
+        """
+        INSERT INTO idempotency_keys (key, request_hash, expires_at)
+        VALUES (%s, %s, NOW() + make_interval(secs => %s))
+        ON CONFLICT (key) DO UPDATE
+            SET request_hash = EXCLUDED.request_hash,
+                status = NULL,
+                response_headers = NULL,
+                response_body = NULL,
+                created_at = NOW(),
+                expires_at = EXCLUDED.expires_at
+            WHERE idempotency_keys.expires_at < NOW()
+               OR (idempotency_keys.status IS NULL
+                   AND idempotency_keys.created_at < NOW() - make_interval(secs => %s))
+        RETURNING key
+        """,
+        (
+            key,
+            Binary(request_hash),
+            settings.idempotency_ttl_seconds,
+            settings.idempotency_in_flight_timeout_seconds,
+        ),
+    )
+    if claimed is not None:
+        return None
+
+    row = db.fetch_one(
+        "SELECT request_hash, status, response_headers, response_body FROM idempotency_keys WHERE key = %s",
+        (key,),
+    )
+    if row is None:
+        # Purged between the two statements; treat as a fresh claim.
+        return reserve(key, request_hash)
+    row["request_hash"] = bytes(row["request_hash"])
+    if row["response_body"] is not None:
+        row["response_body"] = bytes(row["response_body"])
+    return row
+
+
+def complete(key: str, status: int, headers: list[tuple[str, str]], body: bytes) -> None:
+    db.execute(
+        """
+        UPDATE idempotency_keys
+        SET status = %s, response_headers = %s, response_body = %s
+        WHERE key = %s
+        """,
+        (status, db.json_param(headers), Binary(body), key),
+    )
+
+
+def release(key: str) -> None:
+    """Forget a reservation whose request failed, so the client can retry it."""
+    db.execute("DELETE FROM idempotency_keys WHERE key = %s AND status IS NULL", (key,))
+
+
+def purge_expired() -> int:
+    with db.transaction() as cur:
+        cur.execute("DELETE FROM idempotency_keys WHERE expires_at < NOW()")
+        return cur.rowcount
+
+
+def _maybe_purge() -> None:
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < settings.idempotency_purge_interval_seconds:
+        return
+    with _purge_lock:
+        if now - _last_purge < settings.idempotency_purge_interval_seconds:
+            return
+        _last_purge = now
+    purge_expired()
@@ -0,0 +1,441 @@
+"""In-process background jobs backed by the `jobs` table.
+
+Every API worker runs one `JobRunner` thread. Runners claim queued jobs with
+`FOR UPDATE SKIP LOCKED`, so several workers (or `scripts/run_jobs.py`) can poll
+the same table and each job runs exactly once at a time. The rules:
+
+- At most one queued or running job can exist per `dedupe_key`.
+  Enqueueing a duplicate returns the existing job.
+- `schedule_key` is unique for good. The month-close scheduler relies on it
+  to create each occurrence only once, however many workers are running.
+- A handler that raises is retried with exponential backoff until
+  `max_attempts` is reached.
+- A running job whose lease (`locked_at`, renewed by a heartbeat while its
+  handler runs) expires is assumed to belong to a dead worker and is requeued.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable
+
+from backend import billing, db, partitions, records, rollups
+from backend.cache import cache
+from backend.settings import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS = """
+    id, kind, params, status, attempts, max_attempts, run_at, dedupe_key, schedule_key,
+    progress, progress_message, result, error, locked_by, created_at, started_at, finished_at
+"""
+
+
+class JobContext:
+    def __init__(self, job: dict[str, Any], worker_id: str) -> None:
+        self.job = job
+        self.worker_id = worker_id
+
+    def progress(self, done: float, total: float, message: str | None = None) -> None:
+        """Report progress (also renews the lease on the job)."""
+        fraction = min(1.0, max(0.0, done / total)) if total else 1.0
+        db.execute(
+            """
+            UPDATE jobs
+            SET progress = %s, progress_message = %s, locked_at = NOW()
+            WHERE id = %s AND locked_by = %s
+            """,
+            (fraction, message, self.job["id"], self.worker_id),
+        )
+
+
+class _Heartbeat:
+    """Renews the lease on a running job until the handler returns.
+
+    Handlers that work in one long transaction never report progress, and
+    without this another worker would requeue and rerun them after
+    `jobs_lease_seconds` while they are still running.
+    """
+
+    def __init__(self, job_id: int, worker_id: str) -> None:
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = max(1.0, settings.jobs_lease_seconds / 3)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"job-heartbeat-{job_id}", daemon=True)
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                db.execute(
+                    "UPDATE jobs SET locked_at = NOW() WHERE id = %s AND locked_by = %s",
+                    (self.job_id, self.worker_id),
+                )
+            except Exception:
+                logger.exception("Could not renew the lease on job %s", self.job_id)
+
+
+Handler = Callable[[JobContext, dict[str, Any]], dict[str, Any]]
+
+
+def _month_param(params: dict[str, Any], key: str = "month") -> date:
+    return billing.month_start(date.fromisoformat(str(params[key])))
+
+
+def _months(start: date, end: date) -> list[date]:
+    months = []
+    month = billing.month_start(start)
+    while month <= end:
+        months.append(month)
+        month = billing.next_month(month)
+    return months
+
+
+def _auto_credit(ctx: JobContext, params: dict[str, Any]) -> dict[str, Any]:
+    month = _month_param(params)
+    with db.transaction() as cur:
+        created = billing.auto_credit(cur, month, params.get("athlete_id"))
+        if created:
+            billing.rebuild_ledger(cur, month, params.get("athlete_id"))
+    if created:
+        cache.invalidate("payment_adjustments")
+    return {"month": month.isoformat(), "created": created}
+
+
+def _ledger_rebuild(ctx: JobContext, params: dict[str, Any]) -> dict[str, Any]:
+    start = _month_param(params, "start") if "start" in params else _month_param(params)
+    end = _month_param(params, "end") if "end" in params else start
+    months = _months(start, end)
+
+    rows = 0
+    for i, month in enumerate(months):
+        with db.transaction() as cur:
+            rows += billing.rebuild_ledger(cur, month, params.get("athlete_id"))
+        ctx.progress(i + 1, len(months), f"{month:%Y-%m}")
+    return {"months": len(months), "rows": rows}
+
+
+def _rollup_refresh(ctx: JobContext, params: dict[str, Any]) -> dict[str, Any]:
+    start = date.fromisoformat(str(params["start"]))
+    end = date.fromisoformat(str(params["end"]))
+    # One month per transaction keeps locks short and makes progress visible.
+    months = _months(start, end)
+    for i, month in enumerate(months):
+        last_day = billing.next_month(month) - timedelta(days=1)
+        with db.transaction() as cur:
+            rollups.refresh_range(cur, max(start, month), min(end, last_day), params.get("athlete_id"))
+        ctx.progress(i + 1, len(months), f"{month:%Y-%m}")
+    return {"start": start.isoformat(), "end": end.isoformat(), "months": len(months)}
+
+
+def _records_rebuild(ctx: JobContext, params: dict[str, Any]) -> dict[str, Any]:
+    with db.transaction() as cur:
+        processed = records.rebuild(cur, params.get("athlete_id"))
+    return {"sessions": processed}
+
+
+def _plan_apply(ctx: JobContext, params: dict[str, Any]) -> dict[str, Any]:
+    month = _month_param(params)
+    with db.transaction() as cur:
+        updated = billing.apply_plans(cur, month)
+    if updated:
+        cache.invalidate("athletes")
+    return {"month": month.isoformat(), "athletes": updated}
+
+
+def _partition_maintenance(ctx: JobContext, params: dict[str, Any]) -> dict[str, Any]:
+    months_ahead = int(params.get("months_ahead", settings.training_sessions_partition_months_ahead))
+    with db.transaction() as cur:
+        created = partitions.ensure_ahead(cur, months_ahead)
+    return {"months_ahead": months_ahead, "created": created}
+
+
+def _completed_data_compact(ctx: JobContext, params: dict[str, Any]) -> dict[str, Any]:
+    # Rewrites v1 documents; the encode trigger fires because `exercises` is in the SET list.
+    batch_size = int(params.get("batch_size", settings.training_sessions_archive_batch_size))
+    total = db.fetch_one(
+        """
+        SELECT COUNT(*)::int AS n FROM training_sessions
+        WHERE jsonb_typeof(completed_data) = 'object' AND NOT completed_data ? 'v'
+        """
+    )["n"]
+    done = 0
+    while True:
+        with db.transaction() as cur:
+            cur.execute(
+                """
+                UPDATE training_sessions SET exercises = exercises
+                WHERE id IN (
+                    SELECT id FROM training_sessions
+                    WHERE jsonb_typeof(completed_data) = 'object' AND NOT completed_data ? 'v'
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                (batch_size,),
+            )
+            updated = cur.rowcount
+        if not updated:
+            break
+        done += updated
+        ctx.progress(done, max(total, done), f"{done} sessions")
+    return {"sessions": done}
+
+
+def _session_archive(ctx: JobContext, params: dict[str, Any]) -> dict[str, Any]:
+    days = int(params.get("older_than_days", settings.training_sessions_archive_after_days))
+    batch_size = int(params.get("batch_size", settings.training_sessions_archive_batch_size))
+    cutoff = date.today() - timedelta(days=days)
+    total = db.fetch_one("SELECT COUNT(*)::int AS n FROM training_sessions WHERE session_date < %s", (cutoff,))["n"]
+    moved = 0
+    while True:
+        # Rollups, records and billing read training_sessions_all, so nothing else changes.
+        with db.transaction() as cur:
+            cur.execute(
+                """
+                WITH moved AS (
+                    DELETE FROM training_sessions
+                    WHERE session_date < %(cutoff)s AND id IN (
+                        SELECT id FROM training_sessions
+                        WHERE session_date < %(cutoff)s
+                        ORDER BY session_date ASC, id ASC
+                        LIMIT %(limit)s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING *
+                )
+                INSERT INTO training_sessions_archive SELECT * FROM moved
+                """,
+                {"cutoff": cutoff, "limit": batch_size},
+            )
+            count = cur.rowcount
+        if not count:
+            break
+        moved += count
+        ctx.progress(moved, max(total, moved), f"{moved} sessions")
+    if moved:
+        cache.invalidate("training_sessions")
+    return {"cutoff": cutoff.isoformat(), "moved": moved}
+
+
+HANDLERS: dict[str, Handler] = {
+    "auto_credit": _auto_credit,
+    "ledger_rebuild": _ledger_rebuild,
+    "rollup_refresh": _rollup_refresh,
+    "records_rebuild": _records_rebuild,
+    "partition_maintenance": _partition_maintenance,
+    "completed_data_compact": _completed_data_compact,
+    "session_archive": _session_archive,
+    "plan_apply": _plan_apply,
+}
+
+
+def enqueue(
+    kind: str,
+    params: dict[str, Any] | None = None,
+    *,
+    run_at: datetime | None = None,
+    dedupe_key: str | None = None,
+    schedule_key: str | None = None,
+    max_attempts: int | None = None,
+) -> dict[str, Any]:
+    """Queue a job, or return the already active job with the same dedupe_key."""
+
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    row = db.fetch_one(
+        f"""
+        INSERT INTO jobs (kind, params, run_at, dedupe_key, schedule_key, max_attempts)
+        VALUES (%s, %s, COALESCE(%s, NOW()), %s, %s, %s)
+        ON CONFLICT DO NOTHING
+        RETURNING {JOB_COLUMNS}
+        """,
+        (
+            kind,
+            db.json_param(params or {}),
+            run_at,
+            dedupe_key,
+            schedule_key,
+            max_attempts or settings.jobs_max_attempts,
+        ),
+    )
+    if row is not None:
+        return row
+
+    existing = db.fetch_one(
+        f"""
+        SELECT {JOB_COLUMNS}
+        FROM jobs
+        WHERE (dedupe_key = %s AND status IN ('queued', 'running')) OR schedule_key = %s
+        ORDER BY id DESC
+        LIMIT 1
+        """,
+        (dedupe_key, schedule_key),
+    )
+    if existing is None:
+        # The conflicting job finished in between; try once more.
+        return enqueue(
+            kind, params, run_at=run_at, dedupe_key=dedupe_key, schedule_key=schedule_key, max_attempts=max_attempts
+        )
+    return existing
+
+
+def get_job(job_id: int) -> dict[str, Any] | None:
+    return db.fetch_one(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = %s", (job_id,))
+
+
+def _requeue_expired() -> None:
+    db.execute(
+        """
+        UPDATE jobs
+        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+            error = COALESCE(error, 'Worker lease expired'),
+            finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+            locked_by = NULL,
+            locked_at = NULL
+        WHERE status = 'running' AND locked_at < NOW() - make_interval(secs => %s)
+        """,
+        (settings.jobs_lease_seconds,),
+    )
+
+
+def _claim(worker_id: str) -> dict[str, Any] | None:
+    return db.fetch_one(
+        f"""
+        UPDATE jobs
+        SET status = 'running', attempts = attempts + 1, locked_by = %s, locked_at = NOW(),
+            started_at = NOW(), progress = 0, progress_message = NULL
+        WHERE id = (
+            SELECT id
+            FROM jobs
+            WHERE status = 'queued' AND run_at <= NOW()
+            ORDER BY run_at ASC, id ASC
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING {JOB_COLUMNS}
+        """,
+        (worker_id,),
+    )
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_once(worker_id: str) -> bool:
+    """Claim and run one due job. Returns False when the queue is empty."""
+
+    _requeue_expired()
+    job = _claim(worker_id)
+    if job is None:
+        return False
+
+    try:
+        with _Heartbeat(job["id"], worker_id):
+            result = HANDLERS[job["kind"]](JobContext(job, worker_id), job["params"] or {})
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job["id"], job["kind"])
+        # Backoff: base, 2x base, 4x base, ...
+        db.execute(
+            """
+            UPDATE jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                run_at = NOW() + make_interval(secs => %s * power(2, attempts - 1)),
+                finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+                error = %s,
+                locked_by = NULL,
+                locked_at = NULL
+            WHERE id = %s AND locked_by = %s
+            """,
+            (settings.jobs_retry_backoff_seconds, f"{type(e).__name__}: {e}", job["id"], worker_id),
+        )
+        return True
+
+    db.execute(
+        """
+        UPDATE jobs
+        SET status = 'succeeded', progress = 1, result = %s, error = NULL,
+            finished_at = NOW(), locked_by = NULL, locked_at = NULL
+        WHERE id = %s AND locked_by = %s
+        """,
+        (db.json_param(result), job["id"], worker_id),
+    )
+    return True
+
+
+def schedule_month_close(today: date) -> None:
+    """Queue the month-close jobs for the month `today` falls in (idempotent)."""
+
+    month = billing.month_start(today)
+    closed = billing.previous_month(month)
+    tag = f"{month:%Y-%m}"
+    # Credits for sessions cancelled last month apply to this month.
+    enqueue(
+        "auto_credit",
+        {"month": month.isoformat()},
+        dedupe_key=f"auto_credit:{month.isoformat()}:all",
+        schedule_key=f"month_close:{tag}:auto_credit",
+    )
+    # The closed month's own credits were created at its start, so its ledger is final now.
+    enqueue("ledger_rebuild", {"month": closed.isoformat()}, schedule_key=f"month_close:{tag}:ledger_rebuild")
+    # Plans scheduled to start this month become the athletes' current plan.
+    enqueue("plan_apply", {"month": month.isoformat()}, schedule_key=f"month_close:{tag}:plan_apply")
+    # Open the new month: every athlete gets a ledger row, so monthly fees count
+    # towards balances before any activity. Writes keep the rows current after that.
+    enqueue("ledger_rebuild", {"month": month.isoformat()}, schedule_key=f"month_close:{tag}:ledger_open")
+    enqueue(
+        "rollup_refresh",
+        {"start": closed.isoformat(), "end": (month - timedelta(days=1)).isoformat()},
+        schedule_key=f"month_close:{tag}:rollup_refresh",
+    )
+    enqueue("partition_maintenance", schedule_key=f"month_close:{tag}:partition_maintenance")
+    if settings.training_sessions_archive_enabled:
+        enqueue("session_archive", schedule_key=f"month_close:{tag}:session_archive")
+
+
+class JobRunner:
+    """Polls the queue on a daemon thread until `stop()`."""
+
+    def __init__(self, poll_interval: float, schedule: bool = True) -> None:
+        self.poll_interval = poll_interval
+        self.schedule = schedule
+        self.worker_id = default_worker_id()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_schedule = 0.0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.schedule and time.monotonic() - self._last_schedule >= 60:
+                    self._last_schedule = time.monotonic()
+                    schedule_month_close(date.today())
+                # Drain whatever is due before sleeping again.
+                while not self._stop.is_set() and run_once(self.worker_id):
+                    pass
+            except Exception:
+                logger.exception("Job runner iteration failed")
+            self._stop.wait(self.poll_interval)
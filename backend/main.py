@@ -1,21 +1,86 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import anyio.to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from backend import db, jobs
 from backend.api.router import api_router
+from backend.changefeed import feed
+from backend.middleware import (
+    CompressionMiddleware,
+    ConcurrencyLimitMiddleware,
+    IdempotencyMiddleware,
+    ReadRoutingMiddleware,
+)
 from backend.settings import settings
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Sync handlers run in anyio's default threadpool; size it to the DB pool.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_tokens
+    runner = None
+    if settings.jobs_enabled:
+        runner = jobs.JobRunner(settings.jobs_poll_interval_seconds, schedule=settings.jobs_month_close_enabled)
+        runner.start()
+    if settings.events_enabled:
+        # One LISTEN connection per worker, shared by every /events stream.
+        feed.start(asyncio.get_running_loop())
+    yield
+    feed.stop()
+    if runner is not None:
+        runner.stop()
+    db.close_pool()
+
+
 def create_app() -> FastAPI:
-    app = FastAPI(title="Strong Fitness Studio API")
+    app = FastAPI(title="Strong Fitness Studio API", lifespan=lifespan)
+
+    # Innermost: requests shed by the limiter never reserve a key, and stored
+    # responses are uncompressed so any client encoding can be served on replay.
+    if settings.idempotency_enabled:
+        app.add_middleware(IdempotencyMiddleware)
+
+    # Outside idempotency so replayed writes refresh the read-your-writes cookie too.
+    if settings.replica_url_list:
+        app.add_middleware(
+            ReadRoutingMiddleware,
+            cookie_name=settings.read_your_writes_cookie,
+            sticky_seconds=settings.read_your_writes_seconds,
+        )
+
+    if settings.concurrency_limit_enabled:
+        app.add_middleware(
+            ConcurrencyLimitMiddleware,
+            max_concurrent=settings.concurrency_limit,
+            max_queued=settings.queue_limit,
+            queue_timeout=settings.queue_timeout_seconds,
+            retry_after=settings.retry_after_seconds,
+            # Event streams stay open indefinitely and would pin a slot each.
+            exempt_paths=("/health", "/events"),
+        )
+
+    if settings.compression_enabled:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_minimum_size,
+            encodings=settings.compression_encoding_list,
+            levels=settings.compression_levels,
+        )
 
+    # Added last so it is outermost: shed (503) responses still carry CORS headers.
     app.add_middleware(
         CORSMiddleware,
         allow_origins=settings.cors_origin_list,
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Retry-After", "Idempotent-Replayed"],
     )
 
     app.include_router(api_router)
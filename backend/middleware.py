@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from http.cookies import SimpleCookie
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend import db, idempotency
+from backend.compression import Encoder, available_encodings, make_encoder, negotiate
+
+
+async def _send_json(send: Send, status: int, detail: str, headers: list[tuple[bytes, bytes]] | None = None) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *(headers or []),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class ConcurrencyLimitMiddleware:
+    """Admission control for the worker.
+
+    At most `max_concurrent` requests run at once; up to `max_queued` more may wait
+    `queue_timeout` seconds for a slot. Anything beyond that is shed immediately with
+    503 + Retry-After, so overload shows up as fast retries instead of timeouts.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_concurrent: int,
+        max_queued: int,
+        queue_timeout: float,
+        retry_after: int = 1,
+        exempt_paths: tuple[str, ...] = ("/health",),
+    ) -> None:
+        self.app = app
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.exempt_paths = exempt_paths
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if self._slots.locked():
+            if self._waiting >= self.max_queued:
+                await self._reject(send)
+                return
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                await self._reject(send)
+                return
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._slots.release()
+
+    async def _reject(self, send: Send) -> None:
+        await _send_json(
+            send, 503, "Server busy, please retry shortly", [(b"retry-after", str(self.retry_after).encode())]
+        )
+
+
+class IdempotencyMiddleware:
+    """Honours the `Idempotency-Key` header on writes.
+
+    The first request with a key runs normally and its response is stored (see
+    backend/idempotency.py). A retry with the same method, path and body gets the
+    stored response back, marked `Idempotent-Replayed: true`, without running the
+    handler again. Reusing a key for a different request is rejected with 422, and a
+    retry that arrives while the original is still running gets 409. 5xx responses
+    and exceptions release the key so the client can simply try again.
+    """
+
+    methods = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+    max_key_length = 255
+    # Recomputed by the server (or by outer middleware) on replay.
+    _unstored_headers = frozenset({b"content-length", b"date", b"server"})
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+        key = Headers(scope=scope).get("idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        key = key.strip()
+        if not key or len(key) > self.max_key_length:
+            await _send_json(send, 400, f"Idempotency-Key must be 1-{self.max_key_length} characters")
+            return
+
+        chunks: list[bytes] = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+
+        target = scope["path"] + (f"?{scope['query_string'].decode()}" if scope.get("query_string") else "")
+        request_hash = idempotency.fingerprint(scope["method"], target, body)
+        existing = await anyio.to_thread.run_sync(idempotency.reserve, key, request_hash)
+        if existing is not None:
+            await self._replay(existing, request_hash, send)
+            return
+
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status: int | None = None
+        stored_headers: list[tuple[str, str]] = []
+        response_chunks: list[bytes] = []
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stored_headers.extend(
+                    (k.decode("latin-1"), v.decode("latin-1"))
+                    for k, v in message.get("headers", [])
+                    if k.lower() not in self._unstored_headers
+                )
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await anyio.to_thread.run_sync(idempotency.release, key)
+            raise
+
+        if status is not None and status < 500:
+            await anyio.to_thread.run_sync(
+                idempotency.complete, key, status, stored_headers, b"".join(response_chunks)
+            )
+        else:
+            await anyio.to_thread.run_sync(idempotency.release, key)
+
+    async def _replay(self, existing: dict, request_hash: bytes, send: Send) -> None:
+        if existing["request_hash"] != request_hash:
+            await _send_json(send, 422, "Idempotency-Key was already used for a different request")
+            return
+        if existing["status"] is None:
+            await _send_json(
+                send, 409, "A request with this Idempotency-Key is still in progress", [(b"retry-after", b"1")]
+            )
+            return
+
+        body = existing["response_body"] or b""
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in existing["response_headers"] or []]
+        headers += [(b"content-length", str(len(body)).encode()), (b"idempotent-replayed", b"true")]
+        await send({"type": "http.response.start", "status": existing["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+class ReadRoutingMiddleware:
+    """Sends the reads of GET/HEAD requests to a replica (see backend/db.py).
+
+    A successful write sets a short-lived cookie. While the cookie is set, that
+    client's reads stay on the primary, so it always sees its own changes even
+    though the replicas lag slightly behind.
+    """
+
+    read_methods = frozenset({"GET", "HEAD"})
+
+    def __init__(self, app: ASGIApp, cookie_name: str, sticky_seconds: float) -> None:
+        self.app = app
+        self.cookie_name = cookie_name
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in self.read_methods:
+            with db.reads_from_replica(not self._sticky(scope)):
+                await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = MutableHeaders(scope=message)
+                headers.append("set-cookie", self._cookie(scope))
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+    def _sticky(self, scope: Scope) -> bool:
+        raw = Headers(scope=scope).get("cookie")
+        if not raw:
+            return False
+        morsel = SimpleCookie(raw).get(self.cookie_name)
+        try:
+            return morsel is not None and float(morsel.value) > time.time()
+        except ValueError:
+            return False
+
+    def _cookie(self, scope: Scope) -> str:
+        until = time.time() + self.sticky_seconds
+        # The API and the frontend live on different sites in production.
+        same_site = "None; Secure" if scope.get("scheme") == "https" else "Lax"
+        return (
+            f"{self.cookie_name}={until:.3f}; Max-Age={int(self.sticky_seconds) + 1}; "
+            f"Path=/; HttpOnly; SameSite={same_site}"
+        )
+
+
+class CompressionMiddleware:
+    """Negotiated response compression (br / zstd / gzip, whichever are installed).
+
+    Complete bodies smaller than `minimum_size` are sent as-is. Streaming responses
+    are compressed chunk by chunk and flushed after every chunk so clients see
+    data as soon as the handler yields it. Responses that are already encoded or
+    whose media type is excluded (e.g. Server-Sent Events) are passed through.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        encodings: list[str] | None = None,
+        levels: dict[str, int] | None = None,
+        excluded_media_types: tuple[str, ...] = ("text/event-stream",),
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings(encodings or ["br", "zstd", "gzip"])
+        self.levels = {"gzip": 6, "br": 6, "zstd": 9, **(levels or {})}
+        self.excluded_media_types = excluded_media_types
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start_message: Message | None = None
+        self.encoder: Encoder | None = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self.downstream(message)
+            return
+
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "").split(";")[0].strip()
+            if "content-encoding" in headers or media_type in self.middleware.excluded_media_types:
+                self.passthrough = True
+                await self.downstream(message)
+            else:
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            # Other extensions (e.g. pathsend): flush the held start message and step aside.
+            self.passthrough = True
+            if self.start_message is not None:
+                await self.downstream(self.start_message)
+            await self.downstream(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+
+        if self.encoder is not None:
+            data = self.encoder.compress(body) + (self.encoder.flush() if more_body else self.encoder.finish())
+            await self.downstream({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        assert self.start_message is not None
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers.add_vary_header("Accept-Encoding")
+
+        if not more_body and len(body) < self.middleware.minimum_size:
+            self.passthrough = True
+            await self.downstream(self.start_message)
+            await self.downstream(message)
+            return
+
+        encoder = make_encoder(self.encoding, self.middleware.levels)
+        headers["Content-Encoding"] = self.encoding
+        if more_body:
+            # Streaming: length is unknown up front.
+            self.encoder = encoder
+            del headers["Content-Length"]
+            data = encoder.compress(body) + encoder.flush()
+        else:
+            data = encoder.compress(body) + encoder.finish()
+            headers["Content-Length"] = str(len(data))
+
+        await self.downstream(self.start_message)
+        await self.downstream({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -0,0 +1,130 @@
+"""Studio occupancy per hour slot, for the weekday x hour heatmap.
+
+A session occupies every hour its `session_time` + `duration` span touches,
+for the minutes it spends in each. Sessions without a positive duration count
+as `DEFAULT_DURATION_MINUTES`, the session form's default. Spans are capped at
+a day, so a late session can spill into the next day but no further.
+
+`session_hour_slots` keeps one 'day' row per (date, hour, status) with the
+sessions and minutes in that slot. It also keeps 'month' rows summed per
+(month, weekday, hour, status), so a year reads about twelve months of rows
+instead of every day. rollups.refresh_sessions and rollups.refresh_range call
+into this module, so every session write and reconciliation keeps the slots
+current. Like the rollups, slots read `training_sessions_all`, and each refresh
+locks its months first so concurrent writers don't collide on the primary key.
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Iterable
+
+from backend import billing, db
+
+DEFAULT_DURATION_MINUTES = 60
+
+# {session_filter} picks the sessions and {slot_filter} the slot days to write;
+# sessions from the day before a slot day can spill into it.
+_DAY_SLOTS_SQL = """
+    INSERT INTO session_hour_slots (granularity, period_start, weekday, hour, status, sessions, minutes)
+    SELECT 'day', slot.starts_at::date, EXTRACT(ISODOW FROM slot.starts_at), EXTRACT(HOUR FROM slot.starts_at),
+           COALESCE(ts.status, 'Scheduled'),
+           COUNT(*),
+           ROUND(SUM(EXTRACT(EPOCH FROM LEAST(slot.starts_at + interval '1 hour', span.ends_at)
+                                      - GREATEST(slot.starts_at, span.starts_at)) / 60))
+    FROM training_sessions_all ts
+    CROSS JOIN LATERAL (
+        SELECT ts.session_date + ts.session_time AS starts_at,
+               ts.session_date + ts.session_time
+                   + make_interval(mins => CASE WHEN ts.duration > 0 THEN LEAST(ts.duration, 1440)
+                                                ELSE %(default_minutes)s END)
+                   AS ends_at
+    ) span
+    CROSS JOIN LATERAL generate_series(
+        date_trunc('hour', span.starts_at), span.ends_at - interval '1 microsecond', interval '1 hour'
+    ) slot(starts_at)
+    WHERE {session_filter}
+      AND slot.starts_at::date {slot_filter}
+    GROUP BY 2, 3, 4, 5
+"""
+
+
+def refresh_sessions(cur: Any, days: Iterable[date | None]) -> None:
+    """Recompute the slots a session on each of `days` can occupy (that day and the next)."""
+
+    slot_days = set()
+    for day in days:
+        if day is not None:
+            slot_days.update((day, day + timedelta(days=1)))
+    if not slot_days:
+        return
+    session_days = sorted(slot_days | {day - timedelta(days=1) for day in slot_days})
+    params = {
+        "days": sorted(slot_days),
+        "session_days": session_days,
+        "default_minutes": DEFAULT_DURATION_MINUTES,
+    }
+    months = {billing.month_start(day) for day in slot_days}
+    db.lock_months(cur, "session_hour_slots", months)
+    cur.execute("DELETE FROM session_hour_slots WHERE granularity = 'day' AND period_start = ANY(%(days)s)", params)
+    cur.execute(
+        _DAY_SLOTS_SQL.format(
+            session_filter="ts.session_date = ANY(%(session_days)s::date[])",
+            slot_filter="= ANY(%(days)s::date[])",
+        ),
+        params,
+    )
+    _refresh_months(cur, months)
+
+
+def refresh_range(cur: Any, start: date, end: date) -> None:
+    """Recompute every slot sessions dated within [start, end] (inclusive) can occupy."""
+
+    params = {
+        "lo": start,
+        # Sessions on `end` can spill into the next day.
+        "hi": end + timedelta(days=2),
+        "default_minutes": DEFAULT_DURATION_MINUTES,
+    }
+    months = set()
+    month = billing.month_start(start)
+    while month < params["hi"]:
+        months.add(month)
+        month = billing.next_month(month)
+    db.lock_months(cur, "session_hour_slots", months)
+    cur.execute(
+        """
+        DELETE FROM session_hour_slots
+        WHERE granularity = 'day' AND period_start >= %(lo)s AND period_start < %(hi)s
+        """,
+        params,
+    )
+    cur.execute(
+        _DAY_SLOTS_SQL.format(
+            session_filter="ts.session_date >= %(lo)s::date - 1 AND ts.session_date < %(hi)s",
+            slot_filter=">= %(lo)s AND slot.starts_at < %(hi)s",
+        ),
+        params,
+    )
+    _refresh_months(cur, months)
+
+
+def _refresh_months(cur: Any, months: set[date]) -> None:
+    if not months:
+        return
+    params = {"months": sorted(months), "lo": min(months), "hi": billing.next_month(max(months))}
+    cur.execute(
+        "DELETE FROM session_hour_slots WHERE granularity = 'month' AND period_start = ANY(%(months)s)",
+        params,
+    )
+    cur.execute(
+        """
+        INSERT INTO session_hour_slots (granularity, period_start, weekday, hour, status, sessions, minutes)
+        SELECT 'month', date_trunc('month', period_start)::date, weekday, hour, status, SUM(sessions), SUM(minutes)
+        FROM session_hour_slots
+        WHERE granularity = 'day' AND period_start >= %(lo)s AND period_start < %(hi)s
+          AND date_trunc('month', period_start)::date = ANY(%(months)s::date[])
+        GROUP BY 2, 3, 4, 5
+        """,
+        params,
+    )
@@ -0,0 +1,83 @@
+"""Monthly range partitions of `training_sessions`.
+
+The table is partitioned by `session_date`, one partition per calendar month
+(`training_sessions_pYYYYMM`). scripts/init_db.py creates the current and next
+12 months, and the month-close `partition_maintenance` job keeps the horizon
+`training_sessions_partition_months_ahead` months ahead. There is no default
+partition, so a write for a month outside the horizon would fail: the write
+paths call `ensure` first, in the same transaction, which creates the missing
+month on the fly.
+
+Old months can be detached or moved to cheaper storage with
+scripts/manage_partitions.py. `detach` records the months it removed in
+`partition_horizons`, and `ensure` raises `MonthDetached` for them instead of
+recreating them empty. There is no per-process cache of existing months, so
+every worker sees a detach as soon as it commits.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Iterable
+
+import psycopg2.errors
+
+from backend import billing, db
+
+
+class MonthDetached(Exception):
+    """A write targets a month whose partition was detached."""
+
+
+def partition_name(month: date) -> str:
+    return f"training_sessions_p{month:%Y%m}"
+
+
+def ensure(cur: Any, dates: Iterable[date | None]) -> int:
+    """Make sure every month in `dates` has an attached partition. Returns how many were created.
+
+    Raises `MonthDetached` (and leaves the transaction aborted) for a detached month.
+    """
+
+    months = sorted({billing.month_start(d) for d in dates if d is not None})
+    if not months:
+        return 0
+    try:
+        cur.execute(
+            """
+            SELECT COUNT(*) FILTER (WHERE ensure_training_sessions_partition(m)) AS created
+            FROM unnest(%s::date[]) m
+            """,
+            (months,),
+        )
+    except psycopg2.errors.ObjectNotInPrerequisiteState as e:
+        raise MonthDetached(e.diag.message_primary or str(e)) from e
+    return cur.fetchone()["created"]
+
+
+def ensure_ahead(cur: Any, months_ahead: int, today: date | None = None) -> int:
+    """Create the partitions from the current month through `months_ahead` months ahead."""
+
+    month = billing.month_start(today or date.today())
+    months = [month]
+    for _ in range(months_ahead):
+        month = billing.next_month(month)
+        months.append(month)
+    return ensure(cur, months)
+
+
+def list_partitions() -> list[dict[str, Any]]:
+    return db.fetch_all(
+        """
+        SELECT c.relname AS name,
+               pg_get_expr(c.relpartbound, c.oid) AS bounds,
+               COALESCE(t.spcname, 'pg_default') AS tablespace,
+               c.reltuples::bigint AS estimated_rows,
+               pg_total_relation_size(c.oid) AS total_bytes
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        LEFT JOIN pg_tablespace t ON t.oid = c.reltablespace
+        WHERE i.inhparent = 'training_sessions'::regclass
+        ORDER BY c.relname
+        """
+    )
@@ -0,0 +1,307 @@
+"""Personal-record engine.
+
+Every completed session is reduced to one `exercise_session_stats` row per
+exercise (best weight, volume, estimated 1RM). `athlete_exercise_bests` keeps
+the current best per (athlete, exercise) plus a rolling volume, and
+`personal_records` stores an event each time a session beats a previous best.
+
+`sync_session` is called in the same transaction as any write that can change
+a session's completed results. In the common case (first completion) it
+compares against the stored bests, a handful of indexed statements no matter
+how long the athlete's history is. Re-completions, edits and deletions
+recompute the affected exercises from the per-session stats.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from psycopg2.extras import execute_values
+
+from backend.training_metrics import ExerciseMetrics, session_exercise_metrics
+
+ROLLING_VOLUME_SESSIONS = 4
+
+_RECORD_TYPES = (("weight", "best_weight"), ("volume", "best_volume"), ("e1rm", "best_e1rm"))
+
+
+def sync_session(cur: Any, session_id: int) -> list[dict[str, Any]]:
+    """Bring stats/bests/records in line with the session's current state.
+
+    Returns the PR events created for this session.
+    """
+
+    cur.execute(
+        """
+        SELECT id, athlete_id, session_date, status,
+               decode_completed_data(completed_data, exercises) AS completed_data
+        FROM training_sessions_all
+        WHERE id = %s
+        """,
+        (session_id,),
+    )
+    session = cur.fetchone()
+
+    cur.execute(
+        "DELETE FROM exercise_session_stats WHERE session_id = %s RETURNING athlete_id, exercise_key",
+        (session_id,),
+    )
+    previous = cur.fetchall()
+
+    metrics: list[ExerciseMetrics] = []
+    if session is not None and session["status"] == "Completed":
+        metrics = session_exercise_metrics(session["completed_data"])
+
+    if metrics:
+        execute_values(
+            cur,
+            """
+            INSERT INTO exercise_session_stats (
+                session_id, athlete_id, exercise_key, exercise_name, session_date, weight, volume, e1rm
+            )
+            VALUES %s
+            """,
+            [
+                (session_id, session["athlete_id"], m.key, m.name, session["session_date"], m.weight, m.volume, m.e1rm)
+                for m in metrics
+            ],
+        )
+
+    if not previous:
+        if not metrics:
+            return []
+        return _apply_incremental(cur, session, metrics)
+
+    # The session had already been processed: it was re-completed, edited or removed.
+    cur.execute("DELETE FROM personal_records WHERE session_id = %s", (session_id,))
+    keys_by_athlete: dict[int, set[str]] = {}
+    for row in previous:
+        keys_by_athlete.setdefault(row["athlete_id"], set()).add(row["exercise_key"])
+    if metrics:
+        keys_by_athlete.setdefault(session["athlete_id"], set()).update(m.key for m in metrics)
+    for athlete_id, keys in keys_by_athlete.items():
+        _rebuild_bests(cur, athlete_id, sorted(keys))
+
+    if not metrics:
+        return []
+
+    # PRs relative to everything the athlete did before this session.
+    cur.execute(
+        """
+        SELECT exercise_key,
+               MAX(weight) AS best_weight, MAX(volume) AS best_volume, MAX(e1rm) AS best_e1rm
+        FROM exercise_session_stats
+        WHERE athlete_id = %s
+          AND exercise_key = ANY(%s)
+          AND (session_date, session_id) < (%s, %s)
+        GROUP BY exercise_key
+        """,
+        (session["athlete_id"], [m.key for m in metrics], session["session_date"], session_id),
+    )
+    earlier = {row["exercise_key"]: row for row in cur.fetchall()}
+    return _insert_events(cur, session, metrics, earlier)
+
+
+def rebuild(cur: Any, athlete_id: int | None = None) -> int:
+    """Replay completed sessions in date order (backfill / repair). Returns sessions processed."""
+
+    scope = "WHERE athlete_id = %s" if athlete_id is not None else ""
+    params: tuple[Any, ...] = (athlete_id,) if athlete_id is not None else ()
+    for table in ("personal_records", "athlete_exercise_bests", "exercise_session_stats"):
+        cur.execute(f"DELETE FROM {table} {scope}", params)
+
+    cur.execute(
+        f"""
+        SELECT id FROM training_sessions_all
+        WHERE status = 'Completed' AND completed_data IS NOT NULL
+        {'AND athlete_id = %s' if athlete_id is not None else ''}
+        ORDER BY session_date ASC, id ASC
+        """,
+        params,
+    )
+    session_ids = [row["id"] for row in cur.fetchall()]
+    for sid in session_ids:
+        sync_session(cur, sid)
+    return len(session_ids)
+
+
+def _apply_incremental(cur: Any, session: dict[str, Any], metrics: list[ExerciseMetrics]) -> list[dict[str, Any]]:
+    athlete_id = session["athlete_id"]
+    keys = [m.key for m in metrics]
+
+    cur.execute(
+        """
+        SELECT *
+        FROM athlete_exercise_bests
+        WHERE athlete_id = %s AND exercise_key = ANY(%s)
+        FOR UPDATE
+        """,
+        (athlete_id, keys),
+    )
+    current = {row["exercise_key"]: row for row in cur.fetchall()}
+    events = _insert_events(cur, session, metrics, current)
+
+    rows = []
+    for m in metrics:
+        best = current.get(m.key) or {}
+        row: list[Any] = [athlete_id, m.key, m.name]
+        for metric_type, column in _RECORD_TYPES:
+            value = getattr(m, metric_type)
+            old = best.get(column)
+            if value is not None and (old is None or value > float(old)):
+                row += [value, session["session_date"], session["id"]]
+            else:
+                row += [old, best.get(f"{column}_date"), best.get(f"{column}_session_id")]
+        last = best.get("last_session_date")
+        row += [
+            int(best.get("sessions_count") or 0) + 1,
+            max(last, session["session_date"]) if last else session["session_date"],
+        ]
+        rows.append(tuple(row))
+
+    execute_values(
+        cur,
+        """
+        INSERT INTO athlete_exercise_bests (
+            athlete_id, exercise_key, exercise_name,
+            best_weight, best_weight_date, best_weight_session_id,
+            best_volume, best_volume_date, best_volume_session_id,
+            best_e1rm, best_e1rm_date, best_e1rm_session_id,
+            sessions_count, last_session_date
+        )
+        VALUES %s
+        ON CONFLICT (athlete_id, exercise_key) DO UPDATE SET
+            exercise_name = EXCLUDED.exercise_name,
+            best_weight = EXCLUDED.best_weight,
+            best_weight_date = EXCLUDED.best_weight_date,
+            best_weight_session_id = EXCLUDED.best_weight_session_id,
+            best_volume = EXCLUDED.best_volume,
+            best_volume_date = EXCLUDED.best_volume_date,
+            best_volume_session_id = EXCLUDED.best_volume_session_id,
+            best_e1rm = EXCLUDED.best_e1rm,
+            best_e1rm_date = EXCLUDED.best_e1rm_date,
+            best_e1rm_session_id = EXCLUDED.best_e1rm_session_id,
+            sessions_count = EXCLUDED.sessions_count,
+            last_session_date = EXCLUDED.last_session_date,
+            updated_at = NOW()
+        """,
+        rows,
+    )
+    _update_rolling_volume(cur, athlete_id, keys)
+    return events
+
+
+def _insert_events(
+    cur: Any,
+    session: dict[str, Any],
+    metrics: list[ExerciseMetrics],
+    previous_bests: dict[str, dict[str, Any]],
+) -> list[dict[str, Any]]:
+    events: list[dict[str, Any]] = []
+    for m in metrics:
+        best = previous_bests.get(m.key)
+        if best is None:
+            # First time the athlete does this exercise: that's a baseline, not a PR.
+            continue
+        for metric_type, column in _RECORD_TYPES:
+            value = getattr(m, metric_type)
+            old = best.get(column)
+            if value is None or old is None or value <= float(old):
+                continue
+            events.append(
+                {
+                    "athlete_id": session["athlete_id"],
+                    "session_id": session["id"],
+                    "exercise_key": m.key,
+                    "exercise_name": m.name,
+                    "record_type": metric_type,
+                    "value": value,
+                    "previous_value": float(old),
+                    "achieved_on": session["session_date"],
+                }
+            )
+
+    if events:
+        execute_values(
+            cur,
+            """
+            INSERT INTO personal_records (
+                athlete_id, session_id, exercise_key, exercise_name,
+                record_type, value, previous_value, achieved_on
+            )
+            VALUES %s
+            """,
+            [
+                (
+                    e["athlete_id"],
+                    e["session_id"],
+                    e["exercise_key"],
+                    e["exercise_name"],
+                    e["record_type"],
+                    e["value"],
+                    e["previous_value"],
+                    e["achieved_on"],
+                )
+                for e in events
+            ],
+        )
+    return events
+
+
+def _rebuild_bests(cur: Any, athlete_id: int, keys: list[str]) -> None:
+    cur.execute(
+        "DELETE FROM athlete_exercise_bests WHERE athlete_id = %s AND exercise_key = ANY(%s)",
+        (athlete_id, keys),
+    )
+    cur.execute(
+        """
+        INSERT INTO athlete_exercise_bests (
+            athlete_id, exercise_key, exercise_name,
+            best_weight, best_weight_date, best_weight_session_id,
+            best_volume, best_volume_date, best_volume_session_id,
+            best_e1rm, best_e1rm_date, best_e1rm_session_id,
+            sessions_count, last_session_date
+        )
+        SELECT athlete_id, exercise_key,
+               (array_agg(exercise_name ORDER BY session_date DESC, session_id DESC))[1],
+               MAX(weight),
+               (array_agg(session_date ORDER BY weight DESC, session_date, session_id) FILTER (WHERE weight IS NOT NULL))[1],
+               (array_agg(session_id ORDER BY weight DESC, session_date, session_id) FILTER (WHERE weight IS NOT NULL))[1],
+               MAX(volume),
+               (array_agg(session_date ORDER BY volume DESC, session_date, session_id) FILTER (WHERE volume IS NOT NULL))[1],
+               (array_agg(session_id ORDER BY volume DESC, session_date, session_id) FILTER (WHERE volume IS NOT NULL))[1],
+               MAX(e1rm),
+               (array_agg(session_date ORDER BY e1rm DESC, session_date, session_id) FILTER (WHERE e1rm IS NOT NULL))[1],
+               (array_agg(session_id ORDER BY e1rm DESC, session_date, session_id) FILTER (WHERE e1rm IS NOT NULL))[1],
+               COUNT(*),
+               MAX(session_date)
+        FROM exercise_session_stats
+        WHERE athlete_id = %s AND exercise_key = ANY(%s)
+        GROUP BY athlete_id, exercise_key
+        """,
+        (athlete_id, keys),
+    )
+    _update_rolling_volume(cur, athlete_id, keys)
+
+
+def _update_rolling_volume(cur: Any, athlete_id: int, keys: list[str]) -> None:
+    cur.execute(
+        """
+        UPDATE athlete_exercise_bests b
+        SET rolling_volume = (
+            SELECT AVG(r.volume)
+            FROM (
+                SELECT s.volume
+                FROM exercise_session_stats s
+                WHERE s.athlete_id = b.athlete_id
+                  AND s.exercise_key = b.exercise_key
+                  AND s.volume IS NOT NULL
+                ORDER BY s.session_date DESC, s.session_id DESC
+                LIMIT %s
+            ) r
+        )
+        WHERE b.athlete_id = %s AND b.exercise_key = ANY(%s)
+        """,
+        (ROLLING_VOLUME_SESSIONS, athlete_id, keys),
+    )
+
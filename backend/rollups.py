@@ -0,0 +1,187 @@
+"""Day/week/month training rollups per athlete and for the whole studio.
+
+Writes to `training_sessions` call `refresh_sessions` in the same transaction
+with the (athlete, date) pairs they touched, old and new. Only the buckets that
+contain those dates are recomputed, from the handful of sessions inside them,
+so rollups stay exact without replaying history. `refresh_range` recomputes
+every bucket overlapping a date range and is what reconciliation uses. Both
+lock the months they rebuild first, so concurrent writers take turns.
+
+Studio rows are derived from the athlete rows of the same bucket. Buckets read
+`training_sessions_all`, so archived sessions keep counting. Both entry points
+also refresh the hourly occupancy slots (backend/occupancy.py).
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Iterable
+
+from backend import db, occupancy
+
+GRANULARITIES = ("day", "week", "month")
+
+_COUNTER_COLUMNS = (
+    "sessions_total",
+    "sessions_scheduled",
+    "sessions_completed",
+    "sessions_cancelled",
+    "minutes_trained",
+    "total_volume",
+    "exercises_completed",
+    "exercises_failed",
+    "exercises_skipped",
+)
+
+# Volume and exercise counts follow the Analysis page: sets x reps using the
+# first number of each string, only for sessions marked Completed.
+_ATHLETE_ROLLUP_SQL = r"""
+    INSERT INTO athlete_training_rollups (
+        athlete_id, granularity, period_start,
+        sessions_total, sessions_scheduled, sessions_completed, sessions_cancelled,
+        minutes_trained, total_volume,
+        exercises_completed, exercises_failed, exercises_skipped
+    )
+    SELECT ts.athlete_id, %(granularity)s, date_trunc(%(granularity)s, ts.session_date)::date,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE ts.status = 'Scheduled'),
+           COUNT(*) FILTER (WHERE ts.status = 'Completed'),
+           COUNT(*) FILTER (WHERE ts.status = 'Cancelled'),
+           COALESCE(SUM(ts.duration) FILTER (WHERE ts.status = 'Completed'), 0),
+           COALESCE(SUM(ex.volume), 0),
+           COALESCE(SUM(ex.completed), 0),
+           COALESCE(SUM(ex.failed), 0),
+           COALESCE(SUM(ex.skipped), 0)
+    FROM training_sessions_all ts
+    CROSS JOIN LATERAL (
+        SELECT CASE WHEN ts.status = 'Completed' THEN decode_completed_data(ts.completed_data, ts.exercises) END AS doc
+    ) cd
+    LEFT JOIN LATERAL (
+        SELECT SUM(
+                   substring(e->>'actual_sets' FROM '(\d+(?:\.\d+)?)')::numeric
+                   * substring(e->>'actual_reps' FROM '(\d+(?:\.\d+)?)')::numeric
+               ) FILTER (WHERE e->>'status' = 'completed') AS volume,
+               COUNT(*) FILTER (WHERE e->>'status' = 'completed') AS completed,
+               COUNT(*) FILTER (WHERE e->>'status' = 'failed') AS failed,
+               COUNT(*) FILTER (WHERE e->>'status' = 'skipped') AS skipped
+        FROM jsonb_array_elements(
+            CASE WHEN ts.status = 'Completed' AND jsonb_typeof(cd.doc->'exercises') = 'array'
+                 THEN cd.doc->'exercises'
+                 ELSE '[]'::jsonb
+            END
+        ) e
+        WHERE jsonb_typeof(e) = 'object'
+    ) ex ON TRUE
+    WHERE ts.athlete_id IS NOT NULL
+      AND ts.session_date >= %(lo)s AND ts.session_date < %(hi)s
+      {athlete_filter}
+    GROUP BY ts.athlete_id, date_trunc(%(granularity)s, ts.session_date)
+"""
+
+
+def bucket_start(granularity: str, day: date) -> date:
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def bucket_end(granularity: str, start: date) -> date:
+    """Exclusive end of the bucket starting at `start`."""
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def refresh_sessions(cur: Any, touched: Iterable[tuple[int | None, date | None]]) -> None:
+    """Recompute the buckets containing each (athlete_id, session_date) pair."""
+
+    touched = list(touched)
+    # Occupancy counts every session, with or without an athlete.
+    occupancy.refresh_sessions(cur, [day for _, day in touched])
+    pairs = {(athlete_id, day) for athlete_id, day in touched if athlete_id is not None and day is not None}
+    if not pairs:
+        return
+    buckets: dict[tuple[str, date], set[int]] = {}
+    for granularity in GRANULARITIES:
+        for athlete_id, day in pairs:
+            buckets.setdefault((granularity, bucket_start(granularity, day)), set()).add(athlete_id)
+    _lock(cur, [(start, bucket_end(granularity, start)) for granularity, start in buckets])
+    for (granularity, start), athlete_ids in sorted(buckets.items()):
+        _recompute(cur, granularity, start, bucket_end(granularity, start), sorted(athlete_ids))
+
+
+def refresh_range(cur: Any, start: date, end: date, athlete_id: int | None = None) -> None:
+    """Recompute every bucket overlapping [start, end] (inclusive), for one athlete or all."""
+
+    occupancy.refresh_range(cur, start, end)
+    spans = {
+        granularity: (bucket_start(granularity, start), bucket_end(granularity, bucket_start(granularity, end)))
+        for granularity in GRANULARITIES
+    }
+    _lock(cur, spans.values())
+    for granularity, (lo, hi) in spans.items():
+        _recompute(cur, granularity, lo, hi, [athlete_id] if athlete_id is not None else None)
+
+
+def _lock(cur: Any, spans: Iterable[tuple[date, date]]) -> None:
+    """Lock every month the [lo, hi) spans overlap before their buckets are rebuilt.
+
+    Writers whose buckets overlap (same athlete or not: the studio rows sum
+    them all) then recompute one after the other instead of colliding on the
+    primary keys.
+    """
+
+    months = set()
+    for lo, hi in spans:
+        month = lo.replace(day=1)
+        while month < hi:
+            months.add(month)
+            month = bucket_end("month", month)
+    db.lock_months(cur, "training_rollups", months)
+
+
+def _recompute(cur: Any, granularity: str, lo: date, hi: date, athlete_ids: list[int] | None) -> None:
+    params: dict[str, Any] = {"granularity": granularity, "lo": lo, "hi": hi, "athlete_ids": athlete_ids}
+    scope = "AND athlete_id = ANY(%(athlete_ids)s)" if athlete_ids is not None else ""
+
+    cur.execute(
+        f"""
+        DELETE FROM athlete_training_rollups
+        WHERE granularity = %(granularity)s AND period_start >= %(lo)s AND period_start < %(hi)s
+        {scope}
+        """,
+        params,
+    )
+    cur.execute(
+        _ATHLETE_ROLLUP_SQL.format(
+            athlete_filter="AND ts.athlete_id = ANY(%(athlete_ids)s)" if athlete_ids is not None else ""
+        ),
+        params,
+    )
+
+    cur.execute(
+        """
+        DELETE FROM studio_training_rollups
+        WHERE granularity = %(granularity)s AND period_start >= %(lo)s AND period_start < %(hi)s
+        """,
+        params,
+    )
+    sums = ", ".join(f"SUM({c})" for c in _COUNTER_COLUMNS)
+    cur.execute(
+        f"""
+        INSERT INTO studio_training_rollups (granularity, period_start, active_athletes, {', '.join(_COUNTER_COLUMNS)})
+        SELECT granularity, period_start, COUNT(*) FILTER (WHERE sessions_completed > 0), {sums}
+        FROM athlete_training_rollups
+        WHERE granularity = %(granularity)s AND period_start >= %(lo)s AND period_start < %(hi)s
+        GROUP BY granularity, period_start
+        """,
+        params,
+    )
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import date, datetime
-from typing import Any
+from typing import Annotated, Any, Literal
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -46,6 +46,8 @@ class AthleteUpdate(BaseModel):
     plan_sessions_per_week: int | None = None
     plan_monthly_price: float | None = None
     plan_on_demand_price: float | None = None
+    # First month billed with the new plan; defaults to the current month.
+    plan_effective_from: date | None = None
 
 
 class Athlete(AthleteCreate):
@@ -55,6 +57,36 @@ class Athlete(AthleteCreate):
     created_at: datetime | None = None
 
 
+class AthleteUpdateResult(BaseModel):
+    updated: bool
+    athlete: Athlete
+
+
+class AthleteLatestEvaluation(BaseModel):
+    id: int
+    evaluation_date: date
+    weight: float | None = None
+    muscle_percentage: float | None = None
+    fat_percentage: float | None = None
+    bone_percentage: float | None = None
+    water_percentage: float | None = None
+
+
+class AthleteNextSession(BaseModel):
+    id: int
+    session_name: str
+    session_date: date
+    session_time: str
+    duration: int | None = None
+    session_type: str | None = None
+
+
+class AthleteRosterEntry(Athlete):
+    # Only present when requested through ?include=
+    latest_evaluation: AthleteLatestEvaluation | None = None
+    next_session: AthleteNextSession | None = None
+
+
 class ExerciseCreate(BaseModel):
     name: str
     category: str | None = None
@@ -92,6 +124,44 @@ class Exercise(ExerciseCreate):
     created_at: datetime | None = None
 
 
+class ExerciseUpdateResult(BaseModel):
+    updated: bool
+    exercise: Exercise
+
+
+class ExerciseListItem(BaseModel):
+    """Catalog row without the long description/instructions/tips texts."""
+
+    id: int
+    name: str
+    category: str | None = None
+    muscle_groups: str | None = None
+    equipment: str | None = None
+    difficulty: str | None = None
+    exercise_type: str | None = None
+    sets_range: str | None = None
+    reps_range: str | None = None
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class ExerciseFacets(BaseModel):
+    category: list[FacetCount] = []
+    difficulty: list[FacetCount] = []
+    exercise_type: list[FacetCount] = []
+    equipment: list[FacetCount] = []
+    muscle_group: list[FacetCount] = []
+
+
+class ExerciseCatalog(BaseModel):
+    total: int
+    items: list[ExerciseListItem]
+    facets: ExerciseFacets
+
+
 class TrainingSessionCreate(BaseModel):
     athlete_id: int
     session_name: str
@@ -139,6 +209,11 @@ class TrainingSession(BaseModel):
     athlete_last_name: str | None = None
 
 
+class TrainingSessionUpdateResult(BaseModel):
+    updated: bool
+    session: TrainingSession
+
+
 class EvaluationCreate(BaseModel):
     athlete_id: int
     evaluation_date: date
@@ -179,6 +254,11 @@ class Evaluation(BaseModel):
     athlete_last_name: str | None = None
 
 
+class EvaluationUpdateResult(BaseModel):
+    updated: bool
+    evaluation: Evaluation
+
+
 class ApiError(BaseModel):
     detail: str
     extra: dict[str, Any] | None = None
@@ -214,6 +294,31 @@ class PaymentMarkPaid(BaseModel):
     paid_amount: float | None = None
 
 
+class PaymentMarkPaidItem(BaseModel):
+    athlete_id: int = Field(..., ge=1)
+    paid_amount: float | None = None
+
+
+class PaymentMarkPaidBulk(BaseModel):
+    month: date
+    items: list[PaymentMarkPaidItem] = Field(..., min_length=1, max_length=1000)
+
+
+class Payment(BaseModel):
+    id: int
+    athlete_id: int
+    month: date
+    status: str | None = None
+    paid_amount: float | None = None
+    paid_at: datetime | None = None
+
+
+class PaymentMarkPaidBulkResult(BaseModel):
+    month: date
+    payments: list[Payment]
+    missing_athlete_ids: list[int]
+
+
 class PaymentSummary(BaseModel):
     athlete_id: int
     athlete_first_name: str | None = None
@@ -231,3 +336,428 @@ class PaymentSummary(BaseModel):
     status: str | None = None
     paid_amount: float | None = None
     paid_at: datetime | None = None
+
+
+class AthleteBalance(BaseModel):
+    athlete_id: int
+    athlete_first_name: str | None = None
+    athlete_last_name: str | None = None
+
+    # Dues minus payments over every ledger month up to `as_of`.
+    balance: float
+    # The part of `balance` carried over from the months before `as_of`.
+    carried_over: float
+    month_due: float
+    month_paid: float
+
+    months_unpaid: int
+    # First month of the current run of debt (None when the balance is settled).
+    owing_since: date | None = None
+    last_paid_month: date | None = None
+
+
+class StatementMonth(BaseModel):
+    month: date
+    plan_type: str | None = None
+    completed_sessions: int
+    base_amount: float
+    adjustments_total: float
+    total_due: float
+    status: str | None = None
+    paid_amount: float
+    # Running balance at the end of this month.
+    balance: float
+
+
+class AthleteStatement(BaseModel):
+    athlete_id: int
+    balance: float
+    total: int
+    items: list[StatementMonth]
+
+
+class RevenueFigures(BaseModel):
+    athlete_months: int
+    completed_sessions: int
+    base_amount: float
+    adjustments_total: float
+    # Credits for cancelled sessions (positive amount).
+    cancellation_credits: float
+    billed: float
+    collected: float
+    outstanding: float
+    # collected / billed; None when nothing was billed.
+    collection_rate: float | None = None
+
+
+class RevenueByPlan(RevenueFigures):
+    plan_type: str
+
+
+class RevenuePeriod(BaseModel):
+    period_start: date
+    totals: RevenueFigures
+    by_plan: list[RevenueByPlan]
+
+
+class RevenueReport(BaseModel):
+    start: date
+    end: date
+    granularity: str
+    totals: RevenueFigures
+    by_plan: list[RevenueByPlan]
+    periods: list[RevenuePeriod]
+
+
+class SearchResult(BaseModel):
+    kind: str  # 'athlete' | 'exercise' | 'session'
+    id: int
+    title: str
+    subtitle: str | None = None
+    session_date: date | None = None
+    athlete_id: int | None = None
+    rank: float
+
+
+class SearchResponse(BaseModel):
+    total: int
+    items: list[SearchResult]
+
+
+class SessionStatusCounts(BaseModel):
+    total: int = 0
+    scheduled: int = 0
+    completed: int = 0
+    cancelled: int = 0
+
+
+class DashboardAthlete(BaseModel):
+    athlete_id: int
+    athlete_first_name: str | None = None
+    athlete_last_name: str | None = None
+
+
+class DashboardEvaluation(BaseModel):
+    id: int
+    athlete_id: int
+    athlete_first_name: str | None = None
+    athlete_last_name: str | None = None
+    evaluation_date: date
+    weight: float | None = None
+    fat_percentage: float | None = None
+    muscle_percentage: float | None = None
+
+
+class Dashboard(BaseModel):
+    today: date
+    week_start: date
+    month_start: date
+
+    sessions_today: SessionStatusCounts
+    sessions_week: SessionStatusCounts
+    sessions_month: SessionStatusCounts
+    # completed / (completed + cancelled) for sessions up to today this month
+    completion_rate_month: float | None = None
+    cancellation_rate_month: float | None = None
+
+    unpaid_athletes_count: int
+    unpaid_athletes: list[DashboardAthlete]
+    credits_month: float
+    charges_month: float
+
+    recent_evaluations: list[DashboardEvaluation]
+
+
+class ExerciseBest(BaseModel):
+    exercise_key: str
+    exercise_name: str
+    best_weight: float | None = None
+    best_weight_date: date | None = None
+    best_weight_session_id: int | None = None
+    best_volume: float | None = None
+    best_volume_date: date | None = None
+    best_volume_session_id: int | None = None
+    best_e1rm: float | None = None
+    best_e1rm_date: date | None = None
+    best_e1rm_session_id: int | None = None
+    # average volume over the athlete's last few sessions of this exercise
+    rolling_volume: float | None = None
+    sessions_count: int = 0
+    last_session_date: date | None = None
+
+
+class PersonalRecord(BaseModel):
+    id: int
+    session_id: int
+    exercise_key: str
+    exercise_name: str
+    record_type: str
+    value: float
+    previous_value: float | None = None
+    achieved_on: date
+
+
+class AthleteRecords(BaseModel):
+    athlete_id: int
+    bests: list[ExerciseBest]
+    recent_records: list[PersonalRecord]
+
+
+class TrainingRollup(BaseModel):
+    # athlete_id is null for studio-wide rows
+    athlete_id: int | None = None
+    granularity: str
+    period_start: date
+    active_athletes: int | None = None
+    sessions_total: int
+    sessions_scheduled: int
+    sessions_completed: int
+    sessions_cancelled: int
+    minutes_trained: int
+    total_volume: float
+    exercises_completed: int
+    exercises_failed: int
+    exercises_skipped: int
+
+
+class AdherenceWeek(BaseModel):
+    week_start: date
+    # plan_sessions_per_week of the plan in effect that month; null without a plan.
+    planned: int | None = None
+    completed: int
+    cancelled: int
+    scheduled: int
+    ratio: float | None = None
+    met: bool
+    # Consecutive weeks met up to and including this one.
+    streak: int
+
+
+class AdherenceSummary(BaseModel):
+    athlete_id: int
+    athlete_first_name: str | None = None
+    athlete_last_name: str | None = None
+    weeks: int
+    planned_sessions: int | None = None
+    completed_sessions: int
+    cancelled_sessions: int
+    # completed / planned over the range.
+    attendance_ratio: float | None = None
+    # cancelled / (completed + cancelled).
+    cancellation_rate: float | None = None
+    weeks_met: int
+    current_streak: int
+    longest_streak: int
+    # 1 = furthest behind plan; athletes without a plan rank last.
+    rank: int
+
+
+class AdherenceRoster(BaseModel):
+    start: date
+    end: date
+    athletes: list[AdherenceSummary]
+
+
+class AthleteAdherence(BaseModel):
+    start: date
+    end: date
+    summary: AdherenceSummary | None = None
+    weeks: list[AdherenceWeek]
+
+
+class OccupancyCell(BaseModel):
+    # ISO weekday, 1 = Monday.
+    weekday: int
+    hour: int
+    # Sessions overlapping the slot, and the minutes they spend in it.
+    sessions: int
+    minutes: int
+    # minutes / 60 / occurrences of the slot in the range: the average number of
+    # sessions running at once.
+    average_sessions: float
+
+
+class OccupancyHeatmap(BaseModel):
+    start: date
+    end: date
+    statuses: list[str]
+    # How many times each weekday (1-7) occurs in the range.
+    weekday_counts: dict[int, int]
+    # Only slots with at least one session.
+    cells: list[OccupancyCell]
+
+
+class SeriesPoint(BaseModel):
+    date: date
+    value: float
+
+
+class AnalysisSeries(BaseModel):
+    athlete_id: int
+    metric: str
+    exercise: str | None = None
+    method: str
+    # number of points before downsampling
+    source_points: int
+    points: list[SeriesPoint]
+
+
+class MetricTrend(BaseModel):
+    metric: str
+    samples: int
+    baseline: float | None = None
+    baseline_date: date
+    latest: float | None = None
+    latest_date: date
+    delta: float | None = None
+    delta_pct: float | None = None
+    # least-squares fit over all samples in range
+    slope_per_week: float | None = None
+    rolling_mean: float | None = None
+
+
+class TrendPoint(BaseModel):
+    evaluation_date: date
+    values: dict[str, float | None]
+    rolling_mean: dict[str, float | None]
+
+
+class AthleteTrend(BaseModel):
+    athlete_id: int
+    athlete_first_name: str | None = None
+    athlete_last_name: str | None = None
+    evaluations_count: int
+    first_date: date
+    last_date: date
+    metrics: list[MetricTrend]
+    series: list[TrendPoint] | None = None
+
+
+class CohortTrend(BaseModel):
+    metric: str
+    athletes: int
+    mean_delta: float | None = None
+    median_delta: float | None = None
+    mean_slope_per_week: float | None = None
+
+
+class EvaluationTrends(BaseModel):
+    window: int
+    athletes: list[AthleteTrend]
+    cohort: list[CohortTrend]
+
+
+class SessionCreateOp(BaseModel):
+    op: Literal["session.create"]
+    data: TrainingSessionCreate
+
+
+class SessionUpdateOp(BaseModel):
+    op: Literal["session.update"]
+    id: int
+    data: TrainingSessionUpdate
+
+
+class SessionDeleteOp(BaseModel):
+    op: Literal["session.delete"]
+    id: int
+
+
+class EvaluationCreateOp(BaseModel):
+    op: Literal["evaluation.create"]
+    data: EvaluationCreate
+
+
+class EvaluationUpdateOp(BaseModel):
+    op: Literal["evaluation.update"]
+    id: int
+    data: EvaluationUpdate
+
+
+class EvaluationDeleteOp(BaseModel):
+    op: Literal["evaluation.delete"]
+    id: int
+
+
+class PaymentMarkPaidOp(BaseModel):
+    op: Literal["payment.mark_paid"]
+    data: PaymentMarkPaid
+
+
+class AdjustmentCreateOp(BaseModel):
+    op: Literal["adjustment.create"]
+    data: PaymentAdjustmentCreate
+
+
+class AdjustmentDeleteOp(BaseModel):
+    op: Literal["adjustment.delete"]
+    id: int
+
+
+BatchOperation = Annotated[
+    SessionCreateOp
+    | SessionUpdateOp
+    | SessionDeleteOp
+    | EvaluationCreateOp
+    | EvaluationUpdateOp
+    | EvaluationDeleteOp
+    | PaymentMarkPaidOp
+    | AdjustmentCreateOp
+    | AdjustmentDeleteOp,
+    Field(discriminator="op"),
+]
+
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation] = Field(..., min_length=1, max_length=500)
+
+
+class BatchResult(BaseModel):
+    index: int
+    op: str
+    # ok | not_found | error | rolled_back (ok, but another operation failed) | not_run
+    status: str
+    id: int | None = None
+    detail: str | None = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: list[BatchResult]
+
+
+class JobCreate(BaseModel):
+    kind: Literal[
+        "auto_credit",
+        "ledger_rebuild",
+        "rollup_refresh",
+        "records_rebuild",
+        "partition_maintenance",
+        "completed_data_compact",
+        "session_archive",
+        "plan_apply",
+    ]
+    params: dict[str, Any] = Field(default_factory=dict)
+    run_at: datetime | None = None
+    dedupe_key: str | None = Field(default=None, max_length=200)
+
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    params: dict[str, Any]
+    # queued | running | succeeded | failed
+    status: str
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    dedupe_key: str | None = None
+    schedule_key: str | None = None
+    progress: float | None = None
+    progress_message: str | None = None
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    locked_by: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
@@ -0,0 +1,32 @@
+"""Production entrypoint: `python -m backend.serve`.
+
+Runs uvicorn with one worker per available CPU (override with WEB_CONCURRENCY).
+Each worker owns its own DB pool and threadpool, both sized by DB_POOL_MAX_SIZE,
+plus one LISTEN connection for the change feed, so the database sees at most
+WEB_CONCURRENCY * (DB_POOL_MAX_SIZE + 1) connections.
+"""
+
+from __future__ import annotations
+
+import uvicorn
+
+from backend.settings import settings
+
+
+def main() -> None:
+    uvicorn.run(
+        "backend.main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=settings.worker_count,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        # Keep the listen backlog bounded; the admission middleware handles bursts.
+        backlog=max(64, settings.worker_count * settings.queue_limit),
+        # /events streams never end on their own; don't let them hold up a restart.
+        timeout_graceful_shutdown=settings.graceful_shutdown_seconds,
+    )
+
+
+if __name__ == "__main__":
+    main()
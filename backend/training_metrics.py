@@ -0,0 +1,94 @@
+"""Per-exercise metrics extracted from a session's `completed_data`.
+
+Parsing mirrors the Analysis page (frontend/src/pages/AnalysisPage.tsx) so
+server-side numbers match what coaches already see: the first number in a
+weight/reps string is used, and only exercises with status 'completed' count.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any
+
+_NUMBER_RE = re.compile(r"(\d+(?:\.\d+)?)")
+
+
+def parse_number(value: Any) -> float | None:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    m = _NUMBER_RE.search(str(value).strip())
+    return float(m.group(1)) if m else None
+
+
+def parse_reps(value: Any) -> float | None:
+    # Accepts "8" or "8-10"; uses the first number.
+    return parse_number(value)
+
+
+def exercise_key(name: Any) -> str:
+    return " ".join(str(name or "").split()).lower()
+
+
+def estimated_1rm(weight: float | None, reps: float | None) -> float | None:
+    """Epley estimate; a single rep is the 1RM itself."""
+    if weight is None or weight <= 0 or reps is None or reps <= 0:
+        return None
+    if reps <= 1:
+        return weight
+    return round(weight * (1 + reps / 30), 2)
+
+
+@dataclass(frozen=True)
+class ExerciseMetrics:
+    key: str
+    name: str
+    weight: float | None
+    volume: float | None  # sets x reps, as on the Analysis page
+    e1rm: float | None
+
+
+def session_exercise_metrics(completed_data: Any) -> list[ExerciseMetrics]:
+    """Best value per exercise for one session (an exercise may appear twice)."""
+    exercises = completed_data.get("exercises") if isinstance(completed_data, dict) else None
+    if not isinstance(exercises, list):
+        return []
+
+    by_key: dict[str, ExerciseMetrics] = {}
+    for ex in exercises:
+        if not isinstance(ex, dict) or ex.get("status") != "completed":
+            continue
+        name = " ".join(str(ex.get("exercise_name") or "").split())
+        if not name:
+            continue
+
+        weight = parse_number(ex.get("actual_weight"))
+        sets = parse_number(ex.get("actual_sets"))
+        reps = parse_reps(ex.get("actual_reps"))
+        volume = sets * reps if sets is not None and reps is not None else None
+        current = ExerciseMetrics(exercise_key(name), name, weight, volume, estimated_1rm(weight, reps))
+
+        previous = by_key.get(current.key)
+        if previous is not None:
+            current = ExerciseMetrics(
+                current.key,
+                previous.name,
+                _max(previous.weight, current.weight),
+                _max(previous.volume, current.volume),
+                _max(previous.e1rm, current.e1rm),
+            )
+        if current.weight is None and current.volume is None:
+            continue
+        by_key[current.key] = current
+
+    return list(by_key.values())
+
+
+def _max(a: float | None, b: float | None) -> float | None:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
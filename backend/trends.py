@@ -0,0 +1,172 @@
+"""Body-composition trends over evaluations, computed column-wise with numpy.
+
+All athletes are handled in one pass: rows are sorted by (athlete, date) and
+every statistic is a segmented reduction over those contiguous runs, so a
+studio-wide report costs the same handful of array operations as a single
+athlete. Missing measurements are NaN and are ignored per metric.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+import numpy as np
+
+METRICS = ("weight", "muscle_percentage", "fat_percentage", "water_percentage", "bone_percentage")
+
+
+@dataclass
+class TrendBatch:
+    athlete_ids: np.ndarray  # one per athlete
+    starts: np.ndarray  # first row index of each athlete
+    ends: np.ndarray  # one past the last row index
+    days: np.ndarray  # date ordinals, per row
+    values: np.ndarray  # rows x metrics, NaN where missing
+    rolling: np.ndarray  # rows x metrics, trailing mean over `window` measurements
+
+
+def build_batch(rows: list[dict[str, Any]], window: int) -> TrendBatch:
+    """`rows` must be ordered by athlete_id, evaluation_date."""
+
+    n = len(rows)
+    athlete = np.fromiter((r["athlete_id"] for r in rows), dtype=np.int64, count=n)
+    days = np.fromiter((r["evaluation_date"].toordinal() for r in rows), dtype=np.float64, count=n)
+    values = np.array(
+        [[np.nan if r[m] is None else float(r[m]) for m in METRICS] for r in rows],
+        dtype=np.float64,
+    ).reshape(n, len(METRICS))
+
+    starts = np.flatnonzero(np.r_[True, athlete[1:] != athlete[:-1]]) if n else np.empty(0, dtype=np.int64)
+    ends = np.r_[starts[1:], n].astype(np.int64)
+    return TrendBatch(athlete[starts], starts, ends, days, values, _rolling_mean(values, starts, ends, window))
+
+
+def _rolling_mean(values: np.ndarray, starts: np.ndarray, ends: np.ndarray, window: int) -> np.ndarray:
+    n = values.shape[0]
+    if n == 0:
+        return values.copy()
+    present = ~np.isnan(values)
+    sums = np.vstack([np.zeros(values.shape[1]), np.cumsum(np.where(present, values, 0.0), axis=0)])
+    counts = np.vstack([np.zeros(values.shape[1]), np.cumsum(present, axis=0)])
+
+    # Window [i - window + 1, i], clipped to the athlete's own rows.
+    row_start = np.repeat(starts, ends - starts)
+    idx = np.arange(n)
+    lo = np.maximum(idx - window + 1, row_start)
+    total = sums[idx + 1] - sums[lo]
+    count = counts[idx + 1] - counts[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def summarize(batch: TrendBatch) -> list[dict[str, Any]]:
+    """Per athlete and metric: baseline, latest, delta, weekly slope and latest rolling mean."""
+
+    if batch.athlete_ids.size == 0:
+        return []
+
+    present = ~np.isnan(batch.values)
+    x = np.where(present, batch.days[:, None], 0.0)
+    y = np.where(present, batch.values, 0.0)
+    starts = batch.starts
+
+    # Segment sums for an ordinary least-squares slope (x centred per athlete for precision).
+    cnt = np.add.reduceat(present.astype(np.float64), starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = np.add.reduceat(x, starts, axis=0) / cnt
+        y_mean = np.add.reduceat(y, starts, axis=0) / cnt
+        seg = np.repeat(np.arange(starts.size), batch.ends - starts)
+        dx = np.where(present, batch.days[:, None] - x_mean[seg], 0.0)
+        dy = np.where(present, batch.values - y_mean[seg], 0.0)
+        sxx = np.add.reduceat(dx * dx, starts, axis=0)
+        sxy = np.add.reduceat(dx * dy, starts, axis=0)
+        slope_per_week = np.where(sxx > 0, sxy / sxx * 7.0, np.nan)
+
+    # First / last present row per athlete and metric.
+    row_idx = np.arange(batch.values.shape[0])[:, None]
+    big = np.iinfo(np.int64).max
+    first = np.minimum.reduceat(np.where(present, row_idx, big), starts, axis=0)
+    last = np.maximum.reduceat(np.where(present, row_idx, -1), starts, axis=0)
+    has = last >= 0
+    first_safe = np.where(has, first, 0)
+    last_safe = np.where(has, last, 0)
+    cols = np.arange(len(METRICS))[None, :]
+
+    baseline = np.where(has, batch.values[first_safe, cols], np.nan)
+    latest = np.where(has, batch.values[last_safe, cols], np.nan)
+    rolling = np.where(has, batch.rolling[last_safe, cols], np.nan)
+    delta = latest - baseline
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta_pct = np.where(baseline != 0, delta / baseline * 100.0, np.nan)
+
+    out: list[dict[str, Any]] = []
+    for a, athlete_id in enumerate(batch.athlete_ids.tolist()):
+        metrics = []
+        for m, name in enumerate(METRICS):
+            if not has[a, m]:
+                continue
+            metrics.append(
+                {
+                    "metric": name,
+                    "samples": int(cnt[a, m]),
+                    "baseline": _num(baseline[a, m]),
+                    "baseline_date": date.fromordinal(int(batch.days[first[a, m]])),
+                    "latest": _num(latest[a, m]),
+                    "latest_date": date.fromordinal(int(batch.days[last[a, m]])),
+                    "delta": _num(delta[a, m]),
+                    "delta_pct": _num(delta_pct[a, m]),
+                    "slope_per_week": _num(slope_per_week[a, m]),
+                    "rolling_mean": _num(rolling[a, m]),
+                }
+            )
+        out.append(
+            {
+                "athlete_id": athlete_id,
+                "evaluations_count": int(batch.ends[a] - batch.starts[a]),
+                "first_date": date.fromordinal(int(batch.days[batch.starts[a]])),
+                "last_date": date.fromordinal(int(batch.days[batch.ends[a] - 1])),
+                "metrics": metrics,
+            }
+        )
+    return out
+
+
+def series(batch: TrendBatch, athlete_index: int) -> list[dict[str, Any]]:
+    rows = range(int(batch.starts[athlete_index]), int(batch.ends[athlete_index]))
+    return [
+        {
+            "evaluation_date": date.fromordinal(int(batch.days[i])),
+            "values": {m: _num(batch.values[i, j]) for j, m in enumerate(METRICS)},
+            "rolling_mean": {m: _num(batch.rolling[i, j]) for j, m in enumerate(METRICS)},
+        }
+        for i in rows
+    ]
+
+
+def cohort(summaries: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Across athletes: how many have each metric, and mean/median change."""
+
+    out = []
+    for name in METRICS:
+        trends = [m for s in summaries for m in s["metrics"] if m["metric"] == name]
+        if not trends:
+            continue
+        deltas = np.array([np.nan if t["delta"] is None else t["delta"] for t in trends], dtype=np.float64)
+        slopes = np.array([np.nan if t["slope_per_week"] is None else t["slope_per_week"] for t in trends])
+        out.append(
+            {
+                "metric": name,
+                "athletes": len(trends),
+                "mean_delta": _num(np.nanmean(deltas)) if np.any(~np.isnan(deltas)) else None,
+                "median_delta": _num(np.nanmedian(deltas)) if np.any(~np.isnan(deltas)) else None,
+                "mean_slope_per_week": _num(np.nanmean(slopes)) if np.any(~np.isnan(slopes)) else None,
+            }
+        )
+    return out
+
+
+def _num(value: Any) -> float | None:
+    v = float(value)
+    return None if np.isnan(v) else round(v, 4)
@@ -0,0 +1,187 @@
+import { apiFetch } from './client'
+
+export type ExerciseBest = {
+  exercise_key: string
+  exercise_name: string
+  best_weight?: number | null
+  best_weight_date?: string | null
+  best_weight_session_id?: number | null
+  best_volume?: number | null
+  best_volume_date?: string | null
+  best_volume_session_id?: number | null
+  best_e1rm?: number | null
+  best_e1rm_date?: string | null
+  best_e1rm_session_id?: number | null
+  rolling_volume?: number | null
+  sessions_count: number
+  last_session_date?: string | null
+}
+
+export type PersonalRecord = {
+  id: number
+  session_id: number
+  exercise_key: string
+  exercise_name: string
+  record_type: 'weight' | 'volume' | 'e1rm'
+  value: number
+  previous_value?: number | null
+  achieved_on: string
+}
+
+export type AthleteRecords = {
+  athlete_id: number
+  bests: ExerciseBest[]
+  recent_records: PersonalRecord[]
+}
+
+export async function getAthleteRecords(athleteId: number, recentLimit = 20) {
+  return apiFetch<AthleteRecords>(`/analysis/athletes/${athleteId}/records?recent_limit=${recentLimit}`)
+}
+
+export type RollupGranularity = 'day' | 'week' | 'month'
+
+export type TrainingRollup = {
+  athlete_id?: number | null
+  granularity: RollupGranularity
+  period_start: string
+  active_athletes?: number | null
+  sessions_total: number
+  sessions_scheduled: number
+  sessions_completed: number
+  sessions_cancelled: number
+  minutes_trained: number
+  total_volume: number
+  exercises_completed: number
+  exercises_failed: number
+  exercises_skipped: number
+}
+
+export async function listRollups(params: {
+  granularity?: RollupGranularity
+  start?: string
+  end?: string
+  athleteId?: number
+}) {
+  const sp = new URLSearchParams()
+  if (params.granularity) sp.set('granularity', params.granularity)
+  if (params.start) sp.set('start', params.start)
+  if (params.end) sp.set('end', params.end)
+  if (params.athleteId) sp.set('athlete_id', String(params.athleteId))
+  const qs = sp.toString()
+  return apiFetch<TrainingRollup[]>(qs ? `/analysis/rollups?${qs}` : '/analysis/rollups')
+}
+
+export type SeriesMetric =
+  | 'weight'
+  | 'fat_percentage'
+  | 'muscle_percentage'
+  | 'water_percentage'
+  | 'bone_percentage'
+  | 'exercise_weight'
+  | 'exercise_volume'
+  | 'exercise_e1rm'
+
+export type AnalysisSeries = {
+  athlete_id: number
+  metric: SeriesMetric
+  exercise?: string | null
+  method: 'lttb' | 'minmax'
+  source_points: number
+  points: Array<{ date: string; value: number }>
+}
+
+export async function getAthleteSeries(
+  athleteId: number,
+  params: {
+    metric: SeriesMetric
+    exercise?: string
+    points?: number
+    method?: 'lttb' | 'minmax'
+    start?: string
+    end?: string
+  },
+) {
+  const sp = new URLSearchParams({ metric: params.metric })
+  if (params.exercise) sp.set('exercise', params.exercise)
+  if (params.points) sp.set('points', String(params.points))
+  if (params.method) sp.set('method', params.method)
+  if (params.start) sp.set('start', params.start)
+  if (params.end) sp.set('end', params.end)
+  return apiFetch<AnalysisSeries>(`/analysis/athletes/${athleteId}/series?${sp.toString()}`)
+}
+
+export type AdherenceWeek = {
+  week_start: string
+  planned?: number | null
+  completed: number
+  cancelled: number
+  scheduled: number
+  ratio?: number | null
+  met: boolean
+  streak: number
+}
+
+export type AdherenceSummary = {
+  athlete_id: number
+  athlete_first_name?: string | null
+  athlete_last_name?: string | null
+  weeks: number
+  planned_sessions?: number | null
+  completed_sessions: number
+  cancelled_sessions: number
+  attendance_ratio?: number | null
+  cancellation_rate?: number | null
+  weeks_met: number
+  current_streak: number
+  longest_streak: number
+  // 1 = furthest behind plan
+  rank: number
+}
+
+export async function getRosterAdherence(params: { start?: string; end?: string } = {}) {
+  const sp = new URLSearchParams()
+  if (params.start) sp.set('start', params.start)
+  if (params.end) sp.set('end', params.end)
+  const qs = sp.toString()
+  return apiFetch<{ start: string; end: string; athletes: AdherenceSummary[] }>(
+    qs ? `/analysis/adherence?${qs}` : '/analysis/adherence',
+  )
+}
+
+export async function getAthleteAdherence(athleteId: number, params: { start?: string; end?: string } = {}) {
+  const sp = new URLSearchParams()
+  if (params.start) sp.set('start', params.start)
+  if (params.end) sp.set('end', params.end)
+  const qs = sp.toString()
+  return apiFetch<{ start: string; end: string; summary?: AdherenceSummary | null; weeks: AdherenceWeek[] }>(
+    `/analysis/athletes/${athleteId}/adherence${qs ? `?${qs}` : ''}`,
+  )
+}
+
+export type SessionStatus = 'Scheduled' | 'Completed' | 'Cancelled'
+
+export type OccupancyCell = {
+  // ISO weekday, 1 = Monday
+  weekday: number
+  hour: number
+  sessions: number
+  minutes: number
+  average_sessions: number
+}
+
+export type OccupancyHeatmap = {
+  start: string
+  end: string
+  statuses: SessionStatus[]
+  weekday_counts: Record<string, number>
+  cells: OccupancyCell[]
+}
+
+export async function getOccupancy(params: { start?: string; end?: string; status?: SessionStatus[] } = {}) {
+  const sp = new URLSearchParams()
+  if (params.start) sp.set('start', params.start)
+  if (params.end) sp.set('end', params.end)
+  for (const s of params.status ?? []) sp.append('status', s)
+  const qs = sp.toString()
+  return apiFetch<OccupancyHeatmap>(qs ? `/analysis/occupancy?${qs}` : '/analysis/occupancy')
+}
@@ -23,6 +23,33 @@ export async function listAthletes() {
   return apiFetch<Athlete[]>('/athletes')
 }
 
+export type AthleteRosterInclude = 'latest_evaluation' | 'next_session'
+
+export type AthleteRosterEntry = Athlete & {
+  latest_evaluation?: {
+    id: number
+    evaluation_date: string
+    weight?: number | null
+    muscle_percentage?: number | null
+    fat_percentage?: number | null
+    bone_percentage?: number | null
+    water_percentage?: number | null
+  } | null
+  next_session?: {
+    id: number
+    session_name: string
+    session_date: string
+    session_time: string
+    duration?: number | null
+    session_type?: string | null
+  } | null
+}
+
+export async function listAthleteRoster(include: AthleteRosterInclude[]) {
+  const qs = include.length ? `?include=${include.join(',')}` : ''
+  return apiFetch<AthleteRosterEntry[]>(`/athletes${qs}`)
+}
+
 export async function createAthlete(payload: AthleteCreate) {
   return apiFetch<{ id: number }>('/athletes', {
     method: 'POST',
@@ -30,8 +57,9 @@ export async function createAthlete(payload: AthleteCreate) {
   })
 }
 
-export async function updateAthlete(id: number, payload: Partial<AthleteCreate>) {
-  return apiFetch<{ updated: boolean }>(`/athletes/${id}`, {
+// plan_effective_from: first month billed with the new plan (default: the current month; past months are rejected).
+export async function updateAthlete(id: number, payload: Partial<AthleteCreate> & { plan_effective_from?: string | null }) {
+  return apiFetch<{ updated: boolean; athlete: Athlete }>(`/athletes/${id}`, {
     method: 'PATCH',
     body: JSON.stringify(payload)
   })
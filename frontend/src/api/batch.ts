@@ -0,0 +1,46 @@
+import { ApiError, apiFetch } from './client'
+import type { EvaluationCreate, EvaluationUpdate } from './evaluations'
+import type { TrainingSessionCreate, TrainingSessionUpdate } from './trainingSessions'
+
+export type BatchOperation =
+  | { op: 'session.create'; data: TrainingSessionCreate }
+  | { op: 'session.update'; id: number; data: TrainingSessionUpdate }
+  | { op: 'session.delete'; id: number }
+  | { op: 'evaluation.create'; data: EvaluationCreate }
+  | { op: 'evaluation.update'; id: number; data: EvaluationUpdate }
+  | { op: 'evaluation.delete'; id: number }
+  | { op: 'payment.mark_paid'; data: { athlete_id: number; month: string; paid_amount?: number | null } }
+  | {
+      op: 'adjustment.create'
+      data: { athlete_id: number; applies_month: string; amount: number; reason?: string | null; related_session_id?: number | null }
+    }
+  | { op: 'adjustment.delete'; id: number }
+
+export type BatchResult = {
+  index: number
+  op: BatchOperation['op']
+  status: 'ok' | 'not_found' | 'error' | 'rolled_back' | 'not_run'
+  id?: number | null
+  detail?: string | null
+}
+
+export type BatchResponse = {
+  committed: boolean
+  results: BatchResult[]
+}
+
+// All operations are applied in one transaction. When any of them fails nothing
+// is written, and the thrown ApiError carries the per-operation results in `body`.
+export async function runBatch(operations: BatchOperation[]) {
+  return apiFetch<BatchResponse>('/batch', {
+    method: 'POST',
+    body: JSON.stringify({ operations })
+  })
+}
+
+export function batchResults(err: unknown): BatchResult[] | null {
+  if (err instanceof ApiError && err.status === 422 && Array.isArray((err.body as any)?.results)) {
+    return (err.body as BatchResponse).results
+  }
+  return null
+}
@@ -13,14 +13,45 @@ export class ApiError extends Error {
   }
 }
 
+const writeMethods = new Set(['POST', 'PUT', 'PATCH', 'DELETE'])
+const writeRetryDelaysMs = [500, 1500]
+
+function newIdempotencyKey() {
+  if (typeof crypto !== 'undefined' && 'randomUUID' in crypto) return crypto.randomUUID()
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`
+}
+
+function sleep(ms: number) {
+  return new Promise((resolve) => setTimeout(resolve, ms))
+}
+
+// Writes carry an Idempotency-Key so they can be retried safely after a network
+// failure: the server replays the first response instead of writing twice.
+async function fetchWithRetry(url: string, init: RequestInit, method: string): Promise<Response> {
+  if (!writeMethods.has(method)) return fetch(url, init)
+
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const res = await fetch(url, init)
+      // 409: the original request with this key is still being processed.
+      if (res.status !== 409 || !res.headers.has('Retry-After') || attempt >= writeRetryDelaysMs.length) return res
+    } catch (err) {
+      if (attempt >= writeRetryDelaysMs.length) throw err
+    }
+    await sleep(writeRetryDelaysMs[attempt])
+  }
+}
+
 export async function apiFetch<T>(path: string, init?: RequestInit): Promise<T> {
-  const res = await fetch(`${apiBaseUrl}${path}`, {
-    headers: {
-      'Content-Type': 'application/json',
-      ...(init?.headers ?? {})
-    },
-    ...init
-  })
+  const method = (init?.method ?? 'GET').toUpperCase()
+  const headers: Record<string, string> = {
+    'Content-Type': 'application/json',
+    ...((init?.headers as Record<string, string> | undefined) ?? {})
+  }
+  if (writeMethods.has(method) && !headers['Idempotency-Key']) headers['Idempotency-Key'] = newIdempotencyKey()
+
+  // credentials: the API's read-your-writes cookie keeps reads after a write on the primary DB.
+  const res = await fetchWithRetry(`${apiBaseUrl}${path}`, { credentials: 'include', ...init, headers }, method)
 
   const contentType = res.headers.get('content-type') ?? ''
   const body = contentType.includes('application/json') ? await res.json() : await res.text()
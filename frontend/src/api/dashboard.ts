@@ -0,0 +1,43 @@
+import { apiFetch } from './client'
+
+export type SessionStatusCounts = {
+  total: number
+  scheduled: number
+  completed: number
+  cancelled: number
+}
+
+export type Dashboard = {
+  today: string
+  week_start: string
+  month_start: string
+
+  sessions_today: SessionStatusCounts
+  sessions_week: SessionStatusCounts
+  sessions_month: SessionStatusCounts
+  completion_rate_month?: number | null
+  cancellation_rate_month?: number | null
+
+  unpaid_athletes_count: number
+  unpaid_athletes: Array<{ athlete_id: number; athlete_first_name?: string | null; athlete_last_name?: string | null }>
+  credits_month: number
+  charges_month: number
+
+  recent_evaluations: Array<{
+    id: number
+    athlete_id: number
+    athlete_first_name?: string | null
+    athlete_last_name?: string | null
+    evaluation_date: string
+    weight?: number | null
+    fat_percentage?: number | null
+    muscle_percentage?: number | null
+  }>
+}
+
+export async function getDashboard(todayIso?: string) {
+  const sp = new URLSearchParams()
+  if (todayIso) sp.set('today', todayIso)
+  const qs = sp.toString()
+  return apiFetch<Dashboard>(qs ? `/dashboard?${qs}` : '/dashboard')
+}
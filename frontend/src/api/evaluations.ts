@@ -40,8 +40,67 @@ export async function deleteEvaluation(id: number) {
 }
 
 export async function updateEvaluation(id: number, payload: EvaluationUpdate) {
-  return apiFetch<{ updated: boolean }>(`/evaluations/${id}`, {
+  return apiFetch<{ updated: boolean; evaluation: Evaluation }>(`/evaluations/${id}`, {
     method: 'PATCH',
     body: JSON.stringify(payload)
   })
 }
+
+export type TrendMetric = 'weight' | 'muscle_percentage' | 'fat_percentage' | 'water_percentage' | 'bone_percentage'
+
+export type MetricTrend = {
+  metric: TrendMetric
+  samples: number
+  baseline?: number | null
+  baseline_date: string
+  latest?: number | null
+  latest_date: string
+  delta?: number | null
+  delta_pct?: number | null
+  slope_per_week?: number | null
+  rolling_mean?: number | null
+}
+
+export type AthleteTrend = {
+  athlete_id: number
+  athlete_first_name?: string | null
+  athlete_last_name?: string | null
+  evaluations_count: number
+  first_date: string
+  last_date: string
+  metrics: MetricTrend[]
+  series?: Array<{
+    evaluation_date: string
+    values: Partial<Record<TrendMetric, number | null>>
+    rolling_mean: Partial<Record<TrendMetric, number | null>>
+  }> | null
+}
+
+export type EvaluationTrends = {
+  window: number
+  athletes: AthleteTrend[]
+  cohort: Array<{
+    metric: TrendMetric
+    athletes: number
+    mean_delta?: number | null
+    median_delta?: number | null
+    mean_slope_per_week?: number | null
+  }>
+}
+
+export async function getEvaluationTrends(params?: {
+  athleteId?: number
+  start?: string
+  end?: string
+  window?: number
+  includeSeries?: boolean
+}) {
+  const sp = new URLSearchParams()
+  if (params?.athleteId) sp.set('athlete_id', String(params.athleteId))
+  if (params?.start) sp.set('start', params.start)
+  if (params?.end) sp.set('end', params.end)
+  if (params?.window) sp.set('window', String(params.window))
+  if (params?.includeSeries != null) sp.set('include_series', String(params.includeSeries))
+  const qs = sp.toString()
+  return apiFetch<EvaluationTrends>(`/evaluations/trends${qs ? `?${qs}` : ''}`)
+}
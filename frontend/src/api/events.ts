@@ -0,0 +1,47 @@
+import { apiBaseUrl } from './client'
+
+export type ChangeTable = 'training_sessions' | 'payments' | 'athletes'
+
+export type ChangeEvent = {
+  table: ChangeTable
+  op: 'insert' | 'update' | 'delete'
+  id: number
+  athlete_id?: number | null
+  date?: string | null
+  old_athlete_id?: number | null
+  old_date?: string | null
+}
+
+export type ChangeFeedFilter = {
+  start?: string
+  end?: string
+  athlete_id?: number
+  tables?: ChangeTable[]
+}
+
+export type ChangeFeedHandlers = {
+  onChange: (event: ChangeEvent) => void
+  // Fired when events may have been missed (reconnect, slow consumer): refetch everything.
+  onResync?: () => void
+}
+
+// Opens a Server-Sent Events stream of committed changes. Returns a function that closes it.
+// EventSource reconnects by itself; every `ready` after the first one is a reconnect.
+export function subscribeToChanges(filter: ChangeFeedFilter, handlers: ChangeFeedHandlers): () => void {
+  const sp = new URLSearchParams()
+  if (filter.start) sp.set('start', filter.start)
+  if (filter.end) sp.set('end', filter.end)
+  if (filter.athlete_id) sp.set('athlete_id', String(filter.athlete_id))
+  if (filter.tables?.length) sp.set('tables', filter.tables.join(','))
+  const qs = sp.toString()
+
+  const source = new EventSource(`${apiBaseUrl}/events${qs ? `?${qs}` : ''}`)
+  source.addEventListener('change', (e) => handlers.onChange(JSON.parse((e as MessageEvent<string>).data) as ChangeEvent))
+  let connected = false
+  source.addEventListener('ready', () => {
+    if (connected) handlers.onResync?.()
+    connected = true
+  })
+  source.addEventListener('resync', () => handlers.onResync?.())
+  return () => source.close()
+}
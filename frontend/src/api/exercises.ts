@@ -19,10 +19,47 @@ export type Exercise = {
 
 export type ExerciseCreate = Omit<Exercise, 'id' | 'created_at'>
 
+export type ExerciseListItem = Pick<
+  Exercise,
+  'id' | 'name' | 'category' | 'muscle_groups' | 'equipment' | 'difficulty' | 'exercise_type' | 'sets_range' | 'reps_range'
+>
+
+export type FacetCount = { value: string; count: number }
+
+export type ExerciseFilters = {
+  category?: string[]
+  difficulty?: string[]
+  exercise_type?: string[]
+  equipment?: string[]
+  muscle_group?: string[]
+}
+
+export type ExerciseCatalog = {
+  total: number
+  items: ExerciseListItem[]
+  facets: Record<keyof ExerciseFilters, FacetCount[]>
+}
+
+function filtersToParams(filters?: ExerciseFilters) {
+  const sp = new URLSearchParams()
+  for (const [key, values] of Object.entries(filters ?? {})) {
+    for (const v of values ?? []) sp.append(key, v)
+  }
+  return sp
+}
+
 export async function listExercises() {
   return apiFetch<Exercise[]>('/exercises')
 }
 
+export async function getExerciseCatalog(filters?: ExerciseFilters, page?: { limit?: number; offset?: number }) {
+  const sp = filtersToParams(filters)
+  if (page?.limit) sp.set('limit', String(page.limit))
+  if (page?.offset) sp.set('offset', String(page.offset))
+  const qs = sp.toString()
+  return apiFetch<ExerciseCatalog>(qs ? `/exercises/catalog?${qs}` : '/exercises/catalog')
+}
+
 export async function createExercise(payload: ExerciseCreate) {
   return apiFetch<{ id: number }>('/exercises', {
     method: 'POST',
@@ -31,7 +68,7 @@ export async function createExercise(payload: ExerciseCreate) {
 }
 
 export async function updateExercise(id: number, payload: Partial<ExerciseCreate>) {
-  return apiFetch<{ updated: boolean }>(`/exercises/${id}`, {
+  return apiFetch<{ updated: boolean; exercise: Exercise }>(`/exercises/${id}`, {
     method: 'PATCH',
     body: JSON.stringify(payload)
   })
@@ -0,0 +1,53 @@
+import { ApiError, apiFetch } from './client'
+
+export type JobStatus = 'queued' | 'running' | 'succeeded' | 'failed'
+
+export type Job<R = Record<string, unknown>> = {
+  id: number
+  kind: string
+  params: Record<string, unknown>
+  status: JobStatus
+  attempts: number
+  max_attempts: number
+  run_at: string
+  dedupe_key?: string | null
+  schedule_key?: string | null
+  progress?: number | null
+  progress_message?: string | null
+  result?: R | null
+  error?: string | null
+  created_at: string
+  started_at?: string | null
+  finished_at?: string | null
+}
+
+export async function getJob<R = Record<string, unknown>>(id: number) {
+  return apiFetch<Job<R>>(`/jobs/${id}`)
+}
+
+export async function listJobs(params?: { status?: JobStatus; kind?: string; limit?: number }) {
+  const sp = new URLSearchParams()
+  if (params?.status) sp.set('status', params.status)
+  if (params?.kind) sp.set('kind', params.kind)
+  if (params?.limit) sp.set('limit', String(params.limit))
+  const qs = sp.toString()
+  return apiFetch<Job[]>(`/jobs${qs ? `?${qs}` : ''}`)
+}
+
+// Polls until the job finishes; resolves with its result, rejects if it failed.
+export async function waitForJob<R = Record<string, unknown>>(
+  job: Job<R>,
+  opts?: { intervalMs?: number; onProgress?: (job: Job<R>) => void }
+): Promise<R> {
+  const intervalMs = opts?.intervalMs ?? 1000
+  let current = job
+  while (current.status === 'queued' || current.status === 'running') {
+    opts?.onProgress?.(current)
+    await new Promise((resolve) => setTimeout(resolve, intervalMs))
+    current = await getJob<R>(current.id)
+  }
+  if (current.status === 'failed') {
+    throw new ApiError(current.error ?? 'Job failed', 500, current)
+  }
+  return (current.result ?? {}) as R
+}
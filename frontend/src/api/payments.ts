@@ -1,4 +1,5 @@
 import { apiFetch } from './client'
+import { type Job, waitForJob } from './jobs'
 
 export type PaymentSummary = {
   athlete_id: number
@@ -34,6 +35,51 @@ export async function listPayments(monthIso: string) {
   return apiFetch<PaymentSummary[]>(`/payments?${sp.toString()}`)
 }
 
+// Running balance per athlete (dues minus payments, carried over) through `asOfIso`.
+export type AthleteBalance = {
+  athlete_id: number
+  athlete_first_name?: string | null
+  athlete_last_name?: string | null
+  balance: number
+  carried_over: number
+  month_due: number
+  month_paid: number
+  months_unpaid: number
+  owing_since?: string | null
+  last_paid_month?: string | null
+}
+
+export type StatementMonth = {
+  month: string
+  plan_type?: string | null
+  completed_sessions: number
+  base_amount: number
+  adjustments_total: number
+  total_due: number
+  status?: string | null
+  paid_amount: number
+  balance: number
+}
+
+export type AthleteStatement = {
+  athlete_id: number
+  balance: number
+  total: number
+  items: StatementMonth[]
+}
+
+export async function listBalances(asOfIso?: string, owingOnly = false) {
+  const sp = new URLSearchParams()
+  if (asOfIso) sp.set('as_of', asOfIso)
+  if (owingOnly) sp.set('owing_only', 'true')
+  return apiFetch<AthleteBalance[]>(`/payments/balances?${sp.toString()}`)
+}
+
+export async function getAthleteStatement(athleteId: number, limit = 12, offset = 0) {
+  const sp = new URLSearchParams({ limit: String(limit), offset: String(offset) })
+  return apiFetch<AthleteStatement>(`/payments/athletes/${athleteId}/statement?${sp.toString()}`)
+}
+
 export async function listPaymentAdjustments(monthIso: string, athleteId?: number) {
   const sp = new URLSearchParams({ month: monthIso })
   if (athleteId) sp.set('athlete_id', String(athleteId))
@@ -64,8 +110,27 @@ export async function markPaymentPaid(payload: { athlete_id: number; month: stri
   })
 }
 
+export type Payment = {
+  id: number
+  athlete_id: number
+  month: string
+  status?: string | null
+  paid_amount?: number | null
+  paid_at?: string | null
+}
+
+export async function markPaymentsPaidBulk(monthIso: string, items: Array<{ athlete_id: number; paid_amount?: number | null }>) {
+  return apiFetch<{ month: string; payments: Payment[]; missing_athlete_ids: number[] }>(`/payments/mark-paid/bulk`, {
+    method: 'POST',
+    body: JSON.stringify({ month: monthIso, items })
+  })
+}
+
 export async function autoCreditFromCancelled(monthIso: string, athleteId?: number) {
   const sp = new URLSearchParams({ month: monthIso })
   if (athleteId) sp.set('athlete_id', String(athleteId))
-  return apiFetch<{ created: number }>(`/payments/auto-credit?${sp.toString()}`, { method: 'POST' })
+  // Runs as a background job; resolves once it has finished.
+  const job = await apiFetch<Job<{ created: number }>>(`/payments/auto-credit?${sp.toString()}`, { method: 'POST' })
+  const result = await waitForJob(job)
+  return { created: result.created ?? 0 }
 }
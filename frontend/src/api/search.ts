@@ -0,0 +1,29 @@
+import { apiFetch } from './client'
+
+export type SearchKind = 'athlete' | 'exercise' | 'session'
+
+export type SearchResult = {
+  kind: SearchKind
+  id: number
+  title: string
+  subtitle?: string | null
+  session_date?: string | null
+  athlete_id?: number | null
+  rank: number
+}
+
+export type SearchResponse = {
+  total: number
+  items: SearchResult[]
+}
+
+export async function search(
+  q: string,
+  params?: { types?: Array<'athletes' | 'exercises' | 'sessions'>; limit?: number; offset?: number }
+) {
+  const sp = new URLSearchParams({ q })
+  if (params?.types?.length) sp.set('types', params.types.join(','))
+  if (params?.limit) sp.set('limit', String(params.limit))
+  if (params?.offset) sp.set('offset', String(params.offset))
+  return apiFetch<SearchResponse>(`/search?${sp.toString()}`)
+}
@@ -41,12 +41,14 @@ export async function listTrainingSessions(params?: {
   end?: string
   athlete_id?: number
   status?: string
+  include_archived?: boolean
 }) {
   const sp = new URLSearchParams()
   if (params?.start) sp.set('start', params.start)
   if (params?.end) sp.set('end', params.end)
   if (params?.athlete_id) sp.set('athlete_id', String(params.athlete_id))
   if (params?.status) sp.set('status', params.status)
+  if (params?.include_archived) sp.set('include_archived', 'true')
   const qs = sp.toString()
   return apiFetch<TrainingSession[]>(`/training-sessions${qs ? `?${qs}` : ''}`)
 }
@@ -59,7 +61,7 @@ export async function createTrainingSession(payload: TrainingSessionCreate) {
 }
 
 export async function updateTrainingSession(id: number, payload: TrainingSessionUpdate) {
-  return apiFetch<{ updated: boolean }>(`/training-sessions/${id}`, {
+  return apiFetch<{ updated: boolean; session: TrainingSession }>(`/training-sessions/${id}`, {
     method: 'PATCH',
     body: JSON.stringify(payload)
   })
@@ -48,6 +48,7 @@ import { useMutation, useQuery } from '@tanstack/react-query'
 import { createAthlete, deleteAthlete, listAthletes, updateAthlete, type Athlete, type AthleteCreate } from '../api/athletes'
 import { queryClient } from '../queryClient'
 import { formatPhoneNumber } from '../utils/formatPhoneNumber'
+import { replaceInLists } from '../utils/replaceInLists'
 import { ReservedLinearProgress } from '../components/ReservedLinearProgress'
 
 const GENDER_OPTIONS = ['Masculino', 'Feminino', 'Outro'] as const
@@ -195,8 +196,8 @@ export function AthletesPage() {
 
   const updateMutation = useMutation({
     mutationFn: ({ id, payload }: { id: number; payload: Partial<AthleteCreate> }) => updateAthlete(id, payload),
-    onSuccess: async () => {
-      await queryClient.invalidateQueries({ queryKey: ['athletes'] })
+    onSuccess: ({ athlete }) => {
+      replaceInLists<Athlete>(['athletes'], athlete)
       resetForm()
       setAddOpen(false)
       setEditingAthlete(null)
@@ -24,6 +24,8 @@ import { useNavigate } from 'react-router-dom'
 import { listAthletes } from '../api/athletes'
 import { deleteTrainingSession, listTrainingSessions, TrainingSession, updateTrainingSession } from '../api/trainingSessions'
 import { queryClient } from '../queryClient'
+import { replaceInLists } from '../utils/replaceInLists'
+import { useChangeFeed } from '../utils/useChangeFeed'
 import { TrainingSessionDetailsCard } from '../components/TrainingSessionDetailsCard'
 
 const ACTIVE_SESSION_KEY = 'treinoRunner:activeSessionId'
@@ -228,6 +230,14 @@ export function CalendarPage() {
       })
   })
 
+  // Live updates from other coaches instead of polling.
+  useChangeFeed(['training-sessions'], {
+    start: rangeStartIso,
+    end: rangeEndIso,
+    athlete_id: filterAthleteId === '' ? undefined : Number(filterAthleteId),
+    tables: ['training_sessions']
+  })
+
   const deleteMutation = useMutation({
     mutationFn: deleteTrainingSession,
     onSuccess: async () => {
@@ -239,8 +249,12 @@ export function CalendarPage() {
   const updateMutation = useMutation({
     mutationFn: ({ id, payload }: { id: number; payload: Partial<TrainingSession> }) =>
       updateTrainingSession(id, payload),
-    onSuccess: async () => {
-      await queryClient.invalidateQueries({ queryKey: ['training-sessions'] })
+    onSuccess: async ({ session }, { payload }) => {
+      replaceInLists<TrainingSession>(['training-sessions'], session)
+      // Moving a session can change which month or athlete lists hold it.
+      if ('session_date' in payload || 'athlete_id' in payload) {
+        await queryClient.invalidateQueries({ queryKey: ['training-sessions'] })
+      }
     }
   })
 
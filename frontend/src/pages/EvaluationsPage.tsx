@@ -46,6 +46,7 @@ import { useMutation, useQuery } from '@tanstack/react-query'
 import { listAthletes } from '../api/athletes'
 import { createEvaluation, deleteEvaluation, listEvaluations, updateEvaluation, type Evaluation } from '../api/evaluations'
 import { queryClient } from '../queryClient'
+import { replaceInLists } from '../utils/replaceInLists'
 import { ReservedLinearProgress } from '../components/ReservedLinearProgress'
 
 function todayIso() {
@@ -230,8 +231,15 @@ export function EvaluationsPage() {
 
   const updateMutation = useMutation({
     mutationFn: ({ id, payload }: { id: number; payload: Parameters<typeof updateEvaluation>[1] }) => updateEvaluation(id, payload),
-    onSuccess: async () => {
-      await queryClient.invalidateQueries({ queryKey: ['evaluations'] })
+    onSuccess: async ({ evaluation }) => {
+      replaceInLists<Evaluation>(['evaluations'], evaluation)
+      // The lists are filtered by athlete and date; a move can change which lists hold it.
+      if (
+        evaluation.evaluation_date !== editingEvaluation?.evaluation_date ||
+        evaluation.athlete_id !== editingEvaluation?.athlete_id
+      ) {
+        await queryClient.invalidateQueries({ queryKey: ['evaluations'] })
+      }
       resetForm()
       setEditingEvaluation(null)
       setFormMode('create')
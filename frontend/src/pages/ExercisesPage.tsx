@@ -46,6 +46,7 @@ import { useMutation, useQuery } from '@tanstack/react-query'
 
 import { createExercise, deleteExercise, listExercises, updateExercise, type Exercise, type ExerciseCreate } from '../api/exercises'
 import { queryClient } from '../queryClient'
+import { replaceInLists } from '../utils/replaceInLists'
 import { ReservedLinearProgress } from '../components/ReservedLinearProgress'
 
 const CATEGORY_OPTIONS = [
@@ -226,8 +227,8 @@ export function ExercisesPage() {
 
   const updateMutation = useMutation({
     mutationFn: ({ id, payload }: { id: number; payload: Partial<ExerciseCreate> }) => updateExercise(id, payload),
-    onSuccess: async () => {
-      await queryClient.invalidateQueries({ queryKey: ['exercises'] })
+    onSuccess: ({ exercise }) => {
+      replaceInLists<Exercise>(['exercises'], exercise)
       resetForm()
       setAddOpen(false)
       setEditingExercise(null)
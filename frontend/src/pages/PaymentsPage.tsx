@@ -27,6 +27,7 @@ import {
   autoCreditFromCancelled,
   createPaymentAdjustment,
   deletePaymentAdjustment,
+  listBalances,
   listPaymentAdjustments,
   listPayments,
   markPaymentPaid,
@@ -65,6 +66,8 @@ export function PaymentsPage() {
 
   const athletesQuery = useQuery({ queryKey: ['athletes'], queryFn: listAthletes })
   const paymentsQuery = useQuery({ queryKey: ['payments', monthIso], queryFn: () => listPayments(monthIso) })
+  // Under the 'payments' key so every payments invalidation refreshes it too.
+  const balancesQuery = useQuery({ queryKey: ['payments', 'balances', monthIso], queryFn: () => listBalances(monthIso) })
 
   const adjustmentsQuery = useQuery({
     queryKey: ['payment-adjustments', monthIso, selectedAthleteId],
@@ -138,6 +141,8 @@ export function PaymentsPage() {
     }
   })
 
+  const balanceByAthlete = useMemo(() => new Map((balancesQuery.data ?? []).map((b) => [b.athlete_id, b])), [balancesQuery.data])
+
   const byAthleteAdjustments = useMemo(() => {
     const map = new Map<number, PaymentAdjustment[]>()
     for (const a of adjustments) {
@@ -220,6 +225,7 @@ export function PaymentsPage() {
             const name = fullName(p)
             const adj = byAthleteAdjustments.get(p.athlete_id) ?? []
             const paid = (p.status || '').toLowerCase() === 'paid'
+            const balance = balanceByAthlete.get(p.athlete_id)
 
             return (
               <Card key={p.athlete_id} variant="outlined" sx={{ borderRadius: 2 }}>
@@ -233,6 +239,14 @@ export function PaymentsPage() {
                           </Typography>
                           <Chip size="small" label={planLabel(p)} variant="outlined" />
                           {paid ? <Chip size="small" color="success" label="Pago" /> : <Chip size="small" color="warning" label="Pendente" />}
+                          {balance && balance.carried_over > 0 ? (
+                            <Chip
+                              size="small"
+                              color="error"
+                              variant="outlined"
+                              label={`Em atraso: ${euro(balance.carried_over)}${balance.owing_since ? ` desde ${balance.owing_since.slice(0, 7)}` : ''}`}
+                            />
+                          ) : null}
                         </Stack>
                         <Typography variant="body2" color="text.secondary">
                           Base: {euro(p.base_amount)} • Ajustes: {euro(p.adjustments_total)} • Total: {euro(p.total_due)}
@@ -436,7 +450,9 @@ export function PaymentsPage() {
                   plan_type: planType,
                   plan_sessions_per_week: planType === 'monthly' ? (planSessionsPerWeek === '' ? null : Number(planSessionsPerWeek)) : null,
                   plan_monthly_price: planType === 'monthly' ? (planMonthlyPrice === '' ? null : Number(planMonthlyPrice)) : null,
-                  plan_on_demand_price: planType === 'on_demand' ? (planOnDemandPrice === '' ? null : Number(planOnDemandPrice)) : null
+                  plan_on_demand_price: planType === 'on_demand' ? (planOnDemandPrice === '' ? null : Number(planOnDemandPrice)) : null,
+                  // Closed months keep their plan; editing from a future month schedules the change.
+                  plan_effective_from: monthIso > monthStartIso(new Date()) ? monthIso : null
                 }
               })
             }}
@@ -48,6 +48,7 @@ import {
   TrainingSessionCreate
 } from '../api/trainingSessions'
 import { queryClient } from '../queryClient'
+import { replaceInLists } from '../utils/replaceInLists'
 import { ReservedLinearProgress } from '../components/ReservedLinearProgress'
 import { TrainingSessionDetailsCard } from '../components/TrainingSessionDetailsCard'
 
@@ -258,8 +259,12 @@ export function SessionsPage() {
 
   const updateMutation = useMutation({
     mutationFn: ({ id, payload }: { id: number; payload: TrainingSessionCreate }) => updateTrainingSession(id, payload),
-    onSuccess: async () => {
-      await queryClient.invalidateQueries({ queryKey: ['training-sessions'] })
+    onSuccess: async ({ session }) => {
+      replaceInLists<TrainingSession>(['training-sessions'], session)
+      // The lists are filtered by athlete and date; a move can change which lists hold it.
+      if (session.session_date !== editingSession?.session_date || session.athlete_id !== editingSession?.athlete_id) {
+        await queryClient.invalidateQueries({ queryKey: ['training-sessions'] })
+      }
       resetForm()
       setEditingSession(null)
       setFormMode('create')
@@ -38,6 +38,7 @@ import {
   type TrainingSessionUpdate
 } from '../api/trainingSessions'
 import { queryClient } from '../queryClient'
+import { useChangeFeed } from '../utils/useChangeFeed'
 import { ReservedLinearProgress } from '../components/ReservedLinearProgress'
 
 const ACTIVE_SESSION_KEY = 'treinoRunner:activeSessionId'
@@ -255,6 +256,8 @@ export function TreinoRunnerPage() {
     queryFn: () => listTrainingSessions({ status: 'Scheduled' })
   })
 
+  useChangeFeed(['training-sessions'], { tables: ['training_sessions'] })
+
   const scheduledSessions = scheduledQuery.data ?? []
 
   const activeSession = useMemo(() => {
@@ -0,0 +1,10 @@
+import { queryClient } from '../queryClient'
+
+// PATCH responses carry the updated row. Swap it into every cached list under
+// `queryKey` (merged, so list-only fields like roster includes survive)
+// instead of refetching the lists.
+export function replaceInLists<T extends { id: number }>(queryKey: readonly unknown[], item: Partial<T> & { id: number }) {
+  queryClient.setQueriesData<T[]>({ queryKey }, (list) =>
+    Array.isArray(list) ? list.map((row) => (row.id === item.id ? { ...row, ...item } : row)) : list
+  )
+}
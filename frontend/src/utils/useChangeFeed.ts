@@ -0,0 +1,30 @@
+import { useEffect } from 'react'
+
+import { ChangeFeedFilter, ChangeTable, subscribeToChanges } from '../api/events'
+import { queryClient } from '../queryClient'
+
+// Invalidates `queryKey` whenever a matching change is committed (by anyone),
+// so pages stay current without polling. Bursts are coalesced into one refetch.
+export function useChangeFeed(queryKey: readonly unknown[], filter: ChangeFeedFilter, debounceMs = 250) {
+  const { start, end, athlete_id } = filter
+  const tables = filter.tables?.join(',')
+  const key = JSON.stringify(queryKey)
+
+  useEffect(() => {
+    let timer: ReturnType<typeof setTimeout> | undefined
+    const invalidate = () => {
+      if (timer) clearTimeout(timer)
+      timer = setTimeout(() => {
+        void queryClient.invalidateQueries({ queryKey: JSON.parse(key) as unknown[] })
+      }, debounceMs)
+    }
+    const close = subscribeToChanges(
+      { start, end, athlete_id, tables: tables ? (tables.split(',') as ChangeTable[]) : undefined },
+      { onChange: invalidate, onResync: invalidate }
+    )
+    return () => {
+      if (timer) clearTimeout(timer)
+      close()
+    }
+  }, [key, start, end, athlete_id, tables, debounceMs])
+}
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Bytes-on-wire and CPU cost of response compression, per endpoint.
+
+Fetches each path uncompressed from a running API, then compresses the body with
+the same encoders the CompressionMiddleware uses and reports size, ratio and
+CPU time per response for every available encoding/level.
+
+Examples:
+  python scripts/bench_compression.py /training-sessions /athletes /exercises
+  python scripts/bench_compression.py --url http://localhost:8000 --gzip-levels 1,6,9 /training-sessions
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from backend.compression import available_encodings, make_encoder  # noqa: E402
+
+
+def _fetch(url: str) -> bytes:
+    req = urllib.request.Request(url, headers={"Accept-Encoding": "identity"})
+    with urllib.request.urlopen(req, timeout=60) as res:
+        return res.read()
+
+
+def _measure(body: bytes, encoding: str, level: int, repeat: int) -> tuple[int, float]:
+    levels = {encoding: level}
+    size = 0
+    started = time.process_time()
+    for _ in range(repeat):
+        encoder = make_encoder(encoding, levels)
+        size = len(encoder.compress(body) + encoder.finish())
+    return size, (time.process_time() - started) / repeat
+
+
+def _levels(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark response compression per endpoint")
+    parser.add_argument("paths", nargs="*", default=["/training-sessions", "/athletes", "/exercises", "/evaluations"])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--gzip-levels", default="1,6,9")
+    parser.add_argument("--br-levels", default="1,4,6,11")
+    parser.add_argument("--zstd-levels", default="1,3,9")
+    args = parser.parse_args()
+
+    level_sets = {"gzip": _levels(args.gzip_levels), "br": _levels(args.br_levels), "zstd": _levels(args.zstd_levels)}
+    encodings = available_encodings(["gzip", "br", "zstd"])
+
+    print(f"{'endpoint':<28} {'encoding':<10} {'bytes':>10} {'ratio':>7} {'cpu/resp':>10}")
+    for path in args.paths:
+        body = _fetch(args.url.rstrip("/") + path)
+        print(f"{path:<28} {'identity':<10} {len(body):>10} {1.0:>7.2f} {0.0:>8.2f}ms")
+        for encoding in encodings:
+            for level in level_sets[encoding]:
+                size, cpu = _measure(body, encoding, level, args.repeat)
+                ratio = len(body) / size if size else 0.0
+                print(f"{'':<28} {f'{encoding}-{level}':<10} {size:>10} {ratio:>7.2f} {cpu * 1000:>8.2f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Parse/plan time saved by the prepared hot-route statements (backend/db.py).
+
+Runs each registered hot query on one connection, first as plain SQL text and
+then as a prepared statement. For both, it reports the mean round trip and the
+server-side planning time that EXPLAIN ANALYZE shows. Sample parameters come
+from the database, so seed it first.
+
+Examples:
+  python scripts/bench_prepared.py
+  python scripts/bench_prepared.py --repeat 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from backend import db  # noqa: E402
+from backend.api.routes import analysis, payments, training_sessions  # noqa: E402
+
+
+def _cases() -> list[tuple[str, db.Statement, tuple]]:
+    session = db.fetch_one("SELECT id, athlete_id, session_date FROM training_sessions ORDER BY id DESC LIMIT 1")
+    if session is None:
+        raise SystemExit("No training sessions; seed the database first.")
+    month = session["session_date"].replace(day=1)
+    month_end = (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return [
+        ("athlete exists", analysis._ATHLETE_EXISTS, (session["athlete_id"],)),
+        (
+            "calendar month",
+            training_sessions._list_statement(True, True, False, False),
+            (month, month_end),
+        ),
+        (
+            "athlete month",
+            training_sessions._list_statement(True, True, True, False),
+            (month, month_end, session["athlete_id"]),
+        ),
+        ("billing athletes", payments._BILLING_ATHLETES, ()),
+        ("adjustment totals", payments._ADJUSTMENT_TOTALS, (month,)),
+        ("completed count", payments._COMPLETED_SESSIONS, (session["athlete_id"], month, month_end)),
+    ]
+
+
+def _planning_ms(cur, sql: str, params: tuple) -> float:
+    cur.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+    return float(cur.fetchone()[0][0]["Planning Time"])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark prepared vs. plain hot queries")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    cases = _cases()
+    print(f"{'query':<20} {'plain ms':>10} {'prepared ms':>12} {'plan plain':>11} {'plan prep':>10}")
+    try:
+        with db.get_conn() as conn:
+            with conn.cursor() as cur:
+                for label, stmt, params in cases:
+                    plain = []
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        cur.execute(stmt.sql, params)
+                        cur.fetchall()
+                        plain.append(time.perf_counter() - started)
+                    plan_plain = statistics.median(_planning_ms(cur, stmt.sql, params) for _ in range(20))
+
+                    prepared = []
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        stmt.execute(conn, cur, params)
+                        cur.fetchall()
+                        prepared.append(time.perf_counter() - started)
+                    execute_sql = f"EXECUTE {stmt.name}" + (f" ({', '.join(['%s'] * len(params))})" if params else "")
+                    plan_prepared = statistics.median(_planning_ms(cur, execute_sql, params) for _ in range(20))
+
+                    print(
+                        f"{label:<20} {statistics.mean(plain) * 1000:>10.3f} {statistics.mean(prepared) * 1000:>12.3f}"
+                        f" {plan_plain:>11.3f} {plan_prepared:>10.3f}"
+                    )
+                conn.rollback()
+    finally:
+        db.close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -72,7 +72,7 @@ DDL = [
     """,
     """
     CREATE TABLE IF NOT EXISTS training_sessions (
-        id SERIAL PRIMARY KEY,
+        id SERIAL,
         athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
         session_name VARCHAR(200) NOT NULL,
         session_date DATE NOT NULL,
@@ -84,8 +84,9 @@ DDL = [
         exercises JSONB,
         completed_data JSONB,
         completed_at TIMESTAMP,
-        created_date DATE DEFAULT CURRENT_DATE
-    )
+        created_date DATE DEFAULT CURRENT_DATE,
+        PRIMARY KEY (id, session_date)
+    ) PARTITION BY RANGE (session_date)
     """,
     """
     CREATE TABLE IF NOT EXISTS evaluations (
@@ -101,6 +102,219 @@ DDL = [
         created_date DATE DEFAULT CURRENT_DATE
     )
     """,
+    """
+    CREATE TABLE IF NOT EXISTS payments (
+        id SERIAL PRIMARY KEY,
+        athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+        month DATE NOT NULL,
+        status VARCHAR(20),
+        paid_amount DECIMAL(10,2),
+        paid_at TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS payment_adjustments (
+        id SERIAL PRIMARY KEY,
+        athlete_id INTEGER REFERENCES athletes(id) ON DELETE CASCADE,
+        applies_month DATE NOT NULL,
+        amount DECIMAL(10,2) NOT NULL,
+        reason TEXT,
+        related_session_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Personal-record engine (backend/records.py). session_id is deliberately not a
+    # foreign key: the app keeps these in sync through records.sync_session().
+    """
+    CREATE TABLE IF NOT EXISTS exercise_session_stats (
+        session_id INTEGER NOT NULL,
+        athlete_id INTEGER NOT NULL REFERENCES athletes(id) ON DELETE CASCADE,
+        exercise_key VARCHAR(200) NOT NULL,
+        exercise_name VARCHAR(200) NOT NULL,
+        session_date DATE NOT NULL,
+        weight DECIMAL(8,2),
+        volume DECIMAL(10,2),
+        e1rm DECIMAL(8,2),
+        PRIMARY KEY (session_id, exercise_key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS athlete_exercise_bests (
+        athlete_id INTEGER NOT NULL REFERENCES athletes(id) ON DELETE CASCADE,
+        exercise_key VARCHAR(200) NOT NULL,
+        exercise_name VARCHAR(200) NOT NULL,
+        best_weight DECIMAL(8,2),
+        best_weight_date DATE,
+        best_weight_session_id INTEGER,
+        best_volume DECIMAL(10,2),
+        best_volume_date DATE,
+        best_volume_session_id INTEGER,
+        best_e1rm DECIMAL(8,2),
+        best_e1rm_date DATE,
+        best_e1rm_session_id INTEGER,
+        rolling_volume DECIMAL(10,2),
+        sessions_count INTEGER NOT NULL DEFAULT 0,
+        last_session_date DATE,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (athlete_id, exercise_key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS personal_records (
+        id SERIAL PRIMARY KEY,
+        athlete_id INTEGER NOT NULL REFERENCES athletes(id) ON DELETE CASCADE,
+        session_id INTEGER NOT NULL,
+        exercise_key VARCHAR(200) NOT NULL,
+        exercise_name VARCHAR(200) NOT NULL,
+        record_type VARCHAR(20) NOT NULL,
+        value DECIMAL(10,2) NOT NULL,
+        previous_value DECIMAL(10,2),
+        achieved_on DATE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Idempotency-Key replays (backend/idempotency.py)
+    """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key VARCHAR(255) PRIMARY KEY,
+        request_hash BYTEA NOT NULL,
+        status SMALLINT,
+        response_headers JSONB,
+        response_body BYTEA,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        expires_at TIMESTAMPTZ NOT NULL
+    )
+    """,
+    # Training rollups (backend/rollups.py); granularity is 'day', 'week' or 'month'.
+    """
+    CREATE TABLE IF NOT EXISTS athlete_training_rollups (
+        athlete_id INTEGER NOT NULL REFERENCES athletes(id) ON DELETE CASCADE,
+        granularity VARCHAR(5) NOT NULL,
+        period_start DATE NOT NULL,
+        sessions_total INTEGER NOT NULL DEFAULT 0,
+        sessions_scheduled INTEGER NOT NULL DEFAULT 0,
+        sessions_completed INTEGER NOT NULL DEFAULT 0,
+        sessions_cancelled INTEGER NOT NULL DEFAULT 0,
+        minutes_trained INTEGER NOT NULL DEFAULT 0,
+        total_volume DECIMAL(12,2) NOT NULL DEFAULT 0,
+        exercises_completed INTEGER NOT NULL DEFAULT 0,
+        exercises_failed INTEGER NOT NULL DEFAULT 0,
+        exercises_skipped INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (athlete_id, granularity, period_start)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS studio_training_rollups (
+        granularity VARCHAR(5) NOT NULL,
+        period_start DATE NOT NULL,
+        active_athletes INTEGER NOT NULL DEFAULT 0,
+        sessions_total INTEGER NOT NULL DEFAULT 0,
+        sessions_scheduled INTEGER NOT NULL DEFAULT 0,
+        sessions_completed INTEGER NOT NULL DEFAULT 0,
+        sessions_cancelled INTEGER NOT NULL DEFAULT 0,
+        minutes_trained INTEGER NOT NULL DEFAULT 0,
+        total_volume DECIMAL(12,2) NOT NULL DEFAULT 0,
+        exercises_completed INTEGER NOT NULL DEFAULT 0,
+        exercises_failed INTEGER NOT NULL DEFAULT 0,
+        exercises_skipped INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (granularity, period_start)
+    )
+    """,
+    # Sessions and minutes per hour slot and status (backend/occupancy.py);
+    # 'day' rows per date, 'month' rows summed per weekday. weekday is ISO (1 = Monday).
+    """
+    CREATE TABLE IF NOT EXISTS session_hour_slots (
+        granularity VARCHAR(5) NOT NULL,
+        period_start DATE NOT NULL,
+        weekday SMALLINT NOT NULL,
+        hour SMALLINT NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        minutes INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (granularity, period_start, weekday, hour, status)
+    )
+    """,
+    # Amount due vs. paid per athlete and month, rebuilt by the month-close job.
+    """
+    CREATE TABLE IF NOT EXISTS billing_ledger (
+        athlete_id INTEGER NOT NULL REFERENCES athletes(id) ON DELETE CASCADE,
+        month DATE NOT NULL,
+        plan_type VARCHAR(20),
+        completed_sessions INTEGER NOT NULL DEFAULT 0,
+        base_amount DECIMAL(10,2) NOT NULL DEFAULT 0,
+        adjustments_total DECIMAL(10,2) NOT NULL DEFAULT 0,
+        total_due DECIMAL(10,2) NOT NULL DEFAULT 0,
+        paid_amount DECIMAL(10,2),
+        status VARCHAR(20),
+        computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (athlete_id, month)
+    )
+    """,
+    # Studio billing per month and plan type, derived from billing_ledger
+    # (billing.refresh_totals); read by /reports/revenue.
+    """
+    CREATE TABLE IF NOT EXISTS billing_monthly_totals (
+        month DATE NOT NULL,
+        plan_type VARCHAR(20) NOT NULL,
+        athlete_months INTEGER NOT NULL DEFAULT 0,
+        completed_sessions INTEGER NOT NULL DEFAULT 0,
+        base_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+        adjustments_total DECIMAL(12,2) NOT NULL DEFAULT 0,
+        cancellation_credits DECIMAL(12,2) NOT NULL DEFAULT 0,
+        billed DECIMAL(12,2) NOT NULL DEFAULT 0,
+        collected DECIMAL(12,2) NOT NULL DEFAULT 0,
+        outstanding DECIMAL(12,2) NOT NULL DEFAULT 0,
+        computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (month, plan_type)
+    )
+    """,
+    # Billing plan per athlete from a month on (backend/billing.py). athletes.plan_*
+    # is the latest plan; past months are billed with the row in effect then.
+    """
+    CREATE TABLE IF NOT EXISTS plan_history (
+        id SERIAL PRIMARY KEY,
+        athlete_id INTEGER NOT NULL REFERENCES athletes(id) ON DELETE CASCADE,
+        effective_from DATE NOT NULL,
+        plan_type VARCHAR(20),
+        plan_sessions_per_week INTEGER,
+        plan_monthly_price DECIMAL(10,2),
+        plan_on_demand_price DECIMAL(10,2),
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        UNIQUE (athlete_id, effective_from)
+    )
+    """,
+    # Months before detached_before were detached by scripts/manage_partitions.py;
+    # ensure_training_sessions_partition refuses to recreate them.
+    """
+    CREATE TABLE IF NOT EXISTS partition_horizons (
+        parent TEXT PRIMARY KEY,
+        detached_before DATE NOT NULL
+    )
+    """,
+    # Background job queue (backend/jobs.py)
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id SERIAL PRIMARY KEY,
+        kind VARCHAR(50) NOT NULL,
+        params JSONB NOT NULL DEFAULT '{}'::jsonb,
+        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 3,
+        run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        dedupe_key VARCHAR(200),
+        schedule_key VARCHAR(200) UNIQUE,
+        locked_by VARCHAR(200),
+        locked_at TIMESTAMPTZ,
+        progress REAL,
+        progress_message TEXT,
+        result JSONB,
+        error TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        started_at TIMESTAMPTZ,
+        finished_at TIMESTAMPTZ
+    )
+    """,
 ]
 
 # Migrations for existing databases — adds columns that were introduced after
@@ -115,6 +329,643 @@ MIGRATIONS = [
     "ALTER TABLE exercises ADD COLUMN IF NOT EXISTS sets_range VARCHAR(50)",
     "ALTER TABLE exercises ADD COLUMN IF NOT EXISTS reps_range VARCHAR(50)",
     "ALTER TABLE exercises ADD COLUMN IF NOT EXISTS tips TEXT",
+    # Exercise catalog filters (/exercises/catalog): muscle_groups / equipment stay
+    # comma-separated text for the API, mirrored into indexed arrays.
+    r"""
+    ALTER TABLE exercises ADD COLUMN IF NOT EXISTS muscle_group_list TEXT[]
+    GENERATED ALWAYS AS (
+        array_remove(string_to_array(regexp_replace(trim(coalesce(muscle_groups, '')), '\s*,\s*', ',', 'g'), ','), '')
+    ) STORED
+    """,
+    r"""
+    ALTER TABLE exercises ADD COLUMN IF NOT EXISTS equipment_list TEXT[]
+    GENERATED ALWAYS AS (
+        array_remove(string_to_array(regexp_replace(trim(coalesce(equipment, '')), '\s*,\s*', ',', 'g'), ','), '')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS exercises_muscle_group_list_idx ON exercises USING gin (muscle_group_list)",
+    "CREATE INDEX IF NOT EXISTS exercises_equipment_list_idx ON exercises USING gin (equipment_list)",
+    "CREATE INDEX IF NOT EXISTS exercises_category_idx ON exercises (category)",
+    "CREATE INDEX IF NOT EXISTS exercises_difficulty_idx ON exercises (difficulty)",
+    "CREATE INDEX IF NOT EXISTS exercises_exercise_type_idx ON exercises (exercise_type)",
+    # training_sessions is partitioned by month (backend/partitions.py). Partitions
+    # are made with CREATE ... (LIKE) + ATTACH: that takes SHARE UPDATE EXCLUSIVE
+    # on the parent instead of the ACCESS EXCLUSIVE of CREATE ... PARTITION OF,
+    # so sessions in other months stay readable and writable meanwhile. The
+    # temporary CHECK lets ATTACH skip its validation scan. There is no default
+    # partition, so old months can be detached CONCURRENTLY.
+    """
+    CREATE OR REPLACE FUNCTION ensure_training_sessions_partition(p_month DATE) RETURNS BOOLEAN AS $$
+    DECLARE
+        start_date DATE := date_trunc('month', p_month)::date;
+        end_date DATE := (date_trunc('month', p_month) + interval '1 month')::date;
+        part_name TEXT := format('training_sessions_p%s', to_char(p_month, 'YYYYMM'));
+    BEGIN
+        -- Attached, not merely existing: a detached month keeps its table.
+        IF EXISTS (
+            SELECT 1 FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'training_sessions'::regclass AND c.relname = part_name
+        ) THEN
+            RETURN FALSE;
+        END IF;
+        PERFORM pg_advisory_xact_lock(hashtext(part_name));
+        IF EXISTS (
+            SELECT 1 FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'training_sessions'::regclass AND c.relname = part_name
+        ) THEN
+            RETURN FALSE;
+        END IF;
+        -- A detached month (archived, or still lying around unattached) must not
+        -- come back as an empty partition: that would block reattaching it.
+        IF start_date < (SELECT detached_before FROM partition_horizons WHERE parent = 'training_sessions')
+           OR to_regclass(part_name) IS NOT NULL THEN
+            RAISE EXCEPTION 'Training sessions for % are detached', to_char(start_date, 'YYYY-MM')
+                USING ERRCODE = 'object_not_in_prerequisite_state';
+        END IF;
+
+        EXECUTE format('CREATE TABLE %I (LIKE training_sessions INCLUDING DEFAULTS)', part_name);
+        EXECUTE format(
+            'ALTER TABLE %I ADD CONSTRAINT %I CHECK (session_date >= %L AND session_date < %L)',
+            part_name, part_name || '_bounds', start_date, end_date
+        );
+        EXECUTE format(
+            'ALTER TABLE training_sessions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            part_name, start_date, end_date
+        );
+        EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', part_name, part_name || '_bounds');
+        RETURN TRUE;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # One-time conversion of an existing plain training_sessions table. Its
+    # indexes and trigger are dropped with it and recreated on the partitioned
+    # table by the statements below.
+    """
+    DO $$
+    DECLARE
+        m DATE;
+    BEGIN
+        IF (SELECT relkind FROM pg_class WHERE oid = 'training_sessions'::regclass) <> 'r' THEN
+            RETURN;
+        END IF;
+
+        LOCK TABLE training_sessions IN ACCESS EXCLUSIVE MODE;
+        ALTER TABLE training_sessions RENAME TO training_sessions_unpartitioned;
+        ALTER TABLE training_sessions_unpartitioned
+            RENAME CONSTRAINT training_sessions_pkey TO training_sessions_unpartitioned_pkey;
+        ALTER TABLE training_sessions_unpartitioned DROP CONSTRAINT IF EXISTS training_sessions_athlete_id_fkey;
+        DROP INDEX IF EXISTS training_sessions_session_date_idx;
+        DROP INDEX IF EXISTS training_sessions_athlete_date_idx;
+        DROP INDEX IF EXISTS training_sessions_search_vector_idx;
+        DROP INDEX IF EXISTS training_sessions_search_trgm_idx;
+
+        CREATE TABLE training_sessions (LIKE training_sessions_unpartitioned INCLUDING DEFAULTS)
+            PARTITION BY RANGE (session_date);
+        ALTER TABLE training_sessions ADD PRIMARY KEY (id, session_date);
+        ALTER TABLE training_sessions ADD CONSTRAINT training_sessions_athlete_id_fkey
+            FOREIGN KEY (athlete_id) REFERENCES athletes(id) ON DELETE CASCADE;
+        ALTER SEQUENCE training_sessions_id_seq OWNED BY training_sessions.id;
+
+        FOR m IN
+            SELECT g::date
+            FROM (SELECT MIN(session_date) AS lo, MAX(session_date) AS hi FROM training_sessions_unpartitioned) b,
+                 generate_series(date_trunc('month', b.lo), date_trunc('month', b.hi), interval '1 month') g
+        LOOP
+            PERFORM ensure_training_sessions_partition(m);
+        END LOOP;
+
+        INSERT INTO training_sessions SELECT * FROM training_sessions_unpartitioned;
+        DROP TABLE training_sessions_unpartitioned;
+    END;
+    $$
+    """,
+    # This month and the next 12; the month-close job keeps extending it. Past
+    # months are created on demand, so detached ones don't come back empty.
+    """
+    SELECT ensure_training_sessions_partition(m::date)
+    FROM generate_series(
+        date_trunc('month', CURRENT_DATE),
+        date_trunc('month', CURRENT_DATE) + interval '12 months',
+        interval '1 month'
+    ) m
+    """,
+    # Date-range scans (calendar, dashboard, billing)
+    "CREATE INDEX IF NOT EXISTS training_sessions_session_date_idx ON training_sessions (session_date)",
+    "CREATE INDEX IF NOT EXISTS evaluations_evaluation_date_idx ON evaluations (evaluation_date DESC, id DESC)",
+    """
+    CREATE INDEX IF NOT EXISTS exercise_session_stats_athlete_idx
+    ON exercise_session_stats (athlete_id, exercise_key, session_date DESC, session_id DESC)
+    """,
+    "CREATE INDEX IF NOT EXISTS personal_records_athlete_idx ON personal_records (athlete_id, achieved_on DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS personal_records_session_idx ON personal_records (session_id)",
+    # One payment row per athlete and month (mark-paid upserts on it). Older
+    # databases may hold duplicates from the previous select-then-insert flow:
+    # keep the paid / most recent one.
+    """
+    DELETE FROM payments
+    WHERE id IN (
+        SELECT id
+        FROM (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY athlete_id, month
+                       ORDER BY COALESCE(status = 'paid', false) DESC, paid_at DESC NULLS LAST, id DESC
+                   ) AS rn
+            FROM payments
+        ) ranked
+        WHERE rn > 1
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS payments_athlete_month_key ON payments (athlete_id, month)",
+    "CREATE INDEX IF NOT EXISTS payments_month_idx ON payments (month)",
+    "CREATE INDEX IF NOT EXISTS payment_adjustments_month_idx ON payment_adjustments (applies_month, athlete_id)",
+    # One credit per cancelled session and month (billing.auto_credit inserts
+    # ON CONFLICT DO NOTHING). Keep the first of any duplicates from concurrent runs.
+    """
+    DELETE FROM payment_adjustments
+    WHERE id IN (
+        SELECT id
+        FROM (
+            SELECT id,
+                   ROW_NUMBER() OVER (PARTITION BY related_session_id, applies_month ORDER BY id) AS rn
+            FROM payment_adjustments
+            WHERE related_session_id IS NOT NULL
+        ) ranked
+        WHERE rn > 1
+    )
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS payment_adjustments_session_month_key
+    ON payment_adjustments (related_session_id, applies_month)
+    WHERE related_session_id IS NOT NULL
+    """,
+    "CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at_idx ON idempotency_keys (expires_at)",
+    # Roster lookups (GET /athletes?include=...): latest evaluation and next session per athlete.
+    """
+    CREATE INDEX IF NOT EXISTS evaluations_athlete_date_idx
+    ON evaluations (athlete_id, evaluation_date DESC, id DESC)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS training_sessions_athlete_date_idx
+    ON training_sessions (athlete_id, session_date, session_time)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS athlete_training_rollups_period_idx
+    ON athlete_training_rollups (granularity, period_start)
+    """,
+    "CREATE INDEX IF NOT EXISTS jobs_queue_idx ON jobs (run_at, id) WHERE status = 'queued'",
+    "CREATE INDEX IF NOT EXISTS jobs_running_idx ON jobs (locked_at) WHERE status = 'running'",
+    # At most one queued/running job per dedupe key.
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_dedupe_key
+    ON jobs (dedupe_key) WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')
+    """,
+    "CREATE INDEX IF NOT EXISTS billing_ledger_month_idx ON billing_ledger (month)",
+    # Live change feed (backend/changefeed.py): compact events, delivered on commit.
+    """
+    CREATE OR REPLACE FUNCTION notify_studio_change() RETURNS trigger AS $$
+    DECLARE
+        rec RECORD;
+        tbl TEXT;
+        payload JSONB;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSE
+            rec := NEW;
+        END IF;
+        -- On a partitioned table TG_TABLE_NAME is the partition; the trigger passes the parent.
+        tbl := COALESCE(TG_ARGV[0], TG_TABLE_NAME);
+        payload := jsonb_build_object('table', tbl, 'op', lower(TG_OP), 'id', rec.id);
+
+        IF tbl = 'athletes' THEN
+            payload := payload || jsonb_build_object('athlete_id', rec.id);
+        ELSIF tbl = 'payments' THEN
+            payload := payload || jsonb_build_object('athlete_id', rec.athlete_id, 'date', rec.month);
+        ELSE
+            payload := payload || jsonb_build_object('athlete_id', rec.athlete_id, 'date', rec.session_date);
+            IF TG_OP = 'UPDATE' THEN
+                IF OLD.session_date IS DISTINCT FROM NEW.session_date THEN
+                    payload := payload || jsonb_build_object('old_date', OLD.session_date);
+                END IF;
+                IF OLD.athlete_id IS DISTINCT FROM NEW.athlete_id THEN
+                    payload := payload || jsonb_build_object('old_athlete_id', OLD.athlete_id);
+                END IF;
+            END IF;
+        END IF;
+
+        PERFORM pg_notify('studio_changes', payload::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS training_sessions_notify ON training_sessions",
+    """
+    CREATE TRIGGER training_sessions_notify
+    AFTER INSERT OR UPDATE OR DELETE ON training_sessions
+    FOR EACH ROW EXECUTE FUNCTION notify_studio_change('training_sessions')
+    """,
+    "DROP TRIGGER IF EXISTS payments_notify ON payments",
+    """
+    CREATE TRIGGER payments_notify
+    AFTER INSERT OR UPDATE OR DELETE ON payments
+    FOR EACH ROW EXECUTE FUNCTION notify_studio_change()
+    """,
+    "DROP TRIGGER IF EXISTS athletes_notify ON athletes",
+    """
+    CREATE TRIGGER athletes_notify
+    AFTER INSERT OR UPDATE OR DELETE ON athletes
+    FOR EACH ROW EXECUTE FUNCTION notify_studio_change()
+    """,
+    # Compact completed_data (format v2). A completed session repeats its plan in
+    # every entry (planned_*, the exercise name, actual_* that match the plan).
+    # v2 keeps only what differs from the session's own `exercises` array, under
+    # short keys, with an exercise id instead of a name that isn't in the plan:
+    #
+    #   {"v": 2, "s": started_at, "x": [{"i": exercise_idx, "k": "c", "t": completed_at,
+    #                                    "o": notes, "aw": "50kg", "-": [...], "+": {...}}]}
+    #
+    # p*/a* = planned_/actual_ sets (s), reps (r), weight (w), rest (t); k = status
+    # code (K when it isn't one); n/e = exercise name/id; "-" lists derivable keys
+    # that were absent; "+" keeps unknown keys; {"r": ...} is an entry kept as is.
+    # Writes are encoded by a trigger; readers call decode_completed_data(), which
+    # passes v1 documents through unchanged.
+    """
+    CREATE OR REPLACE FUNCTION encode_completed_data(doc JSONB, planned JSONB) RETURNS JSONB AS $$
+    DECLARE
+        fields CONSTANT TEXT[] := ARRAY['sets', 'reps', 'weight', 'rest'];
+        shorts CONSTANT TEXT[] := ARRAY['s', 'r', 'w', 't'];
+        known CONSTANT TEXT[] := ARRAY[
+            'exercise_idx', 'exercise_name', 'status', 'completed_at', 'notes',
+            'planned_sets', 'planned_reps', 'planned_weight', 'planned_rest',
+            'actual_sets', 'actual_reps', 'actual_weight', 'actual_rest'
+        ];
+        inline_names BOOLEAN := COALESCE(current_setting('sfs.inline_exercise_names', true) = 'on', false);
+        result JSONB := '{"v": 2}';
+        entries JSONB := '[]';
+        e JSONB;
+        p JSONB;
+        enc JSONB;
+        missing JSONB;
+        ref JSONB;
+        exercise_id INT;
+        i INT;
+    BEGIN
+        IF doc IS NULL OR jsonb_typeof(doc) <> 'object' OR doc->'v' = '2' THEN
+            RETURN doc;
+        END IF;
+        IF doc ? 'started_at' THEN
+            result := result || jsonb_build_object('s', doc->'started_at');
+        END IF;
+        IF doc - 'started_at' - 'exercises' <> '{}' OR (doc ? 'exercises' AND jsonb_typeof(doc->'exercises') <> 'array') THEN
+            result := result || jsonb_build_object(
+                '+', doc - 'started_at' - CASE WHEN jsonb_typeof(doc->'exercises') = 'array' THEN 'exercises' ELSE '' END
+            );
+        END IF;
+        IF jsonb_typeof(doc->'exercises') IS DISTINCT FROM 'array' THEN
+            RETURN result;
+        END IF;
+
+        FOR e IN SELECT value FROM jsonb_array_elements(doc->'exercises') LOOP
+            p := CASE WHEN jsonb_typeof(e) = 'object' AND e->>'exercise_idx' ~ '^[0-9]{1,6}$'
+                      THEN planned -> (e->>'exercise_idx')::int END;
+            IF jsonb_typeof(p) IS DISTINCT FROM 'object' THEN
+                entries := entries || jsonb_build_array(jsonb_build_object('r', e));
+                CONTINUE;
+            END IF;
+
+            enc := jsonb_build_object('i', e->'exercise_idx');
+            missing := '[]';
+            FOR i IN 1..4 LOOP
+                IF NOT e ? ('planned_' || fields[i]) THEN
+                    missing := missing || to_jsonb('p' || shorts[i]);
+                    ref := p -> fields[i];
+                ELSE
+                    ref := e -> ('planned_' || fields[i]);
+                    IF ref IS DISTINCT FROM p -> fields[i] THEN
+                        enc := enc || jsonb_build_object('p' || shorts[i], ref);
+                    END IF;
+                END IF;
+                IF NOT e ? ('actual_' || fields[i]) THEN
+                    missing := missing || to_jsonb('a' || shorts[i]);
+                ELSIF e -> ('actual_' || fields[i]) IS DISTINCT FROM ref THEN
+                    enc := enc || jsonb_build_object('a' || shorts[i], e -> ('actual_' || fields[i]));
+                END IF;
+            END LOOP;
+
+            IF NOT e ? 'exercise_name' THEN
+                missing := missing || '"n"';
+            ELSIF e->'exercise_name' IS DISTINCT FROM p->'exercise_name' THEN
+                exercise_id := NULL;
+                IF NOT inline_names AND jsonb_typeof(e->'exercise_name') = 'string' THEN
+                    SELECT min(id) INTO exercise_id FROM exercises WHERE name = e->>'exercise_name';
+                END IF;
+                enc := enc || CASE WHEN exercise_id IS NULL THEN jsonb_build_object('n', e->'exercise_name')
+                                   ELSE jsonb_build_object('e', exercise_id) END;
+            END IF;
+
+            IF e ? 'status' THEN
+                enc := enc || CASE e->'status'
+                                  WHEN '"completed"' THEN '{"k": "c"}'
+                                  WHEN '"failed"' THEN '{"k": "f"}'
+                                  WHEN '"skipped"' THEN '{"k": "s"}'
+                                  ELSE jsonb_build_object('K', e->'status')
+                              END;
+            END IF;
+            IF e ? 'completed_at' THEN
+                enc := enc || jsonb_build_object('t', e->'completed_at');
+            END IF;
+            IF e ? 'notes' THEN
+                enc := enc || jsonb_build_object('o', e->'notes');
+            END IF;
+            IF missing <> '[]' THEN
+                enc := enc || jsonb_build_object('-', missing);
+            END IF;
+            IF e - known <> '{}' THEN
+                enc := enc || jsonb_build_object('+', e - known);
+            END IF;
+            entries := entries || jsonb_build_array(enc);
+        END LOOP;
+        RETURN result || jsonb_build_object('x', entries);
+    END;
+    $$ LANGUAGE plpgsql STABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION decode_completed_data(doc JSONB, planned JSONB) RETURNS JSONB AS $$
+    DECLARE
+        fields CONSTANT TEXT[] := ARRAY['sets', 'reps', 'weight', 'rest'];
+        shorts CONSTANT TEXT[] := ARRAY['s', 'r', 'w', 't'];
+        result JSONB;
+        entries JSONB := '[]';
+        enc JSONB;
+        e JSONB;
+        p JSONB;
+        missing JSONB;
+        ref JSONB;
+        i INT;
+    BEGIN
+        IF doc IS NULL OR jsonb_typeof(doc) <> 'object' OR doc->'v' IS DISTINCT FROM '2' THEN
+            RETURN doc;
+        END IF;
+        result := COALESCE(doc->'+', '{}');
+        IF doc ? 's' THEN
+            result := result || jsonb_build_object('started_at', doc->'s');
+        END IF;
+        IF NOT doc ? 'x' THEN
+            RETURN result;
+        END IF;
+
+        FOR enc IN SELECT value FROM jsonb_array_elements(doc->'x') LOOP
+            IF enc ? 'r' THEN
+                entries := entries || jsonb_build_array(enc->'r');
+                CONTINUE;
+            END IF;
+            p := planned -> (enc->>'i')::int;
+            missing := COALESCE(enc->'-', '[]');
+            e := COALESCE(enc->'+', '{}') || jsonb_build_object('exercise_idx', enc->'i');
+            FOR i IN 1..4 LOOP
+                ref := COALESCE(enc -> ('p' || shorts[i]), p -> fields[i]);
+                IF NOT missing ? ('p' || shorts[i]) AND ref IS NOT NULL THEN
+                    e := e || jsonb_build_object('planned_' || fields[i], ref);
+                END IF;
+                IF enc ? ('a' || shorts[i]) THEN
+                    e := e || jsonb_build_object('actual_' || fields[i], enc -> ('a' || shorts[i]));
+                ELSIF NOT missing ? ('a' || shorts[i]) AND ref IS NOT NULL THEN
+                    e := e || jsonb_build_object('actual_' || fields[i], ref);
+                END IF;
+            END LOOP;
+
+            IF enc ? 'n' THEN
+                e := e || jsonb_build_object('exercise_name', enc->'n');
+            ELSIF enc ? 'e' THEN
+                e := e || jsonb_build_object(
+                    'exercise_name', (SELECT to_jsonb(name) FROM exercises WHERE id = (enc->>'e')::int)
+                );
+            ELSIF NOT missing ? 'n' AND p ? 'exercise_name' THEN
+                e := e || jsonb_build_object('exercise_name', p->'exercise_name');
+            END IF;
+
+            IF enc ? 'k' THEN
+                e := e || jsonb_build_object(
+                    'status', CASE enc->>'k' WHEN 'c' THEN 'completed' WHEN 'f' THEN 'failed' ELSE 'skipped' END
+                );
+            ELSIF enc ? 'K' THEN
+                e := e || jsonb_build_object('status', enc->'K');
+            END IF;
+            IF enc ? 't' THEN
+                e := e || jsonb_build_object('completed_at', enc->'t');
+            END IF;
+            IF enc ? 'o' THEN
+                e := e || jsonb_build_object('notes', enc->'o');
+            END IF;
+            entries := entries || jsonb_build_array(e);
+        END LOOP;
+        RETURN result || jsonb_build_object('exercises', entries);
+    END;
+    $$ LANGUAGE plpgsql STABLE
+    """,
+    # Encode on every write. When only the plan changes, the stored document is
+    # decoded against the old plan and re-encoded against the new one.
+    """
+    CREATE OR REPLACE FUNCTION compact_completed_data() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND NEW.completed_data IS NOT DISTINCT FROM OLD.completed_data THEN
+            NEW.completed_data := encode_completed_data(
+                decode_completed_data(OLD.completed_data, OLD.exercises), NEW.exercises
+            );
+        ELSE
+            NEW.completed_data := encode_completed_data(
+                decode_completed_data(NEW.completed_data, NEW.exercises), NEW.exercises
+            );
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS training_sessions_compact ON training_sessions",
+    """
+    CREATE TRIGGER training_sessions_compact
+    BEFORE INSERT OR UPDATE OF completed_data, exercises ON training_sessions
+    FOR EACH ROW EXECUTE FUNCTION compact_completed_data()
+    """,
+    # Old sessions moved out by the session_archive job (backend/jobs.py). Same
+    # columns as training_sessions; the JSON columns are compressed with lz4 when
+    # the server supports it, and a low toast_tuple_target compresses smaller rows too.
+    """
+    CREATE TABLE IF NOT EXISTS training_sessions_archive (
+        LIKE training_sessions INCLUDING DEFAULTS,
+        PRIMARY KEY (id),
+        FOREIGN KEY (athlete_id) REFERENCES athletes(id) ON DELETE CASCADE
+    ) WITH (toast_tuple_target = 128)
+    """,
+    """
+    DO $$
+    BEGIN
+        ALTER TABLE training_sessions_archive
+            ALTER COLUMN exercises SET COMPRESSION lz4,
+            ALTER COLUMN completed_data SET COMPRESSION lz4,
+            ALTER COLUMN session_notes SET COMPRESSION lz4;
+    EXCEPTION WHEN feature_not_supported OR invalid_parameter_value THEN
+        RAISE NOTICE 'lz4 unavailable; training_sessions_archive keeps the default compression';
+    END;
+    $$
+    """,
+    "CREATE INDEX IF NOT EXISTS training_sessions_archive_athlete_date_idx ON training_sessions_archive (athlete_id, session_date)",
+    "CREATE INDEX IF NOT EXISTS training_sessions_archive_date_idx ON training_sessions_archive (session_date)",
+    # Live and archived sessions, for history (records, rollups, billing) and
+    # for list requests with include_archived=true.
+    """
+    CREATE OR REPLACE VIEW training_sessions_all AS
+    SELECT * FROM training_sessions
+    UNION ALL
+    SELECT * FROM training_sessions_archive
+    """,
+    # Keep historical names when an exercise referenced by id is renamed or deleted.
+    """
+    CREATE OR REPLACE FUNCTION inline_exercise_references(p_exercise_id INT) RETURNS INT AS $$
+    DECLARE
+        path CONSTANT JSONPATH := '$.x[*] ? (@.e == $id)';
+        vars JSONB := jsonb_build_object('id', p_exercise_id);
+        live INT;
+        archived INT;
+    BEGIN
+        PERFORM set_config('sfs.inline_exercise_names', 'on', true);
+        UPDATE training_sessions
+        SET completed_data = decode_completed_data(completed_data, exercises)
+        WHERE jsonb_path_exists(completed_data, path, vars);
+        GET DIAGNOSTICS live = ROW_COUNT;
+        UPDATE training_sessions_archive
+        SET completed_data = encode_completed_data(decode_completed_data(completed_data, exercises), exercises)
+        WHERE jsonb_path_exists(completed_data, path, vars);
+        GET DIAGNOSTICS archived = ROW_COUNT;
+        PERFORM set_config('sfs.inline_exercise_names', 'off', true);
+        RETURN live + archived;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Start every athlete's plan history with their current plan, from the month
+    # they were created. plan_in_effect() falls back to the earliest row for months
+    # before that, so sessions dated before the athlete row are still billed.
+    """
+    INSERT INTO plan_history (
+        athlete_id, effective_from, plan_type, plan_sessions_per_week, plan_monthly_price, plan_on_demand_price
+    )
+    SELECT a.id, date_trunc('month', COALESCE(a.created_at, NOW()))::date,
+           a.plan_type, a.plan_sessions_per_week, a.plan_monthly_price, a.plan_on_demand_price
+    FROM athletes a
+    WHERE NOT EXISTS (SELECT 1 FROM plan_history ph WHERE ph.athlete_id = a.id)
+    """,
+    """
+    CREATE OR REPLACE FUNCTION plan_in_effect(p_athlete_id INT, p_month DATE) RETURNS SETOF plan_history AS $$
+        SELECT *
+        FROM plan_history
+        WHERE athlete_id = p_athlete_id
+        ORDER BY effective_from <= p_month DESC,
+                 CASE WHEN effective_from <= p_month THEN effective_from END DESC,
+                 effective_from
+        LIMIT 1
+    $$ LANGUAGE sql STABLE
+    """,
+]
+
+# Server-side search (/search). Accent-insensitive Portuguese full-text plus trigram
+# matching for partial words, names, emails and phones. The documents are built by
+# IMMUTABLE SQL functions and indexed as expressions, so rows (and `SELECT *`
+# responses) don't carry extra columns; queries must call the same functions.
+SEARCH_MIGRATIONS = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE OR REPLACE FUNCTION search_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'portuguese_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION athlete_search_vector(text, text, text, text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$
+        SELECT setweight(to_tsvector('portuguese_unaccent', coalesce($1, '') || ' ' || coalesce($2, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce($3, '') || ' ' || coalesce($4, '')), 'B')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION athlete_search_text(text, text, text, text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$
+        SELECT lower(search_unaccent(
+            coalesce($1, '') || ' ' || coalesce($2, '') || ' ' || coalesce($3, '') || ' ' || coalesce($4, '')
+        ))
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION exercise_search_vector(text, text, text, text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$
+        SELECT setweight(to_tsvector('portuguese_unaccent', coalesce($1, '')), 'A')
+            || setweight(to_tsvector('portuguese_unaccent', coalesce($2, '') || ' ' || coalesce($3, '')), 'B')
+            || setweight(to_tsvector('portuguese_unaccent', coalesce($4, '')), 'C')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION exercise_search_text(text, text, text, text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$
+        SELECT lower(search_unaccent(
+            coalesce($1, '') || ' ' || coalesce($2, '') || ' ' || coalesce($3, '') || ' ' || coalesce($4, '')
+        ))
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION session_search_vector(text, text, text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$
+        SELECT setweight(to_tsvector('portuguese_unaccent', coalesce($1, '')), 'A')
+            || setweight(to_tsvector('portuguese_unaccent', coalesce($2, '')), 'B')
+            || setweight(to_tsvector('portuguese_unaccent', coalesce($3, '')), 'C')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION session_search_text(text, text, text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$
+        SELECT lower(search_unaccent(coalesce($1, '') || ' ' || coalesce($2, '') || ' ' || coalesce($3, '')))
+    $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS athletes_search_vector_idx ON athletes
+    USING gin (athlete_search_vector(first_name, last_name, email, phone))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS athletes_search_trgm_idx ON athletes
+    USING gin (athlete_search_text(first_name, last_name, email, phone) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS exercises_search_vector_idx ON exercises
+    USING gin (exercise_search_vector(name, category, muscle_groups, equipment))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS exercises_search_trgm_idx ON exercises
+    USING gin (exercise_search_text(name, category, muscle_groups, equipment) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS training_sessions_search_vector_idx ON training_sessions
+    USING gin (session_search_vector(session_name, session_type, session_notes))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS training_sessions_search_trgm_idx ON training_sessions
+    USING gin (session_search_text(session_name, session_type, session_notes) gin_trgm_ops)
+    """,
 ]
 
 
@@ -130,6 +981,8 @@ def main() -> int:
                     cur.execute(stmt)
                 for stmt in MIGRATIONS:
                     cur.execute(stmt)
+                for stmt in SEARCH_MIGRATIONS:
+                    cur.execute(stmt)
         print("✅ Tables are ready.")
         return 0
     finally:
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Small closed-loop HTTP load generator for the API.
+
+Each of --concurrency threads keeps one keep-alive connection and fires requests
+back to back for --duration seconds, cycling through the given paths.
+Reports throughput, status code counts and latency percentiles of successful
+requests. Like a well-behaved client, a thread that receives a 503 sleeps for the
+Retry-After interval before its next request (disable with --no-retry-after).
+
+Examples:
+  python scripts/load_test.py --concurrency 50 --duration 20 /training-sessions /athletes
+  python scripts/load_test.py --url https://strong-fitness-api.onrender.com -c 20 /health
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _worker(
+    base_url: str,
+    paths: list[str],
+    headers: dict[str, str],
+    deadline: float,
+    honor_retry_after: bool,
+    latencies: list[float],
+    statuses: Counter,
+    lock: threading.Lock,
+) -> None:
+    parts = urlsplit(base_url)
+    conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(parts.netloc, timeout=30)
+    local_lat: list[float] = []
+    local_status: Counter = Counter()
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        retry_after = 0.0
+        try:
+            conn.request("GET", parts.path.rstrip("/") + path, headers=headers)
+            res = conn.getresponse()
+            res.read()
+            local_status[res.status] += 1
+            if res.status < 400:
+                local_lat.append(time.perf_counter() - started)
+            elif res.status == 503 and honor_retry_after:
+                retry_after = float(res.getheader("retry-after") or 0)
+            if res.getheader("connection", "").lower() == "close":
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            local_status["error"] += 1
+            conn.close()
+        if retry_after:
+            time.sleep(min(retry_after, max(0.0, deadline - time.monotonic())))
+    conn.close()
+    with lock:
+        latencies.extend(local_lat)
+        statuses.update(local_status)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the Strong Fitness Studio API")
+    parser.add_argument("paths", nargs="*", default=["/training-sessions"])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("-c", "--concurrency", type=int, default=20)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    parser.add_argument("--no-retry-after", action="store_true", help="Retry immediately after a 503")
+    parser.add_argument("-H", "--header", action="append", default=[], help="Extra header, e.g. 'Accept-Encoding: gzip'")
+    args = parser.parse_args()
+
+    headers = {}
+    for h in args.header:
+        name, _, value = h.partition(":")
+        headers[name.strip()] = value.strip()
+
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(args.url, args.paths, headers, deadline, not args.no_retry_after, latencies, statuses, lock),
+            daemon=True,
+        )
+        for _ in range(args.concurrency)
+    ]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    total = sum(statuses.values())
+    ok = len(latencies)
+    print(f"Requests: {total} in {elapsed:.1f}s ({total / elapsed:.1f} req/s, {ok / elapsed:.1f} ok/s)")
+    print("Status:   " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))))
+    print(
+        "Latency (ok): "
+        + " ".join(f"p{p}={_percentile(latencies, p) * 1000:.0f}ms" for p in (50, 90, 99))
+        + f" max={latencies[-1] * 1000 if latencies else 0:.0f}ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Inspect and maintain the monthly partitions of training_sessions.
+
+Examples:
+  python scripts/manage_partitions.py list
+  python scripts/manage_partitions.py ensure --months-ahead 24
+  python scripts/manage_partitions.py detach --before 2024-01 --archive-schema archive
+  python scripts/manage_partitions.py detach --before 2024-01 --drop
+  python scripts/manage_partitions.py move --before 2025-01 --tablespace cold
+  python scripts/manage_partitions.py prune-check
+
+`detach` uses DETACH PARTITION CONCURRENTLY, so sessions in other months stay
+readable and writable while it runs. A detached month disappears from the API;
+with --archive-schema it is kept as a plain table in that schema. The API then
+refuses writes to months before --before instead of recreating them; to take
+an archived month back, reattach it and lower
+`partition_horizons.detached_before` by hand.
+`move` rewrites each partition under an ACCESS EXCLUSIVE lock on that partition
+only: run it off-hours for large months.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from datetime import date
+
+import psycopg2
+from psycopg2 import sql
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from backend import billing, db, partitions  # noqa: E402
+from backend.settings import settings  # noqa: E402
+
+# The query shapes of the calendar and the month-close billing.
+_PRUNE_QUERIES = {
+    "calendar range": (
+        "SELECT id FROM training_sessions WHERE session_date BETWEEN %s AND %s",
+        lambda month: (month, billing.next_month(month)),
+    ),
+    "billing month": (
+        "SELECT athlete_id, COUNT(*) FROM training_sessions"
+        " WHERE status = 'Completed' AND session_date >= %s AND session_date < %s GROUP BY athlete_id",
+        lambda month: (month, billing.next_month(month)),
+    ),
+}
+
+
+def _month(value: str) -> date:
+    return billing.month_start(date.fromisoformat(f"{value}-01" if len(value) == 7 else value))
+
+
+def _older_than(before: date) -> list[str]:
+    names = []
+    for row in partitions.list_partitions():
+        name = row["name"]
+        suffix = name.rsplit("_p", 1)[-1]
+        if suffix.isdigit() and date(int(suffix[:4]), int(suffix[4:]), 1) < before:
+            names.append(name)
+    return names
+
+
+def cmd_list(args: argparse.Namespace) -> int:
+    rows = partitions.list_partitions()
+    for row in rows:
+        print(
+            f"{row['name']:<28} {row['tablespace']:<12} ~{max(row['estimated_rows'], 0):>8} rows"
+            f" {row['total_bytes'] / 1024:>8.0f} kB  {row['bounds']}"
+        )
+    print(f"{len(rows)} partitions")
+    return 0
+
+
+def cmd_ensure(args: argparse.Namespace) -> int:
+    with db.transaction() as cur:
+        created = partitions.ensure_ahead(cur, args.months_ahead)
+    print(f"Created {created} partitions.")
+    return 0
+
+
+def cmd_detach(args: argparse.Namespace) -> int:
+    names = _older_than(args.before)
+    # DETACH ... CONCURRENTLY can't run inside a transaction block.
+    conn = psycopg2.connect(settings.database_url, application_name="manage_partitions")
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            # Recorded first, so no worker recreates a month while it is being detached.
+            cur.execute(
+                """
+                INSERT INTO partition_horizons (parent, detached_before) VALUES ('training_sessions', %s)
+                ON CONFLICT (parent) DO UPDATE
+                    SET detached_before = GREATEST(partition_horizons.detached_before, EXCLUDED.detached_before)
+                """,
+                (args.before,),
+            )
+            if not names:
+                print("Nothing to detach.")
+                return 0
+            if args.archive_schema:
+                cur.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(args.archive_schema)))
+            for name in names:
+                cur.execute(
+                    sql.SQL("ALTER TABLE training_sessions DETACH PARTITION {} CONCURRENTLY").format(
+                        sql.Identifier(name)
+                    )
+                )
+                if args.drop:
+                    cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                    print(f"Dropped {name}")
+                elif args.archive_schema:
+                    cur.execute(
+                        sql.SQL("ALTER TABLE {} SET SCHEMA {}").format(
+                            sql.Identifier(name), sql.Identifier(args.archive_schema)
+                        )
+                    )
+                    print(f"Detached {name} into {args.archive_schema}")
+                else:
+                    print(f"Detached {name}")
+    finally:
+        conn.close()
+    return 0
+
+
+def cmd_move(args: argparse.Namespace) -> int:
+    names = _older_than(args.before)
+    for name in names:
+        with db.transaction() as cur:
+            cur.execute(
+                sql.SQL("ALTER TABLE {} SET TABLESPACE {}").format(
+                    sql.Identifier(name), sql.Identifier(args.tablespace)
+                )
+            )
+        print(f"Moved {name} to {args.tablespace}")
+    if not names:
+        print("Nothing to move.")
+    return 0
+
+
+def cmd_prune_check(args: argparse.Namespace) -> int:
+    month = billing.month_start(date.today())
+    total = len(partitions.list_partitions())
+    for label, (query, params) in _PRUNE_QUERIES.items():
+        plan = db.fetch_one("EXPLAIN (FORMAT JSON) " + query, params(month))["QUERY PLAN"]
+        scanned = sorted(_relations(plan[0]["Plan"]))
+        print(f"{label}: scans {len(scanned)} of {total} partitions ({', '.join(scanned)})")
+    return 0
+
+
+def _relations(node: dict) -> set[str]:
+    found = {node["Relation Name"]} if "Relation Name" in node else set()
+    for child in node.get("Plans", []):
+        found |= _relations(child)
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Manage training_sessions partitions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="Show every partition with its size").set_defaults(func=cmd_list)
+
+    ensure = sub.add_parser("ensure", help="Create partitions ahead of time")
+    ensure.add_argument("--months-ahead", type=int, default=settings.training_sessions_partition_months_ahead)
+    ensure.set_defaults(func=cmd_ensure)
+
+    detach = sub.add_parser("detach", help="Detach the months before --before")
+    detach.add_argument("--before", type=_month, required=True, help="YYYY-MM; earlier months are detached")
+    target = detach.add_mutually_exclusive_group()
+    target.add_argument("--archive-schema", default=None, help="Keep detached months in this schema")
+    target.add_argument("--drop", action="store_true", help="Drop detached months (DESTRUCTIVE)")
+    detach.set_defaults(func=cmd_detach)
+
+    move = sub.add_parser("move", help="Move the months before --before to another tablespace")
+    move.add_argument("--before", type=_month, required=True, help="YYYY-MM; earlier months are moved")
+    move.add_argument("--tablespace", required=True)
+    move.set_defaults(func=cmd_move)
+
+    sub.add_parser("prune-check", help="Show how many partitions the hot queries scan").set_defaults(
+        func=cmd_prune_check
+    )
+
+    args = parser.parse_args()
+    try:
+        return args.func(args)
+    finally:
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Backfill or repair the personal-record tables from completed sessions.
+
+Replays every completed session in date order through backend.records, which
+is what the API does incrementally on each completion.
+
+Examples:
+  python scripts/rebuild_records.py
+  python scripts/rebuild_records.py --athlete-id 12
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from backend import db, records  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rebuild personal records from completed sessions")
+    parser.add_argument("--athlete-id", type=int, default=None, help="Only rebuild this athlete")
+    args = parser.parse_args()
+
+    try:
+        with db.transaction() as cur:
+            processed = records.rebuild(cur, args.athlete_id)
+    finally:
+        db.close_pool()
+    print(f"Replayed {processed} completed sessions.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Rebuild training rollups for a date range from the raw sessions.
+
+The API keeps rollups current on every session write; this repairs them after
+bulk imports or manual SQL, and backfills them the first time.
+
+Examples:
+  python scripts/reconcile_rollups.py
+  python scripts/reconcile_rollups.py --start 2025-01-01 --end 2025-03-31
+  python scripts/reconcile_rollups.py --athlete-id 12
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from backend import db, rollups  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reconcile training rollups")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="Defaults to the first session")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Defaults to the last session")
+    parser.add_argument("--athlete-id", type=int, default=None, help="Only rebuild this athlete")
+    args = parser.parse_args()
+
+    try:
+        with db.transaction() as cur:
+            cur.execute("SELECT MIN(session_date) AS first, MAX(session_date) AS last FROM training_sessions")
+            span = cur.fetchone()
+            start = args.start or span["first"]
+            end = args.end or span["last"]
+            if start is None or end is None:
+                print("No training sessions; nothing to do.")
+                return 0
+            rollups.refresh_range(cur, start, end, args.athlete_id)
+    finally:
+        db.close_pool()
+    print(f"Rollups reconciled from {start} to {end}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Run background jobs outside the API process.
+
+Useful when the API runs with JOBS_ENABLED=false, or to drain a backlog. Any
+number of these can run next to the API workers: jobs are claimed with SKIP
+LOCKED, so each one still runs only once.
+
+Examples:
+  python scripts/run_jobs.py            # poll until interrupted
+  python scripts/run_jobs.py --drain    # run everything that is due, then exit
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from backend import db, jobs  # noqa: E402
+from backend.settings import settings  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run queued background jobs")
+    parser.add_argument("--drain", action="store_true", help="Exit once no job is due")
+    parser.add_argument("--no-schedule", action="store_true", help="Don't queue the month-close jobs")
+    args = parser.parse_args()
+
+    worker_id = f"{jobs.default_worker_id()}:cli"
+    processed = 0
+    try:
+        if not args.no_schedule and settings.jobs_month_close_enabled:
+            jobs.schedule_month_close(date.today())
+        while True:
+            if jobs.run_once(worker_id):
+                processed += 1
+                continue
+            if args.drain:
+                break
+            time.sleep(settings.jobs_poll_interval_seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close_pool()
+    print(f"Processed {processed} job(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
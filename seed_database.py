@@ -602,6 +602,17 @@ def main():
         # Training sessions
         inserted_sessions = 0
 
+        # Seeded dates reach back before the partition horizon init_db creates.
+        cur.execute(
+            """
+            SELECT ensure_training_sessions_partition(m::date)
+            FROM generate_series(
+                date_trunc('month', %s::date), date_trunc('month', %s::date), interval '1 month'
+            ) m
+            """,
+            (today - timedelta(days=60), today + timedelta(days=60)),
+        )
+
         # Completed sessions (past)
         for athlete_id in athlete_ids:
             for i in range(cfg.completed_sessions_per_athlete):